@@ -1,22 +1,43 @@
 #!/usr/bin/env python
 import sys, os
 import math
+import time
+import datetime
+import functools
 import subprocess
 import logging
+import logging.handlers
+import queue
+import atexit
 import json
+import asyncio
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from colorama import init, Fore, Style
-from ollama import chat, ChatResponse
-
+from ollama import ChatResponse, Message, Tool
+try:
+    # ollama._utils is private API that can change even within the pinned range;
+    # without the helper, tools go to chat() as callables
+    from ollama._utils import convert_function_to_tool
+except ImportError:  # pragma: no cover - depends on the installed ollama
+    convert_function_to_tool = None
+
+from helpers.ollama_client import chat
+from helpers.config import get_config
 # Import trading analysis tools from agent_tools package
 from agent_tools.product_info import get_product_info
+from agent_tools.async_fetch import fetch_snapshot
 # Import technical analysis tools from agent_tools package
 # Unified paper trading tool
 from agent_tools.unified_trading import unified_trade_tool
+from agent_tools.trade_tracker import trade_tracker
 # New market signal tools
 from agent_tools.atr import get_latest_atr
 from agent_tools.signal_hub import get_signals_tool as _get_signals_tool
 # Import portfolio performance and trade tracking tools
 from helpers.trade_history import get_trade_history_tool
+from helpers.indicators import warm_up as warm_up_indicators
 # Import planning tool from agent_tools package
 from agent_tools.planning_tool import get_current_plan, update_trading_plan, get_plan_summary, record_trade_outcome
 
@@ -25,20 +46,12 @@ DEFAULT_CONFIG = {
     "model": "qwen3:14b",
     "wait_seconds": 300,
     "candle_granularity": "1H",
+    "context_token_budget": 6000,
 }
 
 def _load_config() -> dict:
-    try:
-        cfg_path = os.path.join(os.path.dirname(__file__), "config.json")
-        with open(cfg_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        if not isinstance(data, dict):
-            return DEFAULT_CONFIG
-        # merge with defaults
-        merged = {**DEFAULT_CONFIG, **data}
-        return merged
-    except Exception:
-        return DEFAULT_CONFIG
+    # merge with defaults (get_config() is empty when config.json is missing or invalid)
+    return {**DEFAULT_CONFIG, **get_config()}
 
 CONFIG = _load_config()
 # Support nested config structure while remaining backward compatible
@@ -46,6 +59,40 @@ AGENT_CFG = CONFIG.get("agent", {}) if isinstance(CONFIG.get("agent", {}), dict)
 COINBASE_CFG = CONFIG.get("coinbase", {}) if isinstance(CONFIG.get("coinbase", {}), dict) else {}
 MODEL = str(AGENT_CFG.get("model", CONFIG.get("model", DEFAULT_CONFIG["model"])))
 CANDLE_GRAN = str(AGENT_CFG.get("candle_granularity", CONFIG.get("candle_granularity", DEFAULT_CONFIG["candle_granularity"])))
+CONTEXT_TOKEN_BUDGET = int(AGENT_CFG.get("context_token_budget", CONFIG.get("context_token_budget", DEFAULT_CONFIG["context_token_budget"])))
+
+_GRAN_ALIASES = {
+    "1MIN": "1M", "1MINUTE": "1M", "ONE_MIN": "1M", "ONE_MINUTE": "1M", "1MINUTES": "1M",
+    "5MIN": "5M", "5MINUTE": "5M", "FIVE_MINUTE": "5M", "5MINUTES": "5M",
+    "15MIN": "15M", "15MINUTE": "15M", "FIFTEEN_MINUTE": "15M", "15MINUTES": "15M",
+    "1HR": "1H", "1 H": "1H", "ONE_HOUR": "1H",
+    "6HR": "6H", "6 H": "6H", "SIX_HOUR": "6H",
+    "1DAY": "1D", "1 D": "1D", "ONE_DAY": "1D",
+}
+_GRAN_SECONDS = {
+    "1M": 60,
+    "5M": 5 * 60,
+    "15M": 15 * 60,
+    "1H": 60 * 60,
+    "6H": 6 * 60 * 60,
+    "1D": 24 * 60 * 60,
+}
+
+
+@functools.lru_cache(maxsize=64)
+def _normalize_granularity(g: str) -> str:
+    """Map common variants to supported set: ['1M','5M','15M','1H','6H','1D']."""
+    if not g:
+        return "1H"
+    m = g.strip().upper()
+    if m in _GRAN_ALIASES:
+        return _GRAN_ALIASES[m]
+    # Already valid?
+    if m in _GRAN_SECONDS:
+        return m
+    # Fallback simple normalization like '1m' -> '1M'
+    return m.replace("MIN", "M").replace("HR", "H").replace("DAY", "D").replace(" ", "")
+
 
 def _granularity_to_seconds(gran: str) -> int:
     """Map granularity (e.g., '1M','5M','15M','1H','6H','1D') to seconds.
@@ -53,27 +100,7 @@ def _granularity_to_seconds(gran: str) -> int:
     """
     if not gran:
         return DEFAULT_CONFIG["wait_seconds"]
-    m = str(gran).strip().upper()
-    aliases = {
-        "1MIN": "1M", "1MINUTE": "1M", "ONE_MIN": "1M", "ONE_MINUTE": "1M",
-        "5MIN": "5M", "5MINUTE": "5M", "FIVE_MINUTE": "5M",
-        "15MIN": "15M", "15MINUTE": "15M", "FIFTEEN_MINUTE": "15M",
-        "1HR": "1H", "1 H": "1H", "ONE_HOUR": "1H",
-        "6HR": "6H", "6 H": "6H", "SIX_HOUR": "6H",
-        "1DAY": "1D", "1 D": "1D", "ONE_DAY": "1D",
-        "1MINUTES": "1M", "5MINUTES": "5M", "15MINUTES": "15M",
-    }
-    if m in aliases:
-        m = aliases[m]
-    mapping = {
-        "1M": 60,
-        "5M": 5 * 60,
-        "15M": 15 * 60,
-        "1H": 60 * 60,
-        "6H": 6 * 60 * 60,
-        "1D": 24 * 60 * 60,
-    }
-    return mapping.get(m, DEFAULT_CONFIG["wait_seconds"])
+    return _GRAN_SECONDS.get(_normalize_granularity(str(gran)), DEFAULT_CONFIG["wait_seconds"])
 
 _raw_wait = AGENT_CFG.get("wait_seconds", CONFIG.get("wait_seconds", DEFAULT_CONFIG["wait_seconds"]))
 SYNC_WAIT = isinstance(_raw_wait, str) and _raw_wait.strip().lower() == "sync"
@@ -90,16 +117,28 @@ else:
 
 
 # Coinbase API setup
-from coinbase.rest import RESTClient
-_cb = COINBASE_CFG if isinstance(COINBASE_CFG, dict) else {}
-api_key = str(_cb.get("coinbase_api_key", CONFIG.get("coinbase_api_key", "")))
-api_secret = str(_cb.get("coinbase_api_secret", CONFIG.get("coinbase_api_secret", "")))
-if not api_key or not api_secret:
-    logging.getLogger(__name__).warning("Coinbase API credentials are not set in config.json (coinbase.coinbase_api_key/coinbase.coinbase_api_secret)")
-client = RESTClient(api_key=api_key, api_secret=api_secret)
+from helpers.coinbase_client import get_rest_client
+client = get_rest_client()
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+# Records are enqueued untouched on the calling thread; message interpolation,
+# traceback rendering and stderr writes all happen on the QueueListener's thread
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that skips prepare()'s formatting pass: the queue is
+    in-process, so the record never needs to be made picklable."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+_log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+_log_stream = logging.StreamHandler()
+_log_stream.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_stream, respect_handler_level=True)
+_queue_handler = _DeferredQueueHandler(_log_queue)
+logging.basicConfig(level=logging.INFO, handlers=[_queue_handler])
+_log_listener.start()
+atexit.register(_log_listener.stop)
 logger = logging.getLogger(__name__)
 
 # Initialize colorama for colored console output
@@ -108,30 +147,6 @@ init(autoreset=True)
 
 # ------------------------- Trading Tool Wrappers -------------------------
 
-def _normalize_granularity(g: str) -> str:
-    """Map common variants to supported set: ['1M','5M','15M','1H','6H','1D']."""
-    if not g:
-        return "1H"
-    m = g.strip().upper()
-    aliases = {
-        "1MIN": "1M", "1MINUTE": "1M", "ONE_MIN": "1M", "ONE_MINUTE": "1M",
-        "5MIN": "5M", "5MINUTE": "5M",
-        "15MIN": "15M", "15MINUTE": "15M",
-        "1HR": "1H", "1 H": "1H", "ONE_HOUR": "1H",
-        "6HR": "6H", "6 H": "6H",
-        "1DAY": "1D", "1 D": "1D", "ONE_DAY": "1D",
-    }
-    if m in aliases:
-        return aliases[m]
-    # Already valid?
-    if m in {"1M", "5M", "15M", "1H", "6H", "1D"}:
-        return m
-    # Fallback simple normalization like '1m' -> '1M'
-    return m.replace("MIN", "M").replace("HR", "H").replace("DAY", "D").replace(" ", "")
-
- 
-
-
 def get_atr_tool(
     product_id: str = "BTC-USD",
     granularity: str = None,
@@ -264,28 +279,149 @@ def get_trade_history_analysis(limit: int = 10, strategy_filter: str = None) ->
 
 # ------------------------- Conversation Utils -------------------------
 
-def _trim_messages(messages, max_total: int = 120, keep_tail: int = 60):
-    """Keep conversation buffer bounded. Returns possibly-trimmed list.
+_SUMMARY_PREFIX = "[Conversation summary of older messages]\n"
+_SUMMARY_PROMPT = (
+    "Summarize the following trading-agent conversation in under 200 words. "
+    "Keep open positions, entries/stops/targets, plan changes, recent P&L and lessons; drop raw tool output."
+)
+
+
+@functools.lru_cache(maxsize=2048)
+def _content_tokens(content: str) -> int:
+    # ~4 characters per token is close enough for budgeting and needs no tokenizer
+    return len(content) // 4 + 1
+
+
+def _message_tokens(msg) -> int:
+    content = msg.get("content") if isinstance(msg, dict) else getattr(msg, "content", "")
+    return 4 + _content_tokens(str(content or ""))
+
+
+def _summarize_messages(messages) -> str:
+    transcript = "\n".join(
+        f"{m.get('role', '?')}{'/' + m['name'] if m.get('name') else ''}: {m.get('content') or ''}"
+        for m in messages if isinstance(m, dict)
+    )
+    response = chat(
+        model=MODEL,
+        messages=[{"role": "system", "content": _SUMMARY_PROMPT}, {"role": "user", "content": transcript}],
+        stream=False,
+    )
+    return (response.message.content or "").strip()
+
+
+def _trim_messages(messages, budget: int = 6000, keep_tokens: int = None):
+    """Keep the conversation within roughly `budget` tokens. Returns possibly-trimmed list.
     - Keeps the initial system message
-    - Keeps the last `keep_tail` messages
-    - Replaces the middle with a compact system note
+    - Keeps the most recent messages worth up to `keep_tokens` (default budget // 2)
+    - Replaces the middle with one summary message, produced once per overflow and
+      carried forward (the previous summary is folded into the next one)
     """
     try:
         if not messages:
             return messages
-        if len(messages) <= max_total:
+        sizes = [_message_tokens(m) for m in messages]
+        if sum(sizes) <= budget:
+            return messages
+        keep = budget // 2 if keep_tokens is None else keep_tokens
+        start = len(messages)
+        used = 0
+        while start > 1 and used + sizes[start - 1] <= keep:
+            start -= 1
+            used += sizes[start]
+        middle = messages[1:start]
+        if not middle:
             return messages
-        head = messages[0:1]  # system prompt
-        tail = messages[-keep_tail:]
-        omitted = len(messages) - (1 + len(tail))
-        note = {
-            "role": "system",
-            "content": f"[Conversation trimmed: {omitted} older messages summarized/omitted to control context size]"
-        }
-        return head + [note] + tail
+        try:
+            summary = _summarize_messages(middle)
+        except Exception as e:
+            logger.warning(f"Conversation summary failed: {e}")
+            summary = ""
+        if not summary:
+            summary = f"{len(middle)} older messages omitted to control context size."
+        note = {"role": "system", "content": _SUMMARY_PREFIX + summary}
+        return messages[0:1] + [note] + messages[start:]
     except Exception:
         return messages
 
+# Recent chat responses keyed by a digest of (model, messages, tool names)
+_CHAT_CACHE: "OrderedDict[bytes, ChatResponse]" = OrderedDict()
+_CHAT_CACHE_SIZE = 32
+
+
+def _chat_key(model: str, messages, tools) -> bytes:
+    payload = {
+        "model": model,
+        "messages": messages,
+        "tools": [t.function.name if isinstance(t, Tool) else t.__name__ for t in tools] if tools else [],
+    }
+    blob = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(blob, digest_size=16).digest()
+
+
+# Read-only, network-bound tools worth starting while the model is still generating
+_PREFETCH_TOOLS = {"get_current_market_info", "get_atr_tool", "get_signals_tool"}
+_PREFETCH_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="tool-prefetch")
+
+
+def _tool_call_key(fn_name: str, args) -> str:
+    return fn_name + json.dumps(args or {}, sort_keys=True, default=str)
+
+
+def _stream_chat(model: str, messages, tools, prefetch: dict) -> ChatResponse:
+    """Stream a chat response, submitting prefetchable tool calls as soon as they arrive.
+
+    Futures are stored in `prefetch` under `_tool_call_key`; the tool loop picks them
+    up instead of running the tool again. Returns the assembled ChatResponse.
+    """
+    parts = []
+    tool_calls = []
+    last = None
+    for chunk in chat(model=model, messages=messages, tools=tools, stream=True):
+        last = chunk
+        msg = chunk.message
+        if msg.content:
+            parts.append(msg.content)
+        for call in msg.tool_calls or ():
+            tool_calls.append(call)
+            fn_name = call.function.name
+            key = _tool_call_key(fn_name, call.function.arguments)
+            if fn_name in _PREFETCH_TOOLS and key not in prefetch:
+                logger.debug("Prefetching %s while the model streams", fn_name)
+                prefetch[key] = _PREFETCH_POOL.submit(TOOL_DISPATCH[fn_name], **(call.function.arguments or {}))
+    message = Message(role="assistant", content="".join(parts), tool_calls=tool_calls or None)
+    if last is None:
+        return ChatResponse(message=message)
+    return last.model_copy(update={"message": message})
+
+
+def _call_chat(model: str, messages, tools, prefetch) -> ChatResponse:
+    if tools and prefetch is not None:
+        return _stream_chat(model, messages, tools, prefetch)
+    return chat(model=model, messages=messages, tools=tools, stream=False)
+
+
+def cached_chat(model: str, messages, tools=None, use_cache: bool = True, prefetch: dict = None) -> ChatResponse:
+    """`ollama.chat` memoized on the exact conversation, keeping the last 32 responses.
+
+    Pass use_cache=False right after a fresh heartbeat: the prompt is new by
+    construction, so neither a lookup nor storing the response is worthwhile.
+    With a `prefetch` dict the response is streamed (see `_stream_chat`).
+    """
+    if not use_cache:
+        return _call_chat(model, messages, tools, prefetch)
+    key = _chat_key(model, messages, tools)
+    hit = _CHAT_CACHE.get(key)
+    if hit is not None:
+        _CHAT_CACHE.move_to_end(key)
+        logger.info("Chat cache hit: reusing previous model response")
+        return hit
+    response = _call_chat(model, messages, tools, prefetch)
+    _CHAT_CACHE[key] = response
+    if len(_CHAT_CACHE) > _CHAT_CACHE_SIZE:
+        _CHAT_CACHE.popitem(last=False)
+    return response
+
 # Planning tool wrappers
 def get_trading_plan() -> str:
     """Get the current trading plan for strategic context."""
@@ -309,87 +445,194 @@ def done_tool(note: str = "") -> str:
     """
     return f"DONE{(': ' + note) if note else ''}"
 
-def main():
-    system_msg = (
-        "🚀 AUTONOMOUS CRYPTO TRADING AGENT 🚀\n" +
-        "You are a HIGH-FREQUENCY, ACTION-ORIENTED trading bot with ZERO tolerance for inaction.\n" +
-        "CASH SITTING IDLE = LOST OPPORTUNITY. You MUST trade aggressively to maximize profits.\n\n" +
-
-        "🎯 EXECUTION PROTOCOL:\n" +
-        "1. CHECK PERFORMANCE: Review your P&L - Are you profitable? If not, CHANGE TACTICS\n" +
-        "2. SCAN MARKET: Get RSI, OBV - Find your trading signal\n" +
-        "3. EXECUTE TRADE: BUY oversold dips, SELL overbought peaks - NO HESITATION\n" +
-        "4. DOCUMENT: Update your plan with what worked/failed\n\n" +
-
-        "💰 PROFIT-MAXIMIZING DATABASE:\n" +
-        "Your SQLite database tracks EVERY trade with P&L calculations.\n" +
-        "Use this data to identify winning patterns and eliminate losing strategies.\n" +
-        "If your win rate drops below 60%, IMMEDIATELY change your approach.\n\n" +
-
-
-        "📊 AVAILABLE TOOLS:\n" +
-        "Portfolio & Performance:\n" +
-        "- get_trade_history_analysis(limit=5) - Learn from recent trades\n\n" +
-
-        "Market Intelligence:\n" +
-        "- get_current_market_info(product_id='BTC-USD') - Current price & 24h data\n" +
-        "- get_signals_tool(product_id='BTC-USD') - Unified RSI/EMA/OBV (+ATR)\n" +
-        "- get_atr_tool(product_id='BTC-USD') - Volatility for sizing/SL\n\n" +
-
-        "EXECUTION TOOL (PAPER TRADING):\n" +
-        "- unified_trade_tool(action='open_long', price=50000.0, risk_usd=25, atr=500, sl=49250, tp=52000)\n" +
-        "- unified_trade_tool(action='on_price', price=50500.0)\n" +
-        "- unified_trade_tool(action='summary', mark_price=50500.0)\n" +
-        "- unified_trade_tool(action='close', price=50750.0)\n" +
-        "(Optional trailing params at entry: move_to_be_atr=1.0, trail_start_atr=2.0, trail_distance_atr=1.25)\n\n" +
-        "CRITICAL: When you decide to trade, you MUST execute via unified_trade_tool.\n" +
-        "Do not merely describe trades. Always place orders by calling unified_trade_tool with the proper action and parameters.\n\n" +
-
-        "TOOL CALL ENFORCEMENT:\n" +
-        "- If you assert a plan update, pause, or resume directive, you MUST call update_trading_plan_tool(update_reason=..., content=..., section=...).\n" +
-        "  Never claim a plan change without emitting the actual tool call.\n" +
-        "- If you need the plan context, call get_trading_plan_summary() or get_trading_plan().\n" +
-        "- If you log trade outcomes or lessons, call record_trade_result(...).\n\n" +
-        "Turn control:\n" +
-        "- done_tool(note='...') - Signal you are finished this turn early; do not emit extra tool calls.\n\n" +
-
-        "Planning & Learning:\n" +
-        "- get_trading_plan_summary() - Current strategy\n" +
-        "- get_trading_plan() - Full trading plan\n" +
-        "- update_trading_plan_tool(update_reason='market', content='Paused due to low volatility; resume when ADX>25 or ATR>1.5%/1H', section='risk')\n" +
-        "- record_trade_result(trade_type='hold', asset='BTC-USD', outcome='no_trade', profit_loss=0.0, lessons='No edge in stagnant regime')\n\n" +
-
-        "Your database tracks everything. Learn from it and BEAT THE MARKET!\n" +
-
-        "YOU MUST MAKE A DECISION: BUY, SELL, or HOLD\n"
-    )
+# ------------------------- Cycle Scheduling -------------------------
 
-    messages = [{"role": "system", "content": system_msg}]
-    tools = [get_current_market_info, unified_trade_tool,
-             get_trading_plan_summary, get_trading_plan,
-             update_trading_plan_tool, record_trade_result,
-             get_atr_tool, get_signals_tool, get_trade_history_analysis,
-             done_tool]
-    logger.info(f"Registered tools: {[t.__name__ for t in tools]}")
+# Digest of the market state the model last acted on (see _market_state_hash)
+_LAST_STATE_HASH = None
+# time.monotonic() at which the next interval-mode cycle is due
+_NEXT_DEADLINE = None
+
+
+def _market_state_hash(product_id: str = "BTC-USD"):
+    """Digest of what the model would act on: signal states plus price in half-ATR buckets.
+    Returns None when signals are unavailable, which never matches (no skip).
+    """
+    try:
+        sig = json.loads(get_signals_tool(product_id=product_id, return_format="json"))
+        price, atr = sig["price"], sig.get("atr")
+        bucket = int(price // (atr / 2)) if isinstance(atr, (int, float)) and atr > 0 else round(price)
+        state = (
+            product_id, sig["granularity"], bucket,
+            sig["rsi"]["state"], sig["ema"]["state"], sig["ema"]["htf"], sig["obv"]["state"],
+        )
+    except Exception as e:
+        logger.debug("State hash unavailable: %s", e)
+        return None
+    return hashlib.blake2b(repr(state).encode(), digest_size=16).hexdigest()
+
+
+def _has_open_position(product_id: str = "BTC-USD") -> bool:
+    try:
+        return trade_tracker.get_open_trade_minimal(product_id) is not None
+    except Exception:
+        # Unknown -> assume a position needs managing
+        return True
+
+
+def _wait_for_next_cycle() -> bool:
+    """Sleep until the next cycle is due. Returns False when the agent should exit."""
+    if MANUAL_MODE:
+        logging.info("Manual mode cycle complete. Exiting without waiting.")
+        return False
+    if SYNC_WAIT:
+        # Align sleep to the next candle boundary in UTC
+        period = int(WAIT_SECONDS)
+        now = datetime.datetime.now(datetime.timezone.utc)
+        ts = now.timestamp()
+        try:
+            next_ts = math.ceil(ts / period) * period
+        except Exception:
+            # Fallback ceil without math
+            next_ts = int(-(-ts // period) * period)
+        sleep_s = max(1, int(next_ts - ts))
+        eta = datetime.datetime.fromtimestamp(next_ts, tz=datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        logging.info(f"sync wait: next candle in {sleep_s} seconds (until {eta} UTC)")
+        time.sleep(sleep_s)
+    else:
+        # Fixed interval against a monotonic deadline, so cycle run time does not add drift
+        global _NEXT_DEADLINE
+        now = time.monotonic()
+        if _NEXT_DEADLINE is None:
+            _NEXT_DEADLINE = now + WAIT_SECONDS
+        overrun = now - _NEXT_DEADLINE
+        if overrun > WAIT_SECONDS:
+            logger.warning(f"Cycle overran its schedule by {overrun:.0f}s; resyncing to now + {WAIT_SECONDS}s")
+            _NEXT_DEADLINE = now + WAIT_SECONDS
+        sleep_s = max(0.0, _NEXT_DEADLINE - now)
+        _unit = "minutes" if WAIT_SECONDS % 60 == 0 else "seconds"
+        _val = WAIT_SECONDS // 60 if _unit == "minutes" else WAIT_SECONDS
+        logging.info(f"next trade in {_val} {_unit} (sleeping {sleep_s:.0f}s)")
+        time.sleep(sleep_s)
+        _NEXT_DEADLINE += WAIT_SECONDS
+    return True
+
+
+# ------------------------- Prompt & Tool Registry -------------------------
+
+SYSTEM_MSG = """\
+🚀 AUTONOMOUS CRYPTO TRADING AGENT 🚀
+You are a HIGH-FREQUENCY, ACTION-ORIENTED trading bot with ZERO tolerance for inaction.
+CASH SITTING IDLE = LOST OPPORTUNITY. You MUST trade aggressively to maximize profits.
+
+🎯 EXECUTION PROTOCOL:
+1. CHECK PERFORMANCE: Review your P&L - Are you profitable? If not, CHANGE TACTICS
+2. SCAN MARKET: Get RSI, OBV - Find your trading signal
+3. EXECUTE TRADE: BUY oversold dips, SELL overbought peaks - NO HESITATION
+4. DOCUMENT: Update your plan with what worked/failed
+
+💰 PROFIT-MAXIMIZING DATABASE:
+Your SQLite database tracks EVERY trade with P&L calculations.
+Use this data to identify winning patterns and eliminate losing strategies.
+If your win rate drops below 60%, IMMEDIATELY change your approach.
+
+📊 AVAILABLE TOOLS:
+Portfolio & Performance:
+- get_trade_history_analysis(limit=5) - Learn from recent trades
+
+Market Intelligence:
+- get_current_market_info(product_id='BTC-USD') - Current price & 24h data
+- get_signals_tool(product_id='BTC-USD') - Unified RSI/EMA/OBV (+ATR)
+- get_atr_tool(product_id='BTC-USD') - Volatility for sizing/SL
+
+EXECUTION TOOL (PAPER TRADING):
+- unified_trade_tool(action='open_long', price=50000.0, risk_usd=25, atr=500, sl=49250, tp=52000)
+- unified_trade_tool(action='on_price', price=50500.0)
+- unified_trade_tool(action='summary', mark_price=50500.0)
+- unified_trade_tool(action='close', price=50750.0)
+(Optional trailing params at entry: move_to_be_atr=1.0, trail_start_atr=2.0, trail_distance_atr=1.25)
+
+CRITICAL: When you decide to trade, you MUST execute via unified_trade_tool.
+Do not merely describe trades. Always place orders by calling unified_trade_tool with the proper action and parameters.
+
+TOOL CALL ENFORCEMENT:
+- If you assert a plan update, pause, or resume directive, you MUST call update_trading_plan_tool(update_reason=..., content=..., section=...).
+  Never claim a plan change without emitting the actual tool call.
+- If you need the plan context, call get_trading_plan_summary() or get_trading_plan().
+- If you log trade outcomes or lessons, call record_trade_result(...).
+
+Turn control:
+- done_tool(note='...') - Signal you are finished this turn early; do not emit extra tool calls.
+
+Planning & Learning:
+- get_trading_plan_summary() - Current strategy
+- get_trading_plan() - Full trading plan
+- update_trading_plan_tool(update_reason='market', content='Paused due to low volatility; resume when ADX>25 or ATR>1.5%/1H', section='risk')
+- record_trade_result(trade_type='hold', asset='BTC-USD', outcome='no_trade', profit_loss=0.0, lessons='No edge in stagnant regime')
+
+Your database tracks everything. Learn from it and BEAT THE MARKET!
+YOU MUST MAKE A DECISION: BUY, SELL, or HOLD
+"""
+
+# Injected once per cycle when the model answers without any tool calls
+ENFORCEMENT_MSG = (
+    "TOOL CALL ENFORCEMENT: Respond (if necessary) with ONLY tool_calls in this exact order and with these exact arguments. "
+    "1) get_trading_plan_summary() with no arguments. "
+    "2) update_trading_plan_tool(update_reason='market', content='Paused due to low volatility; resume when ADX>25 or ATR>1.5%/1H', section='risk'). "
+    "3) record_trade_result(trade_type='hold', asset='BTC-USD', outcome='no_trade', profit_loss=0.0, lessons='No edge in stagnant regime'). "
+)
+
+TOOLS = [get_current_market_info, unified_trade_tool,
+         get_trading_plan_summary, get_trading_plan,
+         update_trading_plan_tool, record_trade_result,
+         get_atr_tool, get_signals_tool, get_trade_history_analysis,
+         done_tool]
+# Only these names can be executed from a model tool call
+TOOL_DISPATCH = {t.__name__: t for t in TOOLS}
+
+
+def _build_tool_schemas() -> list:
+    """JSON schemas built once from signatures/docstrings; ollama would otherwise
+    re-introspect every callable on every chat() call. Falls back to the callables
+    themselves when ollama's converter is missing or its API has changed."""
+    if convert_function_to_tool is not None:
+        try:
+            return [convert_function_to_tool(t) for t in TOOLS]
+        except Exception as e:
+            logger.warning("Tool schema prebuild failed (%s); passing callables", e)
+    return list(TOOLS)
+
+
+TOOL_SCHEMAS: list = _build_tool_schemas()
+
+
+def main():
+    global _LAST_STATE_HASH, _NEXT_DEADLINE
+    messages = [{"role": "system", "content": SYSTEM_MSG}]
+    logger.info(f"Registered tools: {list(TOOL_DISPATCH)}")
 
     print(Fore.GREEN + "Agent ready! Type 'exit' to quit." + Style.RESET_ALL)
     if MANUAL_MODE:
         logger.info("Manual mode enabled: running a single cycle and exiting after completion.")
 
+    # JIT the indicator kernels in the background while the first snapshot is fetched
+    _PREFETCH_POOL.submit(warm_up_indicators)
 
+    _NEXT_DEADLINE = time.monotonic() + WAIT_SECONDS
     while True:
-        import datetime
-
         # Heartbeat and performance summary
         performance_line = ""
+        hb_message = None
         try:
-            pd = get_product_info(client, product_id="BTC-USD")
+            # Product info + candles in one round trip; warms the caches used by the tools
+            snapshot = asyncio.run(fetch_snapshot(client, "BTC-USD", _normalize_granularity(CANDLE_GRAN)))
+            pd = snapshot["product_info"]
             last_price = pd.get("price") if isinstance(pd, dict) else None
             if pd and isinstance(last_price, (int, float)):
                 hb = unified_trade_tool(action="on_price", price=float(last_price), product_id="BTC-USD")
-                logger.debug(f"on_price heartbeat -> {hb}")
-                # Add as a tool message so the model sees latest management state
-                messages.append({"role": "tool", "name": "unified_trade_tool", "content": hb})
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("on_price heartbeat -> %s", hb)
+                # Added below as a tool message so the model sees latest management state
+                hb_message = {"role": "tool", "name": "unified_trade_tool", "content": hb}
                 perf = unified_trade_tool(action="summary", product_id="BTC-USD", mark_price=float(last_price))
                 performance_line = f"PERFORMANCE: {perf}"
             else:
@@ -398,6 +641,16 @@ def main():
             logger.warning(f"Heartbeat/performance fetch failed: {e}")
             performance_line = "PERFORMANCE: error fetching summary"
 
+        # Nothing to manage and nothing new since the model last looked: skip the LLM
+        state_hash = _market_state_hash("BTC-USD")
+        if state_hash is not None and state_hash == _LAST_STATE_HASH and not _has_open_position("BTC-USD"):
+            logger.info(f"Market state unchanged and flat; skipping reasoning cycle. {performance_line}")
+            if not _wait_for_next_cycle():
+                break
+            continue
+        if hb_message is not None:
+            messages.append(hb_message)
+
         # Compose scheduler/heartbeat context with timestamp + performance
         context_update = f"{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')} {performance_line}\n REMINDER: check your plan and only update if needed."
         
@@ -411,30 +664,21 @@ def main():
         turn_count = 0
         
         enforced_prompt_inserted = False
+        finished_early = False
         while turn_count < max_turns:
             turn_count += 1
             print(f"{Fore.MAGENTA}🔄 Reasoning Turn {turn_count}{Style.RESET_ALL}")
             
             # Ask Ollama to decide on tool calls or provide final response
-            response: ChatResponse = chat(
-                model=MODEL,
-                messages=messages,
-                tools=tools,
-                stream=False
-            )
+            # First turn follows the new heartbeat, so it can never be a repeat
+            prefetch: dict = {}
+            response: ChatResponse = cached_chat(MODEL, messages, TOOL_SCHEMAS, use_cache=turn_count > 1, prefetch=prefetch)
             
             # If no tool calls, enforce planning tool usage once per cycle
             if not response.message.tool_calls:
                 content = response.message.content or ""
                 if not enforced_prompt_inserted:
-                    enforcement_msg = (
-                        "TOOL CALL ENFORCEMENT: Respond (if necessary) with ONLY tool_calls in this exact order and with these exact arguments. "
-                        "1) get_trading_plan_summary() with no arguments. "
-                        "2) update_trading_plan_tool(update_reason='market', content='Paused due to low volatility; resume when ADX>25 or ATR>1.5%/1H', section='risk'). "
-                        "3) record_trade_result(trade_type='hold', asset='BTC-USD', outcome='no_trade', profit_loss=0.0, lessons='No edge in stagnant regime'). "
-                        
-                    )
-                    messages.append({"role": "system", "content": enforcement_msg})
+                    messages.append({"role": "system", "content": ENFORCEMENT_MSG})
                     enforced_prompt_inserted = True
                     logger.info("Enforcement injected (no tool_calls): requesting planning tool calls.")
                     continue
@@ -446,6 +690,7 @@ def main():
             
             # Execute tool calls (support early end via done_tool)
             end_turn = False
+            done_note = ""
             for call in response.message.tool_calls:
                 fn_name = call.function.name
                 args = call.function.arguments or {}
@@ -453,10 +698,10 @@ def main():
                 print(f"{Fore.CYAN}🔧 Using tool: {fn_name}{Style.RESET_ALL}")
                 
                 # Safety check: only execute functions that are in the tools list
-                tool_functions = [tool.__name__ for tool in tools]
-                if fn_name in tool_functions:
+                if fn_name in TOOL_DISPATCH:
                     try:
-                        result = globals()[fn_name](**args)
+                        pending = prefetch.pop(_tool_call_key(fn_name, args), None)
+                        result = pending.result() if pending is not None else TOOL_DISPATCH[fn_name](**args)
                         # For done_tool, keep logging minimal
                         if fn_name != "done_tool":
                             print(f"{Fore.YELLOW}📊 Tool Result:\n{result[:500]}{'...' if len(result) > 500 else ''}{Style.RESET_ALL}")
@@ -469,6 +714,7 @@ def main():
                         })
                         if fn_name == "done_tool":
                             end_turn = True
+                            done_note = str(args.get("note") or "")
                             # Stop executing any further tool calls this turn
                             break
                     except Exception as e:
@@ -488,58 +734,30 @@ def main():
                         "content": error_msg
                     })
             if end_turn:
-                # Get a concise final assistant response and end the reasoning loop early
-                final_response: ChatResponse = chat(
-                    model=MODEL,
-                    messages=messages,
-                    stream=False
-                )
-                logger.info(f"🤖 AI Trading Agent (early done): {final_response.message.content}")
-                messages.append({"role": "assistant", "content": final_response.message.content})
+                # The model already said it is done: record its note instead of asking for a recap
+                final_content = f"Done: {done_note}" if done_note else "Done."
+                logger.info(f"🤖 AI Trading Agent (early done): {final_content}")
+                messages.append({"role": "assistant", "content": final_content})
+                finished_early = True
                 break
         
         # If we hit max turns, get final response
-        if turn_count >= max_turns:
+        if turn_count >= max_turns and not finished_early:
             logger.warning("Max reasoning turns reached. Getting final response...")
-            final_response: ChatResponse = chat(
-                model=MODEL,
-                messages=messages,
-                stream=False
-            )
+            final_response: ChatResponse = cached_chat(MODEL, messages)
             logger.info(f"🤖 AI Trading Agent: {final_response.message.content}")
             messages.append({"role": "assistant", "content": final_response.message.content})
         
+        _LAST_STATE_HASH = state_hash
+
         # Trim conversation buffer to prevent unbounded growth
         prev_len = len(messages)
-        messages = _trim_messages(messages, max_total=120, keep_tail=60)
+        messages = _trim_messages(messages, budget=CONTEXT_TOKEN_BUDGET)
         if len(messages) < prev_len:
             logger.info(f"Trimmed conversation: {prev_len} -> {len(messages)} messages")
         
-        import time
-        import datetime
-        if MANUAL_MODE:
-            logging.info("Manual mode cycle complete. Exiting without waiting.")
+        if not _wait_for_next_cycle():
             break
-        if SYNC_WAIT:
-            # Align sleep to the next candle boundary in UTC
-            period = int(WAIT_SECONDS)
-            now = datetime.datetime.now(datetime.timezone.utc)
-            ts = now.timestamp()
-            try:
-                import math
-                next_ts = math.ceil(ts / period) * period
-            except Exception:
-                # Fallback ceil without math
-                next_ts = int(-(-ts // period) * period)
-            sleep_s = max(1, int(next_ts - ts))
-            eta = datetime.datetime.fromtimestamp(next_ts, tz=datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
-            logging.info(f"sync wait: next candle in {sleep_s} seconds (until {eta} UTC)")
-            time.sleep(sleep_s)
-        else:
-            _unit = "minutes" if WAIT_SECONDS % 60 == 0 else "seconds"
-            _val = WAIT_SECONDS // 60 if _unit == "minutes" else WAIT_SECONDS
-            logging.info(f"next trade in {_val} {_unit}")
-            time.sleep(WAIT_SECONDS)
 
 
 if __name__ == "__main__":
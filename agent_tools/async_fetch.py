@@ -0,0 +1,55 @@
+# ===============================
+# async_fetch.py
+# Concurrent market snapshot (product info + candles) for the heartbeat
+# ===============================
+import asyncio
+import logging
+from typing import Any, Dict
+
+try:
+    from agent_tools.product_info import get_product_info
+    from helpers.base_candles import get_coinbase_candles_df
+except ImportError:
+    # Fallback: adjust sys.path when executed from different working directories
+    import os, sys
+    ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    from agent_tools.product_info import get_product_info  # type: ignore
+    from helpers.base_candles import get_coinbase_candles_df  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+
+async def product_info_async(client, product_id: str = "BTC-USD") -> Dict[str, Any]:
+    return await asyncio.to_thread(get_product_info, client, product_id)
+
+
+async def candles_async(product_id: str = "BTC-USD", granularity: str = "1H", limit: int = 300):
+    return await asyncio.to_thread(get_coinbase_candles_df, product_id, granularity, limit)
+
+
+async def fetch_snapshot(client, product_id: str = "BTC-USD", granularity: str = "1H", limit: int = 300) -> Dict[str, Any]:
+    """Fetch product info and candles concurrently.
+
+    Both underlying calls are TTL-cached, so the tool wrappers invoked later in the
+    same reasoning cycle (market info, ATR, signals) are served from the cache.
+    Errors are captured per-source; the snapshot never raises.
+    """
+    info, candles = await asyncio.gather(
+        product_info_async(client, product_id),
+        candles_async(product_id, granularity, limit),
+        return_exceptions=True,
+    )
+    if isinstance(info, BaseException):
+        logger.warning(f"Snapshot product info failed: {info}")
+        info = {"success": False, "error": str(info), "product_id": product_id}
+    if isinstance(candles, BaseException):
+        logger.warning(f"Snapshot candles failed: {candles}")
+        candles = None
+    return {
+        "product_id": product_id,
+        "granularity": granularity,
+        "product_info": info,
+        "candles": candles,
+    }
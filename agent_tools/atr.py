@@ -3,10 +3,11 @@
 # ===============================
 from typing import Dict
 import logging
-import pandas as pd
+import numpy as np
 try:
     from helpers.base_candles import get_coinbase_candles_df
     from helpers.indicators import atr_wilder
+    from helpers.indicator_state import ATR_STATE, advance_atr_state, seed_atr_state
 except ImportError:
     # Fallback: adjust sys.path when executed from different working directories
     import os, sys
@@ -15,35 +16,67 @@ except ImportError:
         sys.path.insert(0, ROOT)
     from helpers.base_candles import get_coinbase_candles_df  # type: ignore
     from helpers.indicators import atr_wilder  # type: ignore
+    from helpers.indicator_state import ATR_STATE, advance_atr_state, seed_atr_state  # type: ignore
 
 
 logger = logging.getLogger(__name__)
 
 
+def _hlc_arrays(df):
+    """(timestamp, high, low, close) as NumPy arrays with NaN rows removed."""
+    ts = df["timestamp"].to_numpy()
+    h = df["high"].to_numpy(dtype=np.float64, copy=False)
+    l = df["low"].to_numpy(dtype=np.float64, copy=False)
+    c = df["close"].to_numpy(dtype=np.float64, copy=False)
+    mask = ~(np.isnan(h) | np.isnan(l) | np.isnan(c))
+    if not mask.all():
+        ts, h, l, c = ts[mask], h[mask], l[mask], c[mask]
+    return ts, h, l, c
+
+
 def get_latest_atr(
     product_id: str = "BTC-USD",
     granularity: str = "1H",
     limit: int = 300,
     period: int = 14,
 ) -> Dict:
+    key = (product_id, granularity, period)
+    if key in ATR_STATE:
+        # Warm path: pull only the last few candles and apply one Wilder step
+        ts, h, l, c = _hlc_arrays(get_coinbase_candles_df(product_id, granularity, 3))
+        step = advance_atr_state(key, ts, h, l, c)
+        if step is not None:
+            atr_val, bars = step
+            return {
+                "product_id": product_id,
+                "granularity": granularity,
+                "period": period,
+                "bars": bars,
+                "atr": float(atr_val),
+                "price": float(c[-1]),
+                "limit": len(c),
+            }
+
+    # Cold start or gap: full recompute, then seed the state from the last closed bar
     # Ensure we have enough bars for Wilder ATR smoothing to avoid NaNs
     min_required = max(period + 1, period * 5)
     eff_limit = max(limit, min_required)
-    df = get_coinbase_candles_df(product_id, granularity, eff_limit)
-    df = df.dropna(subset=["high", "low", "close"]).reset_index(drop=True)
-    n = len(df)
-
-    atr_series = atr_wilder(pd.Series(df["high"].values), pd.Series(df["low"].values), pd.Series(df["close"].values), period)
-    s = pd.Series(atr_series)
-    if s.notna().any():
-        atr_val = float(s[s.notna()].iloc[-1])
+    ts, h, l, c = _hlc_arrays(get_coinbase_candles_df(product_id, granularity, eff_limit))
+    n = c.size
+
+    atr_arr = atr_wilder(h, l, c, period)
+    finite = atr_arr[~np.isnan(atr_arr)]
+    if finite.size:
+        atr_val = float(finite[-1])
     else:
         atr_val = float("nan")
         logger.warning(
             "ATR computation returned all-NaN: product=%s gran=%s limit=%s period=%s bars=%s",
             product_id, granularity, limit, period, n,
         )
-    price = float(df["close"].iloc[-1]) if n else float("nan")
+    if n >= 2 and not np.isnan(atr_arr[-2]):
+        seed_atr_state(key, ts[-2], atr_arr[-2], c[-2], n - 1)
+    price = float(c[-1]) if n else float("nan")
     return {
         "product_id": product_id,
         "granularity": granularity,
@@ -52,4 +85,4 @@ def get_latest_atr(
         "atr": atr_val,
         "price": price,
         "limit": eff_limit  # auto-bumped limit
-    }
\ No newline at end of file
+    }
@@ -3,11 +3,11 @@
 # ===============================
 from typing import Dict
 import pandas as pd
-from base_candles import get_coinbase_candles_df
+from multi_tf import fetch_multi_tf, last_closed_trend
 try:
-    from .indicators import ema, resampled_ema_trend
+    from .indicators import ema
 except ImportError:  # allow running as a script
-    from indicators import ema, resampled_ema_trend
+    from indicators import ema
 
 
 def get_ema_crossover_signal(
@@ -18,7 +18,9 @@ def get_ema_crossover_signal(
     confirm_timeframe: str = "6H",
     confirm_limit: int = 300,
 ) -> Dict:
-    df = get_coinbase_candles_df(product_id, granularity, limit)
+    frames = fetch_multi_tf(product_id, granularity, needs=[confirm_timeframe],
+                            limits={granularity: limit, confirm_timeframe: confirm_limit})
+    df = frames[granularity]
     close = pd.Series(df["close"].values)
     e20 = ema(close, 20)
     e50 = ema(close, 50)
@@ -31,9 +33,8 @@ def get_ema_crossover_signal(
         elif e20[-1] < e50[-1] * (1 - buffer_pct):
             state = -1
 
-    # HTF trend
-    idx = pd.to_datetime(df["datetime"].values)
-    htf_state = resampled_ema_trend(pd.Series(close.values, index=idx), idx, confirm_timeframe, 20, 50, 0.0)[-1]
+    # HTF trend from the locally resampled frame
+    htf_state = last_closed_trend(frames[confirm_timeframe], df["datetime"].iloc[-1], 20, 50, 0.0)
 
     return {
         "price": float(df["close"].iloc[-1]),
@@ -2,7 +2,7 @@
 # obv signal tool
 # ===============================
 from typing import Dict
-import pandas as pd
+import numpy as np
 from base_candles import get_coinbase_candles_df
 try:
     from indicators import obv, sma
@@ -17,10 +17,10 @@ def get_latest_obv(
     obv_ma_period: int = 20,
 ) -> Dict:
     df = get_coinbase_candles_df(product_id, granularity, limit)
-    close = pd.Series(df["close"].values)
-    vol = pd.Series(df["volume"].values)
+    close = df["close"].to_numpy(dtype=np.float64, copy=False)
+    vol = df["volume"].to_numpy(dtype=np.float64, copy=False)
     _obv = obv(close, vol)
-    _ma = sma(pd.Series(_obv), obv_ma_period)
+    _ma = sma(_obv, obv_ma_period)
     obv_val = float(_obv[-1])
     obv_ma = float(_ma[-1]) if len(_ma) else float("nan")
     return {
@@ -2,14 +2,16 @@
 # rsi signal tool
 # ===============================
 from typing import Dict
-import pandas as pd
+import math
 import numpy as np
 import logging
 from base_candles import get_coinbase_candles_df
 try:
-    from indicators import rsi_wilder
+    from indicators import rsi_averages, rsi_last_two
+    from indicator_state import RSI_STATE, advance_rsi_state, seed_rsi_state
 except ImportError:  # allow running as a script: python agent_tools/rsi_signal.py
-    from .indicators import rsi_wilder
+    from .indicators import rsi_averages, rsi_last_two
+    from .indicator_state import RSI_STATE, advance_rsi_state, seed_rsi_state
 
 logger = logging.getLogger(__name__)
 
@@ -22,31 +24,33 @@ def get_latest_rsi(
     long_threshold: float = 50.0,
     short_threshold: float = 50.0,
 ) -> Dict:
-    df = get_coinbase_candles_df(product_id, granularity, limit)
-    close = pd.Series(df["close"].values)
-    rsi = rsi_wilder(close, period)
-
-    # Use the last finite RSI value to avoid trailing NaNs when the latest bucket is incomplete
-    if len(rsi) == 0:
-        return {"rsi": float("nan"), "momentum_ok_for_long": False, "momentum_ok_for_short": False}
-
-    rsi_series = pd.Series(rsi)
-    finite_idx = np.where(~rsi_series.isna().to_numpy())[0]
-
-    if finite_idx.size == 0:
+    key = (product_id, granularity, period)
+    step = None
+    if key in RSI_STATE:
+        # Warm path: O(1) Wilder update from the last few candles
+        tail = get_coinbase_candles_df(product_id, granularity, 3)
+        close = tail["close"].to_numpy(dtype=np.float64, copy=False)
+        step = advance_rsi_state(key, tail["timestamp"].to_numpy(), close)
+    if step is not None:
+        val, prev_val = step
+    else:
+        df = get_coinbase_candles_df(product_id, granularity, limit)
+        close = df["close"].to_numpy(dtype=np.float64, copy=False)
+        # Last two finite RSI values: avoids trailing NaNs when the latest bucket is incomplete
+        val, prev_val = rsi_last_two(close, period)
+        # Seed from the last closed bar so the next call can take the warm path
+        ag, al = rsi_averages(close[:-1], period)
+        if math.isfinite(ag) and math.isfinite(al):
+            seed_rsi_state(key, df["timestamp"].to_numpy()[-2], ag, al, close[-2])
+    if not math.isfinite(val):
         logger.debug("RSI computation returned all NaN values (insufficient data?)")
         return {"rsi": float("nan"), "momentum_ok_for_long": False, "momentum_ok_for_short": False}
 
-    last_i = int(finite_idx[-1])
-    prev_i = int(finite_idx[-2]) if finite_idx.size >= 2 else last_i
-    val = float(rsi_series.iloc[last_i])
-    prev_val = float(rsi_series.iloc[prev_i])
-
     momentum_ok_for_long = bool(val > long_threshold and val > prev_val)
     momentum_ok_for_short = bool(val < short_threshold and val < prev_val)
 
     # Optional debug trace
-    logger.debug(f"RSI[{granularity}] {product_id}: last={val:.2f}, prev={prev_val:.2f}, len={len(rsi)}")
+    logger.debug("RSI[%s] %s: last=%.2f, prev=%.2f, len=%d", granularity, product_id, val, prev_val, len(close))
 
     return {"rsi": val, "momentum_ok_for_long": momentum_ok_for_long, "momentum_ok_for_short": momentum_ok_for_short}
 
@@ -16,32 +16,30 @@ import http.client
 from urllib.parse import urlencode
 import pandas as pd
 from datetime import datetime
-from coinbase.rest import RESTClient
 import uuid
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from helpers.coinbase_client import get_rest_client
+except ImportError:
+    # Fallback: adjust sys.path when executed from different working directories
+    import os, sys
+    ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    from helpers.coinbase_client import get_rest_client  # type: ignore
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 # Coinbase API setup via config.json
-import json
-CONFIG = {}
-try:
-    with open("config.json", "r") as f:
-        CONFIG = json.load(f)
-except Exception:
-    CONFIG = {}
-_cb = CONFIG.get("coinbase", {}) if isinstance(CONFIG.get("coinbase", {}), dict) else {}
-api_key = str(_cb.get("coinbase_api_key", CONFIG.get("coinbase_api_key", "")))
-api_secret = str(_cb.get("coinbase_api_secret", CONFIG.get("coinbase_api_secret", "")))
-if not api_key or not api_secret:
-    logger.warning("Coinbase API credentials are not set in config.json (coinbase.coinbase_api_key/coinbase.coinbase_api_secret)")
-
-# Initialize RESTClient for account-related operations
-client = RESTClient(api_key=api_key, api_secret=api_secret)
+client = get_rest_client()
 
 
+@functools.lru_cache(maxsize=1)
 def get_ai_portfolio_id():
-    """Get the UUID of the AI Trading Bot Portfolio"""
+    """Get the UUID of the AI Trading Bot Portfolio (memoized: it never changes within a process)"""
     try:
         portfolios_response = client.get_portfolios()
         
@@ -50,18 +48,34 @@ def get_ai_portfolio_id():
             for portfolio in portfolios:
                 if hasattr(portfolio, 'name') and getattr(portfolio, 'name', '') == "AI_Trading_Bot_Portfolio":
                     portfolio_uuid = getattr(portfolio, 'uuid', None)
-                    logger.info(f"Found AI Trading Bot Portfolio: {portfolio_uuid}")
+                    logger.info("Found AI Trading Bot Portfolio: %s", portfolio_uuid)
                     return portfolio_uuid
         
         logger.error("AI Trading Bot Portfolio not found")
         return None
         
     except Exception as e:
-        logger.error(f"Error getting portfolio ID: {str(e)}")
+        logger.error("Error getting portfolio ID: %s", e)
         return None
 
 
-def get_agent_orders(filter_status="ALL"):
+def _iter_order_pages(params):
+    """Yield each page of orders, requesting the next page before yielding the current one.
+
+    Pages are cursor-chained, so they cannot be fetched in parallel; the best overlap
+    is having page N+1 in flight while the caller processes page N.
+    """
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="orders-page") as pool:
+        pending = pool.submit(client.list_orders, **params)
+        while pending is not None:
+            resp = pending.result()
+            pending = None
+            if getattr(resp, "has_next", False):
+                pending = pool.submit(client.list_orders, **{**params, "cursor": resp.cursor})
+            yield resp.orders
+
+
+def get_agent_order_records(filter_status="ALL"):
     """
     Get orders from the AI Trading Bot Portfolio with optional status filtering.
     
@@ -73,7 +87,8 @@ def get_agent_orders(filter_status="ALL"):
             - 'CANCELED': Only canceled orders
             
     Returns:
-        pd.DataFrame: DataFrame containing the filtered orders
+        list[dict]: One dict per order (order_id, product_id, side, status,
+        created_time, filled_size, average_filled_price)
     """
     # Map filter values to status values expected by the API
     status_map = {
@@ -88,49 +103,72 @@ def get_agent_orders(filter_status="ALL"):
 
     
     portfolio_id = get_ai_portfolio_id()
-    all_orders = []
-    cursor = None
-
-    while True:
-        # Prepare request parameters
-        params = {
-            'limit': 100,
-            'cursor': cursor,
-            'retail_portfolio_id': portfolio_id,  # optional if your key is portfolio-scoped
-            'order_status': status_map[filter_status] if filter_status != 'ALL' else None
-        }
-        
-        # Remove None values from params
-        params = {k: v for k, v in params.items() if v is not None}
-        
-        # Make the API request
-        resp = client.list_orders(**params)
-        all_orders.extend(resp.orders)
+    if portfolio_id is None:
+        # Don't pin a failed lookup; retry on the next call
+        get_ai_portfolio_id.cache_clear()
+    # Prepare request parameters
+    params = {
+        'limit': 100,
+        'retail_portfolio_id': portfolio_id,  # optional if your key is portfolio-scoped
+        'order_status': status_map[filter_status] if filter_status != 'ALL' else None
+    }
 
-        if not getattr(resp, "has_next", False):
-            break
-        cursor = resp.cursor
-    
-    # Convert to pandas DataFrame
-    if not all_orders:
-        return pd.DataFrame()
-    
-    # Extract useful fields from each order
+    # Remove None values from params
+    params = {k: v for k, v in params.items() if v is not None}
+
+    # Extract useful fields from each order while the next page is being fetched
     orders_data = []
-    for order in all_orders:
-        order_dict = {
-            "order_id": getattr(order, "order_id", "Unknown"),
-            "product_id": getattr(order, "product_id", "Unknown"),
-            "side": getattr(order, "side", "Unknown"),
-            "status": getattr(order, "status", "Unknown"),
-            "created_time": getattr(order, "created_time", None),
-            "filled_size": getattr(order, "filled_size", "0"),
-            "average_filled_price": getattr(order, "average_filled_price", "0")
-        }
-        orders_data.append(order_dict)
-    
-    # Create DataFrame
-    return pd.DataFrame(orders_data)
+    try:
+        for page in _iter_order_pages(params):
+            orders_data.extend(
+                {
+                    "order_id": getattr(order, "order_id", "Unknown"),
+                    "product_id": getattr(order, "product_id", "Unknown"),
+                    "side": getattr(order, "side", "Unknown"),
+                    "status": getattr(order, "status", "Unknown"),
+                    "created_time": getattr(order, "created_time", None),
+                    "filled_size": getattr(order, "filled_size", "0"),
+                    "average_filled_price": getattr(order, "average_filled_price", "0")
+                }
+                for order in page
+            )
+    except Exception:
+        # A stale/wrong portfolio id is one cause; look it up again next time
+        get_ai_portfolio_id.cache_clear()
+        raise
+
+    return orders_data
+
+
+def as_dataframe(orders_data):
+    """Convert order records from get_agent_order_records into a DataFrame."""
+    if not orders_data:
+        return pd.DataFrame()
+    return pd.DataFrame.from_records(orders_data)
+
+
+def get_agent_orders(filter_status="ALL"):
+    """
+    Get orders from the AI Trading Bot Portfolio as a DataFrame.
+
+    Args:
+        filter_status (str): 'ALL', 'OPEN', 'FILLED' or 'CANCELED'
+
+    Returns:
+        pd.DataFrame: DataFrame containing the filtered orders
+    """
+    return as_dataframe(get_agent_order_records(filter_status=filter_status))
+
+
+ORDER_TEMPLATE = (
+    "Order ID: {order_id}\n"
+    "  Product: {product_id}\n"
+    "  Side: {side}\n"
+    "  Status: {status}\n"
+    "  Created: {created_time}\n"
+    "  Filled Size: {filled_size}\n"
+    "  Avg Price: ${average_filled_price}\n"
+)
 
 
 def list_agent_orders(filter_status: str = "ALL") -> str:
@@ -149,29 +187,23 @@ def list_agent_orders(filter_status: str = "ALL") -> str:
         str: Formatted string summary of orders or error message
     """
     try:
-        orders_df = get_agent_orders(filter_status=filter_status)
+        orders = get_agent_order_records(filter_status=filter_status)
         
-        if orders_df.empty:
+        if not orders:
             return f"No {filter_status.lower()} orders found in AI Trading Bot Portfolio."
         
-        # Create a summary string
-        summary = f"\n📊 AI Trading Bot Portfolio Orders ({filter_status}):\n"
-        summary += f"Total orders: {len(orders_df)}\n\n"
-        
-        # Add details for each order
-        for _, order in orders_df.iterrows():
-            summary += f"Order ID: {order['order_id']}\n"
-            summary += f"  Product: {order['product_id']}\n"
-            summary += f"  Side: {order['side']}\n"
-            summary += f"  Status: {order['status']}\n"
-            summary += f"  Created: {order['created_time']}\n"
-            summary += f"  Filled Size: {order['filled_size']}\n"
-            summary += f"  Avg Price: ${order['average_filled_price']}\n\n"
-        
-        return summary
+        # Create a summary string with details for each order
+        lines = [
+            f"\n📊 AI Trading Bot Portfolio Orders ({filter_status}):",
+            f"Total orders: {len(orders)}",
+            "",
+        ]
+        lines.extend(ORDER_TEMPLATE.format_map(order) for order in orders)
+        lines.append("")
+        return "\n".join(lines)
         
     except Exception as e:
-        logger.error(f"Error listing agent orders: {str(e)}")
+        logger.error("Error listing agent orders: %s", e)
         return f"❌ Error listing agent orders: {str(e)}"
 
 
@@ -187,6 +219,8 @@ def get_list_orders_tool():
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    get_ai_portfolio_id()  # warm the portfolio id cache
     logger.info("Getting agent orders...")
     orders_summary = list_agent_orders(filter_status='CANCELED')
     logger.info(orders_summary)
@@ -8,18 +8,54 @@ past decisions across multiple trading sessions.
 """
 
 import os
+import re
 import json
 import logging
 from datetime import datetime
 from typing import Dict, Any, Optional
 
 # Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Plan file path
 PLAN_FILE_PATH = os.path.join(os.path.dirname(__file__), "..", "trading_plan.md")
 
+# Plan section headers by update section name
+SECTION_MARKERS = {
+    "strategy": "## Current Trading Strategy",
+    "risk_management": "## Risk Management Rules",
+    "market_assessment": "## Market Assessment",
+    "performance": "## Performance Tracking",
+    "lessons": "## Lessons Learned",
+    "objectives": "## Trading Objectives",
+    "general": "## Recent Updates"
+}
+
+# Compiled "header line through the end of its section" patterns, per marker
+_SECTION_RE: Dict[str, "re.Pattern[str]"] = {}
+
+def _section_re(marker: str) -> "re.Pattern[str]":
+    pattern = _SECTION_RE.get(marker)
+    if pattern is None:
+        # Section body runs up to the newline before the next "## " header, or the end of the plan
+        pattern = _SECTION_RE[marker] = re.compile(rf"^{re.escape(marker)}.*?(?=\n## |\Z)", re.MULTILINE | re.DOTALL)
+    return pattern
+
+def _read_plan_or_default():
+    """Return (plan text, existed): one open attempt, default template when the file is missing."""
+    try:
+        with open(PLAN_FILE_PATH, 'r', encoding='utf-8') as f:
+            return f.read(), True
+    except FileNotFoundError:
+        return create_default_plan(), False
+
+def _write_plan(plan: str) -> None:
+    """Replace the plan file atomically (temp file + os.replace) with a single write."""
+    tmp_path = PLAN_FILE_PATH + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8', buffering=1 << 16) as f:
+        f.write(plan)
+    os.replace(tmp_path, PLAN_FILE_PATH)
+
 def get_current_plan() -> str:
     """
     Retrieve the current trading plan for agent context.
@@ -28,16 +64,12 @@ def get_current_plan() -> str:
         str: Current trading plan content or default template if none exists
     """
     try:
-        if os.path.exists(PLAN_FILE_PATH):
-            with open(PLAN_FILE_PATH, 'r', encoding='utf-8') as f:
-                plan_content = f.read()
+        plan_content, existed = _read_plan_or_default()
+        if existed:
             logger.info("Retrieved current trading plan")
-            return plan_content
         else:
-            # Return default template if no plan exists
-            default_plan = create_default_plan()
             logger.info("No existing plan found, returning default template")
-            return default_plan
+        return plan_content
             
     except Exception as e:
         error_msg = f"Error reading trading plan: {str(e)}"
@@ -58,48 +90,26 @@ def update_trading_plan(update_reason: str, content: str, section: str = "genera
     """
     try:
         # Get current plan or create default
-        current_plan = get_current_plan() if os.path.exists(PLAN_FILE_PATH) else create_default_plan()
+        current_plan, _ = _read_plan_or_default()
         
         # Create update entry
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         update_entry = f"\n### Update: {timestamp}\n**Reason:** {update_reason}\n**Section:** {section}\n\n{content}\n\n---\n"
         
-        # Determine where to insert the update based on section
-        section_markers = {
-            "strategy": "## Current Trading Strategy",
-            "risk_management": "## Risk Management Rules", 
-            "market_assessment": "## Market Assessment",
-            "performance": "## Performance Tracking",
-            "lessons": "## Lessons Learned",
-            "objectives": "## Trading Objectives",
-            "general": "## Recent Updates"
-        }
-        
         # Find the appropriate section or add to Recent Updates
-        target_marker = section_markers.get(section, "## Recent Updates")
+        target_marker = SECTION_MARKERS.get(section, "## Recent Updates")
         
-        if target_marker in current_plan:
-            # Insert after the section header
-            parts = current_plan.split(target_marker)
-            if len(parts) >= 2:
-                # Find the next section or end of file
-                remaining = parts[1]
-                next_section_pos = remaining.find("\n## ")
-                if next_section_pos != -1:
-                    before_next = remaining[:next_section_pos]
-                    after_next = remaining[next_section_pos:]
-                    updated_plan = parts[0] + target_marker + before_next + update_entry + after_next
-                else:
-                    updated_plan = parts[0] + target_marker + remaining + update_entry
-            else:
-                updated_plan = current_plan + update_entry
+        match = _section_re(target_marker).search(current_plan)
+        if match:
+            # Insert at the end of the section, i.e. before the next section header
+            end = match.end()
+            updated_plan = current_plan[:end] + update_entry + current_plan[end:]
         else:
             # Add new section if it doesn't exist
             updated_plan = current_plan + f"\n{target_marker}\n{update_entry}"
         
         # Write updated plan
-        with open(PLAN_FILE_PATH, 'w', encoding='utf-8') as f:
-            f.write(updated_plan)
+        _write_plan(updated_plan)
         
         success_msg = f"✅ Trading plan updated successfully! Added {section} update: {update_reason}"
         logger.info(success_msg)
@@ -246,7 +256,7 @@ if __name__ == "__main__":
     # Test getting current plan
     logger.info("\n1. Getting current plan...")
     plan = get_current_plan()
-    logger.info(f"Plan length: {len(plan)} characters")
+    logger.info("Plan length: %d characters", len(plan))
     
     # Test updating plan
     logger.info("\n2. Testing plan update...")
@@ -1,25 +1,43 @@
-import json
 import logging
-from coinbase.rest import RESTClient
 from typing import Dict, Any, Optional, List
 
+try:
+    from helpers.cache import ttl_cache
+    from helpers.coinbase_client import get_rest_client
+    from helpers.fast_json import dumps as json_dumps
+except ImportError:
+    # Fallback: adjust sys.path when executed from different working directories
+    import os, sys
+    ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    from helpers.cache import ttl_cache  # type: ignore
+    from helpers.coinbase_client import get_rest_client  # type: ignore
+    from helpers.fast_json import dumps as json_dumps  # type: ignore
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
-CONFIG = {}
-try:
-    with open("config.json", "r") as f:
-        CONFIG = json.load(f)
-except Exception:
-    CONFIG = {}
-_cb = CONFIG.get("coinbase", {}) if isinstance(CONFIG.get("coinbase", {}), dict) else {}
-api_key = str(_cb.get("coinbase_api_key", CONFIG.get("coinbase_api_key", "")))
-api_secret = str(_cb.get("coinbase_api_secret", CONFIG.get("coinbase_api_secret", "")))
-if not api_key or not api_secret:
-    logger.warning("Coinbase API credentials are not set in config.json (coinbase.coinbase_api_key/coinbase.coinbase_api_secret)")
-client = RESTClient(api_key=api_key, api_secret=api_secret)
+client = get_rest_client()
 
+# (response attribute, result key, cast, value when missing/unparseable)
+_FIELDS = (
+    ("price", "price", float, None),
+    ("price_percentage_change_24h", "price_change_24h_percent", float, None),
+    ("volume_24h", "volume_24h", float, None),
+    ("base_display_symbol", "base_currency", str, None),
+    ("quote_display_symbol", "quote_currency", str, None),
+    ("trading_disabled", "trading_disabled", bool, False),
+)
 
+# Short TTL: the heartbeat and the market-info tool usually ask for the same
+# product within seconds of each other. Failed lookups are not cached.
+@ttl_cache(
+    ttl=10,
+    key=lambda client, product_id: product_id,
+    on_hit=dict,
+    should_cache=lambda r: bool(r.get("success")),
+)
 def get_product_info(client, product_id: str = "BTC-USD") -> Dict[str, Any]:
     """
     Get essential product information from Coinbase Advanced Trade API
@@ -36,26 +54,29 @@ def get_product_info(client, product_id: str = "BTC-USD") -> Dict[str, Any]:
         product_response = client.get_product(product_id)
         
         # Extract only essential information
-        current_price = float(getattr(product_response, 'price', 0)) if getattr(product_response, 'price', None) else None
-        price_change_24h_percent = float(getattr(product_response, 'price_percentage_change_24h', 0)) if getattr(product_response, 'price_percentage_change_24h', None) else None
-        volume_24h = float(getattr(product_response, 'volume_24h', 0)) if getattr(product_response, 'volume_24h', None) else None
+        result: Dict[str, Any] = {
+            "success": True,
+            "product_id": product_id,
+            "price": None,
+            "price_change_24h": None,
+        }
+        for src, dst, cast, default in _FIELDS:
+            value = getattr(product_response, src, None)
+            if value is None or value == "":
+                result[dst] = default
+                continue
+            try:
+                result[dst] = cast(value)
+            except (TypeError, ValueError):
+                result[dst] = default
         
         # Calculate price change in absolute terms
-        price_change_24h_absolute = None
+        current_price = result["price"]
+        price_change_24h_percent = result["price_change_24h_percent"]
         if current_price and price_change_24h_percent is not None:
-            price_change_24h_absolute = round((current_price * price_change_24h_percent) / 100, 2)
+            result["price_change_24h"] = round((current_price * price_change_24h_percent) / 100, 2)
         
-        return {
-            "success": True,
-            "product_id": product_id,
-            "price": current_price,
-            "price_change_24h": price_change_24h_absolute,
-            "price_change_24h_percent": price_change_24h_percent,
-            "volume_24h": volume_24h,
-            "base_currency": getattr(product_response, 'base_display_symbol', None),
-            "quote_currency": getattr(product_response, 'quote_display_symbol', None),
-            "trading_disabled": getattr(product_response, 'trading_disabled', False)
-        }
+        return result
         
     except Exception as e:
         return {
@@ -67,6 +88,7 @@ def get_product_info(client, product_id: str = "BTC-USD") -> Dict[str, Any]:
 
 # Test the function
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     # Get single product information
     product_info = get_product_info(client, "BTC-USD")
-    logger.info(json.dumps(product_info, indent=2))
\ No newline at end of file
+    logger.info(json_dumps(product_info, indent=True))
\ No newline at end of file
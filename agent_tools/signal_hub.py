@@ -4,23 +4,32 @@
 # ===============================
 from typing import Dict, Any
 import logging
-import json
+import math
+import re
 import numpy as np
-import pandas as pd
 
 try:
-    from helpers.base_candles import get_coinbase_candles_df
+    from helpers.multi_tf import fetch_multi_tf, last_closed_trend
+    from helpers.fast_json import dumps as _json_dumps
 except ImportError:
     import os, sys
     ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
     if ROOT not in sys.path:
         sys.path.insert(0, ROOT)
-    from helpers.base_candles import get_coinbase_candles_df  # type: ignore
+    from helpers.multi_tf import fetch_multi_tf, last_closed_trend  # type: ignore
+    from helpers.fast_json import dumps as _json_dumps  # type: ignore
+try:
+    from helpers._signals_kernel import signals_last
+except ImportError:  # fallback when executed with different CWD
+    import os, sys
+    ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    from helpers._signals_kernel import signals_last  # type: ignore
 try:
     from helpers.indicators import (
         rsi_wilder,
         ema,
-        resampled_ema_trend,
         obv as obv_calc,
         sma,
         atr_wilder,
@@ -33,7 +42,6 @@ except ImportError:  # fallback when executed with different CWD
     from helpers.indicators import (  # type: ignore
         rsi_wilder,
         ema,
-        resampled_ema_trend,
         obv as obv_calc,
         sma,
         atr_wilder,
@@ -42,30 +50,53 @@ except ImportError:  # fallback when executed with different CWD
 logger = logging.getLogger(__name__)
 
 
+_ALIASES = {
+    "1MIN": "1M", "1MINUTE": "1M", "ONE_MIN": "1M", "ONE_MINUTE": "1M",
+    "5MIN": "5M", "5MINUTE": "5M",
+    "15MIN": "15M", "15MINUTE": "15M",
+    "1HR": "1H", "1 H": "1H", "ONE_HOUR": "1H",
+    "6HR": "6H", "6 H": "6H",
+    "1DAY": "1D", "1 D": "1D", "ONE_DAY": "1D",
+}
+_VALID = frozenset({"1M", "5M", "15M", "1H", "6H", "1D"})
+_SUFFIX_RE = re.compile(r"MIN|HR|DAY|\s+")
+_SUFFIX_MAP = {"MIN": "M", "HR": "H", "DAY": "D"}
+
+
 def _normalize_granularity(g: str) -> str:
     if not g:
         return "1H"
     m = g.strip().upper()
-    aliases = {
-        "1MIN": "1M", "1MINUTE": "1M", "ONE_MIN": "1M", "ONE_MINUTE": "1M",
-        "5MIN": "5M", "5MINUTE": "5M",
-        "15MIN": "15M", "15MINUTE": "15M",
-        "1HR": "1H", "1 H": "1H", "ONE_HOUR": "1H",
-        "6HR": "6H", "6 H": "6H",
-        "1DAY": "1D", "1 D": "1D", "ONE_DAY": "1D",
-    }
-    if m in aliases:
-        return aliases[m]
-    if m in {"1M", "5M", "15M", "1H", "6H", "1D"}:
+    if m in _VALID:
         return m
-    return m.replace("MIN", "M").replace("HR", "H").replace("DAY", "D").replace(" ", "")
+    alias = _ALIASES.get(m)
+    if alias is not None:
+        return alias
+    return _SUFFIX_RE.sub(lambda mo: _SUFFIX_MAP.get(mo.group(0), ""), m)
 
 
-def _last_finite(series: pd.Series) -> float:
-    idx = np.where(~series.isna().to_numpy())[0]
-    if idx.size == 0:
+def _last_finite(values) -> float:
+    a = np.asarray(values, dtype=np.float64)
+    mask = np.isfinite(a)
+    if not mask.any():
         return float("nan")
-    return float(series.iloc[int(idx[-1])])
+    # argmax on the reversed mask finds the last finite index without building an index array
+    return float(a[mask.size - 1 - int(np.argmax(mask[::-1]))])
+
+
+def _indicators_last(close, high, low, vol, rsi_period, ema_fast, ema_slow, obv_ma_period, atr_period):
+    """NaN-aware path: full indicator series, then the last (finite) values."""
+    rsi_value = _last_finite(rsi_wilder(close, rsi_period))
+    ef = ema(close, ema_fast)
+    es = ema(close, ema_slow)
+    ema_fast_val = float(ef[-1]) if len(ef) else float("nan")
+    ema_slow_val = float(es[-1]) if len(es) else float("nan")
+    obv_vals = obv_calc(close, vol)
+    obv_last = float(obv_vals[-1]) if len(obv_vals) else float("nan")
+    obv_ma_vals = sma(obv_vals, obv_ma_period)
+    obv_ma_last = float(obv_ma_vals[-1]) if len(obv_ma_vals) else float("nan")
+    atr_value = _last_finite(atr_wilder(high, low, close, atr_period))
+    return rsi_value, ema_fast_val, ema_slow_val, obv_last, obv_ma_last, atr_value
 
 
 def get_signals_tool(
@@ -97,24 +128,25 @@ def get_signals_tool(
     """
     try:
         granularity = _normalize_granularity(granularity)
-        # resampling rule prefers lowercase (pandas)
-        confirm_rule = confirm_timeframe.strip().lower() if confirm_timeframe else "6h"
+        confirm_gran = _normalize_granularity(confirm_timeframe) if confirm_timeframe else "6H"
 
-        df = get_coinbase_candles_df(product_id, granularity, limit)
+        # Single fetch at the base granularity; the HTF frame is resampled locally
+        frames = fetch_multi_tf(product_id, granularity, needs=[confirm_gran], limits={granularity: limit})
+        df = frames[granularity]
         if df is None or df.empty:
             return f"Error: No candle data for {product_id} @ {granularity}"
 
-        close = pd.Series(df["close"].values)
-        high = pd.Series(df["high"].values)
-        low = pd.Series(df["low"].values)
-        vol = pd.Series(df["volume"].values)
-        idx = pd.to_datetime(df["datetime"].values)
+        close, high, low, vol = (df[c].to_numpy(dtype=np.float64, copy=False) for c in ("close", "high", "low", "volume"))
+
+        if np.isfinite(close).all() and np.isfinite(high).all() and np.isfinite(low).all() and np.isfinite(vol).all():
+            # One fused pass over the candles for every indicator's last value
+            last = signals_last(close, high, low, vol, rsi_period, ema_fast, ema_slow, obv_ma_period, atr_period)
+        else:
+            last = _indicators_last(close, high, low, vol, rsi_period, ema_fast, ema_slow, obv_ma_period, atr_period)
+        rsi_value, ema_fast_val, ema_slow_val, obv_last, obv_ma_last, atr_value = (float(x) for x in last)
 
         # --- RSI ---
-        rsi_vals = rsi_wilder(close, rsi_period)
-        rsi_series = pd.Series(rsi_vals)
-        rsi_value = _last_finite(rsi_series)
-        if not np.isfinite(rsi_value):
+        if not math.isfinite(rsi_value):
             rsi_state = "unavailable"
         elif rsi_value <= rsi_oversold:
             rsi_state = "oversold"
@@ -124,76 +156,67 @@ def get_signals_tool(
             rsi_state = "neutral"
 
         # --- EMA crossover ---
-        ef = ema(close, ema_fast)
-        es = ema(close, ema_slow)
-        ema_fast_val = float(ef[-1]) if len(ef) else float("nan")
-        ema_slow_val = float(es[-1]) if len(es) else float("nan")
         ema_state = "neutral"
-        if np.isfinite(ema_fast_val) and np.isfinite(ema_slow_val):
+        if math.isfinite(ema_fast_val) and math.isfinite(ema_slow_val):
             if ema_fast_val > ema_slow_val * (1 + buffer_pct):
                 ema_state = "bullish"
             elif ema_fast_val < ema_slow_val * (1 - buffer_pct):
                 ema_state = "bearish"
-        # HTF confirmation via resample of existing series
-        htf_arr = resampled_ema_trend(pd.Series(close.values, index=idx), idx, confirm_rule, ema_fast, ema_slow, 0.0)
-        htf_state_val = int(htf_arr[-1]) if len(htf_arr) else 0
+        # HTF confirmation from the locally resampled frame (last closed bucket)
+        htf_state_val = last_closed_trend(frames[confirm_gran], df["datetime"].iloc[-1], ema_fast, ema_slow, 0.0)
         htf_state = "bull" if htf_state_val == 1 else ("bear" if htf_state_val == -1 else "neutral")
 
         # --- OBV ---
-        obv_vals = obv_calc(close, vol)
-        obv_last = float(obv_vals[-1]) if len(obv_vals) else float("nan")
-        obv_ma_vals = sma(pd.Series(obv_vals), obv_ma_period)
-        obv_ma_last = float(obv_ma_vals[-1]) if len(obv_ma_vals) else float("nan")
         obv_state = "neutral"
-        if np.isfinite(obv_last) and np.isfinite(obv_ma_last):
+        if math.isfinite(obv_last) and math.isfinite(obv_ma_last):
             if obv_last > obv_ma_last:
                 obv_state = "confirms"
             elif obv_last < obv_ma_last:
                 obv_state = "denies"
 
         # --- ATR (optional) ---
-        atr_value = None
-        if include_atr:
-            atrvals = atr_wilder(high, low, close, atr_period)
-            atr_series = pd.Series(atrvals)
-            atr_value = _last_finite(atr_series)
+        if not include_atr:
+            atr_value = None
+
+        price = float(close[-1]) if len(close) else float("nan")
 
-        price = float(close.iloc[-1]) if len(close) else float("nan")
+        rsi_out = round(rsi_value, 2) if math.isfinite(rsi_value) else None
+        atr_out = round(atr_value, 2) if (include_atr and math.isfinite(atr_value)) else None
 
         payload: Dict[str, Any] = {
             "product_id": product_id,
             "granularity": granularity,
             "price": price,
             "rsi": {
-                "value": round(rsi_value, 2) if np.isfinite(rsi_value) else None,
+                "value": rsi_out,
                 "state": rsi_state,
                 "period": rsi_period,
                 "oversold": rsi_oversold,
                 "overbought": rsi_overbought,
             },
             "ema": {
-                "fast": round(ema_fast_val, 2) if np.isfinite(ema_fast_val) else None,
-                "slow": round(ema_slow_val, 2) if np.isfinite(ema_slow_val) else None,
+                "fast": round(ema_fast_val, 2) if math.isfinite(ema_fast_val) else None,
+                "slow": round(ema_slow_val, 2) if math.isfinite(ema_slow_val) else None,
                 "state": ema_state,
                 "htf": htf_state,
                 "buffer_pct": buffer_pct,
             },
             "obv": {
-                "value": round(obv_last, 2) if np.isfinite(obv_last) else None,
-                "ma": round(obv_ma_last, 2) if np.isfinite(obv_ma_last) else None,
+                "value": round(obv_last, 2) if math.isfinite(obv_last) else None,
+                "ma": round(obv_ma_last, 2) if math.isfinite(obv_ma_last) else None,
                 "state": obv_state,
                 "ma_period": obv_ma_period,
             },
-            "atr": (round(atr_value, 2) if (include_atr and np.isfinite(atr_value)) else None),
+            "atr": atr_out,
         }
 
         if return_format.lower() == "json":
-            return json.dumps(payload, separators=(",", ":"))
+            return _json_dumps(payload)
 
         # concise summary
         parts = [
             f"Signals for {product_id} @ {granularity}:",
-            f"RSI={payload['rsi']['value'] if payload['rsi']['value'] is not None else 'NA'} ({rsi_state})",
+            f"RSI={rsi_out if rsi_out is not None else 'NA'} ({rsi_state})",
             (
                 f"EMA{ema_fast}>{ema_slow} (bullish)" if ema_state == "bullish" else
                 (f"EMA{ema_fast}<{ema_slow} (bearish)" if ema_state == "bearish" else "EMA neutral")
@@ -203,8 +226,8 @@ def get_signals_tool(
                 ("OBV<MA (denies)" if obv_state == "denies" else "OBV neutral")
             ),
         ]
-        if include_atr and payload["atr"] is not None:
-            parts.append(f"ATR={payload['atr']}")
+        if atr_out is not None:
+            parts.append(f"ATR={atr_out}")
         return " | ".join(parts)
 
     except Exception as e:
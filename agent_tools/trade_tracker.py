@@ -8,17 +8,193 @@ calculates P&L, and provides performance analytics.
 
 import sqlite3
 import os
-import json
 import logging
-from datetime import datetime, timezone
-from typing import Dict, Any, List, Optional
-import pandas as pd
+import atexit
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+try:
+    from helpers.fast_json import dumps as json_dumps, loads as json_loads
+except ImportError:
+    # Fallback: adjust sys.path when executed from different working directories
+    import sys
+    ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    from helpers.fast_json import dumps as json_dumps, loads as json_loads  # type: ignore
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 # Note: No Coinbase client is required for DB-based tracking.
 
+# Hot-path statements, kept as one literal each so their prepared forms stay
+# in the connection's statement cache (keyed by SQL text) between calls
+_INSERT_TRADE_SQL = '''
+    INSERT INTO trades (
+        trade_id, strategy, product_id, side, entry_price, quantity,
+        entry_time, entry_time_us, entry_order_id, strategy_context, notes
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+_LATEST_OPEN_BY_PRODUCT_SQL = (
+    'SELECT * FROM trades WHERE product_id = ? AND status = "open" '
+    'ORDER BY entry_time_us DESC LIMIT 1'
+)
+_LATEST_OPEN_BY_STRATEGY_PRODUCT_SQL = (
+    'SELECT * FROM trades WHERE product_id = ? AND strategy = ? AND status = "open" '
+    'ORDER BY entry_time_us DESC LIMIT 1'
+)
+# Narrow projection for the exit path and the minimal open-trade lookup, which never
+# need strategy_context / notes (growing TEXT) or the other columns
+_OPEN_TRADE_MINIMAL_COLUMNS = "trade_id, strategy, side, entry_price, quantity, entry_time_us"
+_EXIT_TRADE_BY_ID_SQL = (
+    f'SELECT {_OPEN_TRADE_MINIMAL_COLUMNS} FROM trades WHERE trade_id = ? AND status = "open"'
+)
+_EXIT_LATEST_BY_PRODUCT_SQL = (
+    f'SELECT {_OPEN_TRADE_MINIMAL_COLUMNS} FROM trades WHERE product_id = ? AND status = "open" '
+    'ORDER BY entry_time_us DESC LIMIT 1'
+)
+# Latest open trade of the preferred strategy, else the latest of any strategy,
+# in one lookup (the product's open trades are few, so the sort is cheap)
+_LATEST_OPEN_PREFERRING_STRATEGY_SQL = (
+    'SELECT * FROM trades WHERE product_id = ? AND status = "open" '
+    'ORDER BY (strategy = ?) DESC, entry_time_us DESC LIMIT 1'
+)
+_MINIMAL_OPEN_PREFERRING_STRATEGY_SQL = (
+    f'SELECT {_OPEN_TRADE_MINIMAL_COLUMNS} FROM trades WHERE product_id = ? AND status = "open" '
+    'ORDER BY (strategy = ?) DESC, entry_time_us DESC LIMIT 1'
+)
+_REALIZED_PNL_SQL = '''
+    SELECT COALESCE(SUM(CASE WHEN strategy = ? THEN realized_pnl END), 0),
+           COALESCE(SUM(realized_pnl), 0)
+    FROM trades WHERE product_id = ? AND status = 'closed'
+'''
+_CLOSE_TRADE_SQL = '''
+    UPDATE trades SET 
+        exit_price = ?, exit_time = ?, exit_time_us = ?, exit_order_id = ?,
+        fees_paid = ?, realized_pnl = ?, status = 'closed',
+        updated_at = CURRENT_TIMESTAMP
+    WHERE trade_id = ?
+'''
+
+# Running totals; every right-hand side sees the row's previous values.
+# Drawdown stays exact: the new cumulative P&L against the running peak.
+_STRATEGY_INCREMENT_SQL = '''
+    UPDATE strategy_performance SET
+        total_trades = total_trades + 1,
+        winning_trades = winning_trades + (:pnl > 0),
+        losing_trades = losing_trades + (:pnl < 0),
+        total_pnl = total_pnl + :pnl,
+        total_fees = total_fees + :fees,
+        sum_wins = sum_wins + MAX(:pnl, 0),
+        sum_losses = sum_losses + MIN(:pnl, 0),
+        cum_pnl = cum_pnl + :pnl,
+        peak_pnl = MAX(peak_pnl, cum_pnl + :pnl),
+        max_drawdown = MAX(max_drawdown, MAX(peak_pnl, cum_pnl + :pnl) - (cum_pnl + :pnl)),
+        last_updated = CURRENT_TIMESTAMP
+    WHERE strategy = :strategy AND cum_pnl IS NOT NULL
+'''
+_STRATEGY_DERIVED_SQL = '''
+    UPDATE strategy_performance SET
+        win_rate = winning_trades * 100.0 / total_trades,
+        avg_win = CASE WHEN winning_trades > 0 THEN sum_wins / winning_trades ELSE 0 END,
+        avg_loss = CASE WHEN losing_trades > 0 THEN sum_losses / losing_trades ELSE 0 END
+    WHERE strategy = ?
+'''
+
+# Aggregate a strategy's closed trades in one scan; drawdown is the
+# largest drop of cumulative P&L from its running peak, in close order
+_STRATEGY_RECOMPUTE_SQL = '''
+    WITH c AS (
+        SELECT realized_pnl AS pnl, fees_paid AS fees,
+               SUM(realized_pnl) OVER w AS cum,
+               ROW_NUMBER() OVER w AS k
+        FROM trades
+        WHERE strategy = ? AND status = 'closed' AND realized_pnl IS NOT NULL
+        WINDOW w AS (ORDER BY exit_time_us, rowid ROWS UNBOUNDED PRECEDING)
+    ), d AS (
+        SELECT pnl, fees, cum, MAX(cum) OVER (ORDER BY k ROWS UNBOUNDED PRECEDING) AS peak
+        FROM c
+    )
+    SELECT COUNT(*),
+           SUM(CASE WHEN pnl > 0 THEN 1 ELSE 0 END),
+           SUM(CASE WHEN pnl < 0 THEN 1 ELSE 0 END),
+           SUM(pnl), SUM(fees),
+           SUM(CASE WHEN pnl > 0 THEN pnl ELSE 0 END),
+           SUM(CASE WHEN pnl < 0 THEN pnl ELSE 0 END),
+           MAX(peak - cum),
+           MAX(cum)
+    FROM d
+'''
+# Closed trades in exit order, for the Python recompute on builds without window functions
+_CLOSED_PNL_IN_ORDER_SQL = '''
+    SELECT realized_pnl, fees_paid FROM trades
+    WHERE strategy = ? AND status = 'closed' AND realized_pnl IS NOT NULL
+    ORDER BY exit_time_us, rowid
+'''
+# Window functions arrived in SQLite 3.25; older builds aggregate in Python
+_HAS_WINDOW_FUNCTIONS = sqlite3.sqlite_version_info >= (3, 25, 0)
+
+# Upsert in place (OR REPLACE would delete and re-insert the row)
+_STRATEGY_UPSERT_SQL = '''
+    INSERT INTO strategy_performance (
+        strategy, total_trades, winning_trades, losing_trades,
+        total_pnl, total_fees, win_rate, avg_win, avg_loss,
+        max_drawdown, sum_wins, sum_losses, cum_pnl, peak_pnl, last_updated
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(strategy) DO UPDATE SET
+        total_trades = excluded.total_trades,
+        winning_trades = excluded.winning_trades,
+        losing_trades = excluded.losing_trades,
+        total_pnl = excluded.total_pnl,
+        total_fees = excluded.total_fees,
+        win_rate = excluded.win_rate,
+        avg_win = excluded.avg_win,
+        avg_loss = excluded.avg_loss,
+        max_drawdown = excluded.max_drawdown,
+        sum_wins = excluded.sum_wins,
+        sum_losses = excluded.sum_losses,
+        cum_pnl = excluded.cum_pnl,
+        peak_pnl = excluded.peak_pnl,
+        last_updated = CURRENT_TIMESTAMP
+'''
+_INSERT_BATCH_ROWS = 500  # rows per executemany transaction in record_trade_entries
+_CHECKPOINT_INTERVAL_S = 30.0  # background PASSIVE WAL checkpoint period
+
+# Integer epoch-microsecond twins of the ISO entry/exit times (which stay for
+# display): ordering and holding periods use these without parsing dates
+_TRADE_TIME_US_COLUMNS = (
+    ("entry_time_us", "entry_time"),
+    ("exit_time_us", "exit_time"),
+)
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_ONE_US = timedelta(microseconds=1)
+_US_PER_HOUR = 3_600_000_000
+
+# strategy_performance columns that let each close update the metrics in O(1)
+_STRATEGY_RUNNING_COLUMNS = (
+    ("sum_wins", "REAL DEFAULT 0.0"),
+    ("sum_losses", "REAL DEFAULT 0.0"),
+    ("cum_pnl", "REAL"),
+    ("peak_pnl", "REAL"),
+)
+
+def _encode_ctx(ctx: Union[Dict[str, Any], str, None]) -> str:
+    """strategy_context as stored JSON text; pre-encoded strings pass through."""
+    if isinstance(ctx, str):
+        return ctx
+    return json_dumps(ctx or {})
+
+
+def _epoch_us(ts) -> int:
+    """Epoch microseconds of a datetime or ISO-8601 string (naive means local time)."""
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts.replace('Z', '+00:00'))
+    if ts.tzinfo is None:
+        ts = ts.astimezone()
+    return (ts - _EPOCH) // _ONE_US
+
 class TradeTracker:
     """Integrated trade tracking and P&L management system"""
     
@@ -27,11 +203,64 @@ class TradeTracker:
         root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
         self.db_path = db_path if os.path.isabs(db_path) else os.path.join(root_dir, db_path)
         self.init_database()
+        # One long-lived connection (its page cache stays warm between calls);
+        # the lock serializes use across the agent's worker threads
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._conn.row_factory = sqlite3.Row
+        # Auto-checkpoints are off (see _connect); fold the WAL back into the DB
+        # from a daemon thread so no commit pays for a checkpoint
+        self._stop_checkpoints = threading.Event()
+        threading.Thread(target=self._checkpoint_loop, name="trade-db-checkpoint",
+                         daemon=True).start()
+        atexit.register(self.close)
+    
+    def close(self) -> None:
+        """Stop checkpointing and close the shared connection (registered with atexit)."""
+        self._stop_checkpoints.set()
+        with self._lock:
+            conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                conn.execute("PRAGMA optimize")
+            except sqlite3.Error as e:
+                logger.debug("PRAGMA optimize failed: %s", e)
+            conn.close()
+    
+    def _checkpoint_loop(self) -> None:
+        while not self._stop_checkpoints.wait(_CHECKPOINT_INTERVAL_S):
+            try:
+                with self._lock:
+                    if self._conn is None:
+                        return
+                    self._conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+            except sqlite3.Error as e:
+                logger.warning("WAL checkpoint failed: %s", e)
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open the trades DB with per-connection tuning applied.
+
+        journal_mode=WAL is persistent in the DB file (set once in init_database);
+        synchronous=NORMAL is safe under WAL and avoids an fsync per commit.
+        wal_autocheckpoint=0 keeps checkpoints off the commit path; the tracker
+        runs them on a timer instead.
+        """
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=256)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-64000")  # ~64 MB page cache
+        conn.execute("PRAGMA mmap_size=268435456")  # 256 MB
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute("PRAGMA wal_autocheckpoint=0")
+        return conn
     
     def init_database(self):
         """Initialize SQLite database for trade tracking"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._connect()
+            # WAL is persistent in the DB file: every later connection commits to the
+            # log instead of rewriting the main file, and readers don't block writers
+            conn.execute("PRAGMA journal_mode=WAL")
             cursor = conn.cursor()
             
             # Create trades table
@@ -55,10 +284,27 @@ class TradeTracker:
                     strategy_context TEXT,
                     notes TEXT,
                     created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+                    updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                    entry_time_us INTEGER NOT NULL,
+                    exit_time_us INTEGER
                 )
             ''')
             
+            # Older DBs: add the epoch-microsecond columns and fill them from the ISO text
+            existing = {row[1] for row in cursor.execute('PRAGMA table_info(trades)')}
+            for column, _ in _TRADE_TIME_US_COLUMNS:
+                if column not in existing:
+                    cursor.execute(f'ALTER TABLE trades ADD COLUMN {column} INTEGER')
+            for column, source in _TRADE_TIME_US_COLUMNS:
+                backfill = []
+                for rowid, text in cursor.execute(
+                        f'SELECT rowid, {source} FROM trades WHERE {column} IS NULL AND {source} IS NOT NULL').fetchall():
+                    try:
+                        backfill.append((_epoch_us(text), rowid))
+                    except (TypeError, ValueError):
+                        logger.warning("Unparseable %s %r (rowid %s); leaving %s NULL", source, text, rowid, column)
+                cursor.executemany(f'UPDATE trades SET {column} = ? WHERE rowid = ?', backfill)
+            
             # Create strategy performance table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS strategy_performance (
@@ -73,10 +319,43 @@ class TradeTracker:
                     avg_loss REAL DEFAULT 0.0,
                     max_drawdown REAL DEFAULT 0.0,
                     sharpe_ratio REAL DEFAULT 0.0,
-                    last_updated TEXT DEFAULT CURRENT_TIMESTAMP
+                    last_updated TEXT DEFAULT CURRENT_TIMESTAMP,
+                    sum_wins REAL DEFAULT 0.0,
+                    sum_losses REAL DEFAULT 0.0,
+                    cum_pnl REAL,
+                    peak_pnl REAL
                 )
             ''')
             
+            # Running-aggregate columns for DBs created before they existed; rows
+            # with cum_pnl NULL get a full recompute on their strategy's next close
+            existing = {row[1] for row in cursor.execute('PRAGMA table_info(strategy_performance)')}
+            for column, decl in _STRATEGY_RUNNING_COLUMNS:
+                if column not in existing:
+                    cursor.execute(f'ALTER TABLE strategy_performance ADD COLUMN {column} {decl}')
+            
+            # Indexes for the open-trade lookups (newest first, no sort step), the
+            # per-strategy closed-trade aggregation and the newest-first history
+            for legacy in ('idx_trades_open_by_product', 'idx_trades_open_by_strategy_product',
+                           'idx_trades_strategy_closed'):
+                cursor.execute(f'DROP INDEX IF EXISTS {legacy}')  # keyed on the ISO text columns
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_trades_open_product_time
+                ON trades(product_id, status, entry_time_us DESC)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_trades_open_strategy_product_time
+                ON trades(product_id, strategy, status, entry_time_us DESC)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_trades_closed_by_strategy_time
+                ON trades(strategy, status, exit_time_us)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_trades_entry_time
+                ON trades(entry_time_us)
+            ''')
+            
             conn.commit()
             conn.close()
             logger.info(f"Trade tracking database initialized successfully at: {self.db_path}")
@@ -87,7 +366,7 @@ class TradeTracker:
     
     def record_trade_entry(self, strategy: str, product_id: str, side: str, 
                           entry_price: float, quantity: float, order_id: str,
-                          strategy_context: Dict[str, Any] = None, notes: str = "") -> str:
+                          strategy_context: Union[Dict[str, Any], str] = None, notes: str = "") -> str:
         """
         Record a new trade entry (called automatically by order tools)
         
@@ -98,31 +377,18 @@ class TradeTracker:
             entry_price: Entry price
             quantity: Trade quantity
             order_id: Coinbase order ID
-            strategy_context: Context about why trade was made
+            strategy_context: Context about why trade was made (dict, or already-encoded JSON text)
             notes: Additional notes
             
         Returns:
             str: Trade ID
         """
         try:
-            trade_id = f"{strategy}_{product_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            entry_time = datetime.now(timezone.utc)
+            trade_id, params = self._entry_params(strategy, product_id, side, entry_price, quantity,
+                                                  order_id, strategy_context, notes, datetime.now(timezone.utc))
             
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO trades (
-                    trade_id, strategy, product_id, side, entry_price, quantity,
-                    entry_time, entry_order_id, strategy_context, notes
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                trade_id, strategy, product_id, side, entry_price, quantity,
-                entry_time.isoformat(), order_id, json.dumps(strategy_context or {}), notes
-            ))
-            
-            conn.commit()
-            conn.close()
+            with self._lock, self._conn:
+                self._conn.execute(_INSERT_TRADE_SQL, params)
             
             logger.info(f"Trade entry recorded: {trade_id} -> DB: {self.db_path}")
             return trade_id
@@ -132,6 +398,60 @@ class TradeTracker:
             logger.error(f"Error recording trade entry: {str(e)} | DB: {self.db_path}")
             raise
     
+    @staticmethod
+    def _entry_params(strategy: str, product_id: str, side: str, entry_price: float, quantity: float,
+                      order_id: str, strategy_context: Union[Dict[str, Any], str, None], notes: str,
+                      entry_time: datetime) -> Tuple[str, tuple]:
+        """Trade id and _INSERT_TRADE_SQL parameters for a new entry at `entry_time`."""
+        # Epoch microseconds keep ids unique for orders placed within the same second
+        entry_us = _epoch_us(entry_time)
+        trade_id = f"{strategy}_{product_id}_{entry_us}"
+        return trade_id, (
+            trade_id, strategy, product_id, side, entry_price, quantity,
+            entry_time.isoformat(), entry_us, order_id, _encode_ctx(strategy_context), notes or ""
+        )
+    
+    def record_trade_entries(self, rows: List[Dict[str, Any]]) -> List[str]:
+        """
+        Record many trade entries at once (backfill / replay from logs)
+        
+        Args:
+            rows: Dicts with the record_trade_entry arguments (strategy, product_id,
+                side, entry_price, quantity, order_id, optional strategy_context and
+                notes), plus optional entry_time (datetime or ISO string) and trade_id
+            
+        Returns:
+            List[str]: Trade IDs, in row order
+        """
+        try:
+            now = datetime.now(timezone.utc)
+            now_us = _epoch_us(now)
+            trade_ids = [
+                r.get("trade_id") or f"{r['strategy']}_{r['product_id']}_{now_us + i}"
+                for i, r in enumerate(rows)
+            ]
+            params = []
+            for tid, r in zip(trade_ids, rows):
+                entry_time = r.get("entry_time") or now
+                params.append((
+                    tid, r["strategy"], r["product_id"], r["side"], r["entry_price"], r["quantity"],
+                    entry_time.isoformat() if isinstance(entry_time, datetime) else str(entry_time),
+                    _epoch_us(entry_time), r["order_id"], _encode_ctx(r.get("strategy_context")), r.get("notes", "")
+                ))
+            
+            # One transaction (one commit) per chunk instead of one per row
+            with self._lock:
+                for start in range(0, len(params), _INSERT_BATCH_ROWS):
+                    with self._conn:
+                        self._conn.executemany(_INSERT_TRADE_SQL, params[start:start + _INSERT_BATCH_ROWS])
+            
+            logger.info(f"{len(trade_ids)} trade entries recorded -> DB: {self.db_path}")
+            return trade_ids
+            
+        except Exception as e:
+            logger.error(f"Error recording trade entries: {str(e)} | DB: {self.db_path}")
+            raise
+    
     def record_trade_exit(self, trade_id: str = None, product_id: str = None, 
                          exit_price: float = None, exit_order_id: str = None, 
                          fees_paid: float = 0.0) -> Dict[str, Any]:
@@ -149,102 +469,180 @@ class TradeTracker:
             Dict: Trade P&L details
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Find trade to close
-            if trade_id:
-                cursor.execute('SELECT * FROM trades WHERE trade_id = ? AND status = "open"', (trade_id,))
-            elif product_id:
-                cursor.execute('SELECT * FROM trades WHERE product_id = ? AND status = "open" ORDER BY entry_time DESC LIMIT 1', (product_id,))
-            else:
+            if not trade_id and not product_id:
                 return {'error': 'Must specify either trade_id or product_id'}
             
-            trade_row = cursor.fetchone()
-            if not trade_row:
-                return {'error': 'No open trade found'}
+            # Lookup, close and strategy re-aggregation commit as one write transaction
+            with self._lock, self._conn:
+                cursor = self._conn.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
             
-            # Extract trade data
-            columns = [desc[0] for desc in cursor.description]
-            trade_data = dict(zip(columns, trade_row))
+                # Find trade to close
+                if trade_id:
+                    cursor.execute(_EXIT_TRADE_BY_ID_SQL, (trade_id,))
+                else:
+                    cursor.execute(_EXIT_LATEST_BY_PRODUCT_SQL, (product_id,))
             
-            # Calculate P&L
-            entry_price = trade_data['entry_price']
-            quantity = trade_data['quantity']
-            side = trade_data['side']
-            
-            if side == 'buy':
-                # Long position: profit when exit_price > entry_price
-                pnl = (exit_price - entry_price) * quantity
-            else:
-                # Short position: profit when exit_price < entry_price
-                pnl = (entry_price - exit_price) * quantity
+                trade_row = cursor.fetchone()
+                if not trade_row:
+                    return {'error': 'No open trade found'}
             
-            # Subtract fees
-            net_pnl = pnl - fees_paid
+                pnl_details = self._close_trade_locked(cursor, trade_row, exit_price, exit_order_id,
+                                                       fees_paid, datetime.now(timezone.utc))
             
-            # Update trade record
-            exit_time = datetime.now(timezone.utc)
-            cursor.execute('''
-                UPDATE trades SET 
-                    exit_price = ?, exit_time = ?, exit_order_id = ?,
-                    fees_paid = ?, realized_pnl = ?, status = 'closed',
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE trade_id = ?
-            ''', (exit_price, exit_time.isoformat(), exit_order_id, fees_paid, net_pnl, trade_data['trade_id']))
-            
-            conn.commit()
-            conn.close()
-            
-            # Update strategy performance
-            self.update_strategy_performance(trade_data['strategy'])
-            
-            pnl_details = {
-                'trade_id': trade_data['trade_id'],
-                'gross_pnl': pnl,
-                'fees_paid': fees_paid,
-                'net_pnl': net_pnl,
-                'pnl_percentage': (net_pnl / (entry_price * quantity)) * 100,
-                'holding_period': (exit_time - datetime.fromisoformat(trade_data['entry_time'])).total_seconds() / 3600  # hours
-            }
-            
-            logger.info(f"Trade exit recorded: {trade_data['trade_id']}, P&L: ${net_pnl:.2f} -> DB: {self.db_path}")
+            logger.info(f"Trade exit recorded: {pnl_details['trade_id']}, P&L: ${pnl_details['net_pnl']:.2f} -> DB: {self.db_path}")
             return pnl_details
             
         except Exception as e:
             logger.error(f"Error recording trade exit: {str(e)}")
             return {'error': str(e)}
+    
+    def _close_trade_locked(self, cursor: sqlite3.Cursor, trade_row: sqlite3.Row, exit_price: float,
+                            exit_order_id: str, fees_paid: float, exit_time: datetime) -> Dict[str, Any]:
+        """Close `trade_row` inside the caller's transaction; returns the P&L details."""
+        # Extract trade data
+        trade_data = dict(trade_row)
+        
+        # Calculate P&L
+        entry_price = trade_data['entry_price']
+        quantity = trade_data['quantity']
+        side = trade_data['side']
+        entry_us = trade_data['entry_time_us']
+        
+        if side == 'buy':
+            # Long position: profit when exit_price > entry_price
+            pnl = (exit_price - entry_price) * quantity
+        else:
+            # Short position: profit when exit_price < entry_price
+            pnl = (entry_price - exit_price) * quantity
+        
+        # Subtract fees
+        net_pnl = pnl - fees_paid
+        
+        # Update trade record
+        exit_us = _epoch_us(exit_time)
+        cursor.execute(_CLOSE_TRADE_SQL, (exit_price, exit_time.isoformat(), exit_us, exit_order_id, fees_paid, net_pnl, trade_data['trade_id']))
+        
+        # Update strategy performance (a failure here must not lose the exit)
+        try:
+            self._update_strategy_performance_locked(cursor, trade_data['strategy'], net_pnl, fees_paid)
+        except Exception as e:
+            logger.error(f"Error updating strategy performance: {str(e)}")
+        
+        return {
+            'trade_id': trade_data['trade_id'],
+            'gross_pnl': pnl,
+            'fees_paid': fees_paid,
+            'net_pnl': net_pnl,
+            'pnl_percentage': (net_pnl / (entry_price * quantity)) * 100,
+            'holding_period': (exit_us - entry_us) / _US_PER_HOUR if entry_us is not None else None  # hours
+        }
+    
+    def record_reverse(self, old_trade_id: Optional[str], exit_price: float, new_entry_kwargs: Dict[str, Any],
+                       exit_order_id: str = None, fees_paid: float = 0.0) -> Dict[str, Any]:
+        """
+        Close a trade and open its replacement in a single write transaction
+        
+        Args:
+            old_trade_id: Open trade to close (None or already closed: only the entry is recorded)
+            exit_price: Exit price for the old trade
+            new_entry_kwargs: record_trade_entry arguments for the new trade
+            exit_order_id: Exit order ID for the old trade
+            fees_paid: Fees paid on the exit
+            
+        Returns:
+            Dict: 'trade_id' of the new trade and 'exit' (P&L details, or None if nothing was closed)
+        """
+        try:
+            # One clock read: the old trade exits at the instant the new one enters
+            now = datetime.now(timezone.utc)
+            kw = new_entry_kwargs
+            trade_id, params = self._entry_params(
+                kw['strategy'], kw['product_id'], kw['side'], kw['entry_price'], kw['quantity'],
+                kw['order_id'], kw.get('strategy_context'), kw.get('notes', ""), now
+            )
+            
+            with self._lock, self._conn:
+                cursor = self._conn.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
+                exit_details = None
+                if old_trade_id:
+                    cursor.execute(_EXIT_TRADE_BY_ID_SQL, (old_trade_id,))
+                    trade_row = cursor.fetchone()
+                    if trade_row:
+                        exit_details = self._close_trade_locked(cursor, trade_row, exit_price, exit_order_id, fees_paid, now)
+                cursor.execute(_INSERT_TRADE_SQL, params)
+            
+            if exit_details:
+                logger.info(f"Trade exit recorded: {exit_details['trade_id']}, P&L: ${exit_details['net_pnl']:.2f} -> DB: {self.db_path}")
+            logger.info(f"Trade entry recorded: {trade_id} -> DB: {self.db_path}")
+            return {'trade_id': trade_id, 'exit': exit_details}
+            
+        except Exception as e:
+            logger.error(f"Error recording trade reverse: {str(e)} | DB: {self.db_path}")
+            raise
 
     def get_open_trade(self, product_id: str, strategy: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """Return the most recent open trade for a product (and strategy if provided)."""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            if strategy is not None:
-                cursor.execute(
-                    'SELECT * FROM trades WHERE product_id = ? AND strategy = ? AND status = "open" '
-                    'ORDER BY entry_time DESC LIMIT 1',
-                    (product_id, strategy)
-                )
-            else:
-                cursor.execute(
-                    'SELECT * FROM trades WHERE product_id = ? AND status = "open" '
-                    'ORDER BY entry_time DESC LIMIT 1',
-                    (product_id,)
-                )
-            row = cursor.fetchone()
-            if not row:
-                conn.close()
-                return None
-            columns = [desc[0] for desc in cursor.description]
-            trade = dict(zip(columns, row))
-            conn.close()
-            # Parse strategy_context JSON
-            try:
-                trade["strategy_context"] = json.loads(trade.get("strategy_context") or "{}")
-            except Exception:
-                trade["strategy_context"] = {}
-            return trade
+            with self._lock:
+                cursor = self._conn.cursor()
+                if strategy is not None:
+                    cursor.execute(_LATEST_OPEN_BY_STRATEGY_PRODUCT_SQL, (product_id, strategy))
+                else:
+                    cursor.execute(_LATEST_OPEN_BY_PRODUCT_SQL, (product_id,))
+                row = cursor.fetchone()
+            return self._open_trade_dict(row)
+        except Exception as e:
+            logger.error(f"Error fetching open trade: {str(e)}")
+            return None
+
+    def get_open_trade_any(self, product_id: str, preferred_strategy: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Most recent open trade of `preferred_strategy` for a product, else the most
+        recent open trade of any strategy; one query instead of two get_open_trade calls."""
+        try:
+            with self._lock:
+                if preferred_strategy is not None:
+                    row = self._conn.execute(_LATEST_OPEN_PREFERRING_STRATEGY_SQL, (product_id, preferred_strategy)).fetchone()
+                else:
+                    row = self._conn.execute(_LATEST_OPEN_BY_PRODUCT_SQL, (product_id,)).fetchone()
+            return self._open_trade_dict(row)
+        except Exception as e:
+            logger.error(f"Error fetching open trade: {str(e)}")
+            return None
+
+    @staticmethod
+    def _open_trade_dict(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if not row:
+            return None
+        trade = dict(row)
+        # Parse strategy_context JSON
+        try:
+            trade["strategy_context"] = json_loads(trade.get("strategy_context") or "{}")
+        except Exception:
+            trade["strategy_context"] = {}
+        return trade
+
+    def get_realized_pnl(self, product_id: str, strategy: str) -> Tuple[float, float]:
+        """Realized P&L of a product's closed trades as (for `strategy`, for all strategies), in one scan."""
+        with self._lock:
+            by_strategy, total = self._conn.execute(_REALIZED_PNL_SQL, (strategy, product_id)).fetchone()
+        return float(by_strategy), float(total)
+
+    def get_open_trade_minimal(self, product_id: str, preferred_strategy: Optional[str] = None) -> Optional[tuple]:
+        """Most recent open trade as (trade_id, strategy, side, entry_price, quantity, entry_time_us).
+
+        Picks like get_open_trade_any (the preferred strategy's trade, else any).
+        For callers that only need to know whether a position is open or which
+        trade to close; get_open_trade also returns strategy_context and notes.
+        """
+        try:
+            with self._lock:
+                if preferred_strategy is not None:
+                    row = self._conn.execute(_MINIMAL_OPEN_PREFERRING_STRATEGY_SQL, (product_id, preferred_strategy)).fetchone()
+                else:
+                    row = self._conn.execute(_EXIT_LATEST_BY_PRODUCT_SQL, (product_id,)).fetchone()
+            return tuple(row) if row else None
         except Exception as e:
             logger.error(f"Error fetching open trade: {str(e)}")
             return None
@@ -252,119 +650,139 @@ class TradeTracker:
     def update_strategy_context(self, trade_id: str, updates: Dict[str, Any]) -> bool:
         """Merge-partially update the strategy_context JSON for a trade."""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('SELECT strategy_context FROM trades WHERE trade_id = ?', (trade_id,))
-            row = cursor.fetchone()
-            current = {}
-            if row and row[0]:
-                try:
-                    current = json.loads(row[0])
-                except Exception:
-                    current = {}
-            # Merge updates
-            current.update(updates or {})
-            cursor.execute(
-                'UPDATE trades SET strategy_context = ?, updated_at = CURRENT_TIMESTAMP WHERE trade_id = ?'
-                , (json.dumps(current), trade_id)
-            )
-            conn.commit()
-            conn.close()
+            updates = updates or {}
+            # Merge in SQLite (JSON1) instead of a SELECT + json round-trip in Python.
+            # json_patch equals dict.update unless a value is an object or null (it
+            # merges/deletes those), so such updates set each key with json_set instead.
+            current = "CASE WHEN json_valid(strategy_context) THEN strategy_context ELSE '{}' END"
+            if any(v is None or isinstance(v, dict) for v in updates.values()):
+                paths = ", ".join("?, json(?)" for _ in updates)
+                merged = f"json_set({current}, {paths})" if updates else current
+                params: List[Any] = []
+                for k, v in updates.items():
+                    params += ['$."' + str(k).replace('"', '') + '"', json_dumps(v)]
+            else:
+                merged = f"json_patch({current}, ?)"
+                params = [json_dumps(updates)]
+            with self._lock, self._conn:
+                self._conn.execute(
+                    f'UPDATE trades SET strategy_context = {merged}, updated_at = CURRENT_TIMESTAMP WHERE trade_id = ?',
+                    (*params, trade_id)
+                )
             return True
         except Exception as e:
             logger.error(f"Error updating strategy context: {str(e)}")
             return False
     
-    def update_strategy_performance(self, strategy: str):
-        """Update strategy performance metrics"""
+    def update_strategy_performance(self, strategy: str, new_pnl: Optional[float] = None,
+                                    new_fees: float = 0.0):
+        """
+        Update strategy performance metrics
+        
+        Args:
+            strategy: Strategy name
+            new_pnl: Net P&L of the trade that was just closed; folds it into the
+                running totals in O(1). When omitted, recompute from all closed trades.
+            new_fees: Fees of that trade
+        """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Get strategy trades
-            cursor.execute('''
-                SELECT realized_pnl, fees_paid FROM trades 
-                WHERE strategy = ? AND status = 'closed' AND realized_pnl IS NOT NULL
-            ''', (strategy,))
-            
-            trades = cursor.fetchall()
-            
-            if not trades:
-                conn.close()
-                return
-            
-            total_trades = len(trades)
-            winning_trades = sum(1 for pnl, _ in trades if pnl > 0)
-            losing_trades = sum(1 for pnl, _ in trades if pnl < 0)
-            total_pnl = sum(pnl for pnl, _ in trades)
-            total_fees = sum(fees for _, fees in trades)
-            win_rate = (winning_trades / total_trades) * 100 if total_trades > 0 else 0
-            
-            wins = [pnl for pnl, _ in trades if pnl > 0]
-            losses = [pnl for pnl, _ in trades if pnl < 0]
-            
-            avg_win = sum(wins) / len(wins) if wins else 0
-            avg_loss = sum(losses) / len(losses) if losses else 0
-            
-            # Calculate max drawdown (simplified)
-            cumulative_pnl = []
-            running_total = 0
-            for pnl, _ in trades:
-                running_total += pnl
-                cumulative_pnl.append(running_total)
-            
-            max_drawdown = 0
-            if cumulative_pnl:
-                peak = cumulative_pnl[0]
-                for value in cumulative_pnl:
-                    if value > peak:
-                        peak = value
-                    drawdown = peak - value
-                    if drawdown > max_drawdown:
-                        max_drawdown = drawdown
-            
-            # Insert or update strategy performance
-            cursor.execute('''
-                INSERT OR REPLACE INTO strategy_performance (
-                    strategy, total_trades, winning_trades, losing_trades,
-                    total_pnl, total_fees, win_rate, avg_win, avg_loss,
-                    max_drawdown, last_updated
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-            ''', (strategy, total_trades, winning_trades, losing_trades,
-                  total_pnl, total_fees, win_rate, avg_win, avg_loss, max_drawdown))
-            
-            conn.commit()
-            conn.close()
-            
+            with self._lock, self._conn:
+                self._update_strategy_performance_locked(self._conn.cursor(), strategy, new_pnl, new_fees)
         except Exception as e:
             logger.error(f"Error updating strategy performance: {str(e)}")
     
+    def _update_strategy_performance_locked(self, cursor: sqlite3.Cursor, strategy: str,
+                                            new_pnl: Optional[float] = None, new_fees: float = 0.0) -> None:
+        """Update a strategy's metrics on `cursor`; the caller holds the lock and the transaction."""
+        if new_pnl is not None:
+            cursor.execute(_STRATEGY_INCREMENT_SQL, {"pnl": new_pnl, "fees": new_fees or 0.0, "strategy": strategy})
+            if cursor.rowcount:
+                cursor.execute(_STRATEGY_DERIVED_SQL, (strategy,))
+                return
+            # No running row yet (first close, or a DB from before the running
+            # columns): fall through to a full recompute, which seeds them
+        
+        if _HAS_WINDOW_FUNCTIONS:
+            cursor.execute(_STRATEGY_RECOMPUTE_SQL, (strategy,))
+            aggregates = cursor.fetchone()
+        else:
+            aggregates = self._aggregate_closed_trades(cursor, strategy)
+        (total_trades, winning_trades, losing_trades, total_pnl, total_fees,
+         sum_wins, sum_losses, max_drawdown, peak_pnl) = aggregates
+        
+        if not total_trades:
+            return
+        
+        win_rate = (winning_trades / total_trades) * 100
+        avg_win = sum_wins / winning_trades if winning_trades else 0
+        avg_loss = sum_losses / losing_trades if losing_trades else 0
+        total_fees = total_fees or 0
+        max_drawdown = max_drawdown or 0
+        
+        # Insert or update strategy performance
+        cursor.execute(_STRATEGY_UPSERT_SQL, (
+            strategy, total_trades, winning_trades, losing_trades,
+            total_pnl, total_fees, win_rate, avg_win, avg_loss, max_drawdown,
+            sum_wins, sum_losses, total_pnl, peak_pnl,
+        ))
+    
+    @staticmethod
+    def _aggregate_closed_trades(cursor: sqlite3.Cursor, strategy: str) -> tuple:
+        """Python equivalent of _STRATEGY_RECOMPUTE_SQL, in a single pass over the closed trades."""
+        n = n_win = n_loss = 0
+        sum_pnl = sum_fees = sum_wins = sum_losses = 0.0
+        running = 0.0
+        peak = None
+        max_dd = 0.0
+        for pnl, fee in cursor.execute(_CLOSED_PNL_IN_ORDER_SQL, (strategy,)):
+            n += 1
+            sum_pnl += pnl
+            sum_fees += fee or 0.0
+            if pnl > 0:
+                n_win += 1
+                sum_wins += pnl
+            elif pnl < 0:
+                n_loss += 1
+                sum_losses += pnl
+            running += pnl
+            if peak is None or running > peak:
+                peak = running
+            dd = peak - running
+            if dd > max_dd:
+                max_dd = dd
+        return n, n_win, n_loss, sum_pnl, sum_fees, sum_wins, sum_losses, max_dd, peak
+    
     def get_portfolio_summary(self) -> Dict[str, Any]:
         """Get comprehensive portfolio performance summary"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            
-            # Get overall performance
-            df_trades = pd.read_sql_query('''
-                SELECT * FROM trades WHERE status = 'closed' AND realized_pnl IS NOT NULL
-            ''', conn)
-            
-            df_strategies = pd.read_sql_query('SELECT * FROM strategy_performance', conn)
-            conn.close()
-            
-            if df_trades.empty:
+            with self._lock:
+                # Get overall performance, aggregated in SQLite
+                (total_trades, winning_trades, total_pnl, total_fees,
+                 avg_win, avg_loss) = self._conn.execute('''
+                    SELECT COUNT(*),
+                           SUM(CASE WHEN realized_pnl > 0 THEN 1 ELSE 0 END),
+                           SUM(realized_pnl), SUM(fees_paid),
+                           AVG(CASE WHEN realized_pnl > 0 THEN realized_pnl END),
+                           AVG(CASE WHEN realized_pnl < 0 THEN realized_pnl END)
+                    FROM trades WHERE status = 'closed' AND realized_pnl IS NOT NULL
+                ''').fetchone()
+            
+                strategy_breakdown = [dict(row) for row in self._conn.execute('''
+                    SELECT strategy, total_trades, winning_trades, losing_trades, total_pnl,
+                           total_fees, win_rate, avg_win, avg_loss, max_drawdown, sharpe_ratio,
+                           last_updated
+                    FROM strategy_performance
+                ''').fetchall()]
+            
+            if not total_trades:
                 return {'message': 'No closed trades found'}
             
             # Calculate portfolio metrics
-            total_pnl = df_trades['realized_pnl'].sum()
-            total_fees = df_trades['fees_paid'].sum()
+            total_fees = total_fees or 0.0
             net_pnl = total_pnl - total_fees
-            total_trades = len(df_trades)
-            winning_trades = len(df_trades[df_trades['realized_pnl'] > 0])
-            win_rate = (winning_trades / total_trades) * 100 if total_trades > 0 else 0
-            
-            avg_win = df_trades[df_trades['realized_pnl'] > 0]['realized_pnl'].mean()
-            avg_loss = df_trades[df_trades['realized_pnl'] < 0]['realized_pnl'].mean()
+            win_rate = (winning_trades / total_trades) * 100
+            avg_win = avg_win if avg_win is not None else 0
+            avg_loss = avg_loss if avg_loss is not None else 0
             
             return {
                 'portfolio_performance': {
@@ -374,19 +792,36 @@ class TradeTracker:
                     'total_pnl': total_pnl,
                     'total_fees': total_fees,
                     'net_pnl': net_pnl,
-                    'avg_win': avg_win if not pd.isna(avg_win) else 0,
-                    'avg_loss': avg_loss if not pd.isna(avg_loss) else 0,
-                    'profit_factor': abs(avg_win / avg_loss) if avg_loss != 0 and not pd.isna(avg_loss) else 0
+                    'avg_win': avg_win,
+                    'avg_loss': avg_loss,
+                    'profit_factor': abs(avg_win / avg_loss) if avg_loss != 0 else 0
                 },
-                'strategy_breakdown': df_strategies.to_dict('records') if not df_strategies.empty else []
+                'strategy_breakdown': strategy_breakdown
             }
             
         except Exception as e:
             logger.error(f"Error getting portfolio summary: {str(e)}")
             return {'error': str(e)}
 
-# Global trade tracker instance
-trade_tracker = TradeTracker()
+# Global trade tracker instance, created on first use so importing this module
+# doesn't touch the database
+_tracker: Optional[TradeTracker] = None
+_tracker_lock = threading.Lock()
+
+def get_trade_tracker() -> TradeTracker:
+    """Return the shared TradeTracker, creating it on first call."""
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = TradeTracker()
+    return _tracker
+
+def __getattr__(name: str):
+    # PEP 562: keep `from agent_tools.trade_tracker import trade_tracker` working, lazily
+    if name == "trade_tracker":
+        return get_trade_tracker()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def get_portfolio_performance_tool() -> str:
     """
@@ -396,7 +831,7 @@ def get_portfolio_performance_tool() -> str:
         str: Formatted portfolio performance summary
     """
     try:
-        summary = trade_tracker.get_portfolio_summary()
+        summary = get_trade_tracker().get_portfolio_summary()
         
         if 'error' in summary:
             return f"❌ Error getting portfolio summary: {summary['error']}"
@@ -434,7 +869,7 @@ if __name__ == "__main__":
     logger.info("🧪 Testing Integrated Trade Tracking System...")
     
     # Test trade entry
-    trade_id = trade_tracker.record_trade_entry(
+    trade_id = get_trade_tracker().record_trade_entry(
         strategy="RSI_MEAN_REVERSION",
         product_id="BTC-USD",
         side="buy",
@@ -447,5 +882,5 @@ if __name__ == "__main__":
     logger.info(f"Trade recorded: {trade_id}")
     
     # Test portfolio summary
-    summary = trade_tracker.get_portfolio_summary()
+    summary = get_trade_tracker().get_portfolio_summary()
     logger.info(f"Portfolio summary: {summary}")
@@ -23,23 +23,34 @@ Trailing/BE (optional):
 import os
 import json
 import logging
-import uuid
-import sqlite3
-from typing import Optional, Dict, Any
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
 
 # Local import of PaperBroker from helpers package
 try:
-    from helpers.paper_trade import PaperBroker
+    from helpers.paper_trade import PaperBroker, protective_exit
 except ImportError:
     # Allow running if called from different cwd by adjusting sys.path at runtime
     import sys
     ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
     if ROOT not in sys.path:
         sys.path.insert(0, ROOT)
-    from helpers.paper_trade import PaperBroker  # type: ignore
+    from helpers.paper_trade import PaperBroker, protective_exit  # type: ignore
 
 logger = logging.getLogger(__name__)
 
+# Paper order ids: pid + a counter seeded with the start time in microseconds,
+# unique across restarts without reading system entropy on every tick
+_PID = os.getpid()
+_ORDER_SEQ = itertools.count(int(time.time() * 1e6))
+
+
+def _oid(tag: str) -> str:
+    return f"paper_{tag}_{_PID:x}_{next(_ORDER_SEQ):x}"
+
 # DB trade tracker
 try:
     from agent_tools.trade_tracker import trade_tracker
@@ -47,57 +58,111 @@ except Exception:
     trade_tracker = None  # type: ignore
 
 
-def _get_db_conn():
-    if trade_tracker is None:
-        raise RuntimeError("trade_tracker is unavailable")
-    return sqlite3.connect(trade_tracker.db_path)
+# Write-through LRU of open trades keyed by (product_id, preferred strategy): the
+# on_price loop re-reads the same trade every tick, and every write to a product's
+# trades goes through this tool, which invalidates (or, for SL moves, patches) it.
+# Cached dicts are shared; callers treat them as read-only.
+_OPEN_CACHE_SIZE = 64
+_OPEN_CACHE: "OrderedDict[Tuple[str, Optional[str]], Dict[str, Any]]" = OrderedDict()
+_open_cache_lock = threading.Lock()
+_open_cache_gen = 0  # bumped on invalidation so a read racing a write is not stored
 
 
-def _reconstruct_broker_from_open_trade(open_trade: Dict[str, Any], starting_balance: float) -> PaperBroker:
-    """Create an in-memory broker for protective logic based on DB open trade."""
-    broker = PaperBroker(starting_balance=starting_balance, state_path=None)
-    if open_trade:
-        ctx = open_trade.get("strategy_context") or {}
-        broker.position.side = "LONG" if (open_trade.get("side") == "buy") else "SHORT"
-        broker.position.size = float(open_trade.get("quantity") or 0.0)
-        broker.position.entry_price = float(open_trade.get("entry_price") or 0.0)
-        broker.position.stop_loss = ctx.get("sl")
-        broker.position.take_profit = ctx.get("tp")
-        broker.position.atr_at_entry = ctx.get("atr")
-    return broker
+def _get_open_trade_cached(product_id: str, strategy: Optional[str]) -> Optional[Dict[str, Any]]:
+    key = (product_id, strategy)
+    with _open_cache_lock:
+        trade = _OPEN_CACHE.get(key)
+        if trade is not None:
+            _OPEN_CACHE.move_to_end(key)
+            return trade
+        gen = _open_cache_gen
+    trade = trade_tracker.get_open_trade_any(product_id=product_id, preferred_strategy=strategy)
+    # None is not cached: the tracker also returns it on a DB error
+    if trade is not None:
+        with _open_cache_lock:
+            if gen == _open_cache_gen:
+                _OPEN_CACHE[key] = trade
+                while len(_OPEN_CACHE) > _OPEN_CACHE_SIZE:
+                    _OPEN_CACHE.popitem(last=False)
+    return trade
+
+
+def _invalidate_open_trades(product_id: str) -> None:
+    global _open_cache_gen
+    with _open_cache_lock:
+        _open_cache_gen += 1
+        for key in [k for k in _OPEN_CACHE if k[0] == product_id]:
+            del _OPEN_CACHE[key]
+
+
+def _update_cached_context(trade_id: str, updates: Dict[str, Any]) -> None:
+    with _open_cache_lock:
+        for trade in _OPEN_CACHE.values():
+            if trade.get("trade_id") == trade_id:
+                trade["strategy_context"] = {**(trade.get("strategy_context") or {}), **updates}
+
+
+def _evaluate_exit(open_trade: Dict[str, Any], stop_loss: Optional[float], price: float) -> Optional[Dict[str, float]]:
+    """SL/TP exit for the DB open trade at `price`, as PaperBroker.on_price would
+    decide it; {"price", "pnl", "reason"} when triggered, else None."""
+    ctx = open_trade.get("strategy_context") or {}
+    pos_side = "LONG" if open_trade.get("side") == "buy" else "SHORT"
+    size = float(open_trade.get("quantity") or 0.0)
+    entry = float(open_trade.get("entry_price") or 0.0)
+    if size <= 0:
+        return None
+    _, hit = protective_exit(pos_side, entry, stop_loss, ctx.get("tp"), ctx.get("atr"), price)
+    if hit is None:
+        return None
+    exit_price, reason = hit
+    pnl = (float(exit_price) - entry) * size if pos_side == "LONG" else (entry - float(exit_price)) * size
+    return {"price": float(exit_price), "pnl": pnl, "reason": reason}
+
+
+_NEG_INF = float("-inf")
+
+
+def _trailed_stop(side: str, entry: float, cur_sl: Optional[float], price: float,
+                  atr_val: float, mbe: float, tstart: float, tdist: float) -> Optional[float]:
+    """Break-even / ATR-trailing stop at `price`; the new SL, or None if it does not move.
+
+    Prices are sign-folded (negated for shorts) so one set of comparisons
+    serves both sides.
+    """
+    s = 1.0 if side == "LONG" else -1.0
+    lvl = s * price
+    se = s * entry
+    cur = s * cur_sl if cur_sl else _NEG_INF
+    new_sl = None
+    # Move to BE
+    if lvl >= se + mbe * atr_val and se > cur:
+        new_sl = se
+    # Trailing after start
+    if lvl >= se + tstart * atr_val:
+        t_sl = lvl - tdist * atr_val
+        candidate = t_sl if t_sl > cur else cur
+        if cur_sl is None or candidate > s * cur_sl:
+            new_sl = candidate
+    return None if new_sl is None else s * new_sl
 
 
 def _compute_summary(starting_balance: float, product_id: str, strategy: str, mark_price: Optional[float]) -> str:
     if trade_tracker is None:
         return "Error: DB tracker unavailable"
-    # Realized PnL from closed trades for this strategy+product
+    # Realized PnL from closed trades for this strategy+product (both sums in one
+    # query on the tracker's shared connection)
     realized = 0.0
     try:
-        conn = _get_db_conn()
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT COALESCE(SUM(realized_pnl), 0) FROM trades WHERE strategy = ? AND product_id = ? AND status = 'closed'",
-            (strategy, product_id),
-        )
-        row = cur.fetchone()
-        realized = float(row[0] or 0.0)
+        realized, product_realized = trade_tracker.get_realized_pnl(product_id, strategy)
         # Fallback: if no realized PnL under this strategy, sum across product regardless of strategy
         if realized == 0.0:
-            cur.execute(
-                "SELECT COALESCE(SUM(realized_pnl), 0) FROM trades WHERE product_id = ? AND status = 'closed'",
-                (product_id,),
-            )
-            row2 = cur.fetchone()
-            realized = float(row2[0] or 0.0)
-        conn.close()
+            realized = product_realized
     except Exception:
         realized = 0.0
 
     # Open trade unrealized
-    open_trade = trade_tracker.get_open_trade(product_id=product_id, strategy=strategy)
-    # Fallback: if no open trade found under this strategy, look for any open trade for the product
-    if not open_trade:
-        open_trade = trade_tracker.get_open_trade(product_id=product_id, strategy=None)
+    # Prefer this strategy's open trade, falling back to any open trade for the product
+    open_trade = _get_open_trade_cached(product_id, strategy)
     unreal = 0.0
     pos_side = "FLAT"
     pos_size = 0.0
@@ -179,7 +244,7 @@ def unified_trade_tool(
             trade_size = _ensure_size(size, risk_usd, price, atr)
             if trade_tracker is None:
                 return "Error: DB tracker unavailable"
-            entry_order_id = f"paper_entry_{uuid.uuid4().hex[:12]}"
+            entry_order_id = _oid("entry")
             # Defaults for ATR-based management
             mbe = 1.0 if move_to_be_atr is None else float(move_to_be_atr)
             tstart = 2.0 if trail_start_atr is None else float(trail_start_atr)
@@ -198,6 +263,7 @@ def unified_trade_tool(
                     },
                     notes=notes or ""
                 )
+                _invalidate_open_trades(product_id)
                 return f"Opened LONG size={trade_size:.8f} @ {float(price):.2f} SL={sl} TP={tp}"
             else:
                 trade_tracker.record_trade_entry(
@@ -213,6 +279,7 @@ def unified_trade_tool(
                     },
                     notes=notes or ""
                 )
+                _invalidate_open_trades(product_id)
                 return f"Opened SHORT size={trade_size:.8f} @ {float(price):.2f} SL={sl} TP={tp}"
 
         if act == "close":
@@ -220,18 +287,17 @@ def unified_trade_tool(
                 return "Error: price is required for close"
             if trade_tracker is None:
                 return "Error: DB tracker unavailable"
-            open_trade = trade_tracker.get_open_trade(product_id=product_id, strategy=strategy)
-            if not open_trade:
-                open_trade = trade_tracker.get_open_trade(product_id=product_id, strategy=None)
+            open_trade = trade_tracker.get_open_trade_minimal(product_id=product_id, preferred_strategy=strategy)
             if not open_trade:
                 return "No open position to close"
-            exit_order_id = f"paper_exit_{uuid.uuid4().hex[:12]}"
+            exit_order_id = _oid("exit")
             res = trade_tracker.record_trade_exit(
-                trade_id=open_trade["trade_id"],
+                trade_id=open_trade[0],
                 exit_price=float(price),
                 exit_order_id=exit_order_id,
                 fees_paid=0.0,
             )
+            _invalidate_open_trades(product_id)
             if "error" in res:
                 return f"Error closing trade: {res['error']}"
             return f"Closed position. Realized PnL={res['net_pnl']:.2f}"
@@ -242,55 +308,35 @@ def unified_trade_tool(
             trade_size = _ensure_size(size, risk_usd, price, atr)
             if trade_tracker is None:
                 return "Error: DB tracker unavailable"
-            # Exit existing position if any
-            open_trade = trade_tracker.get_open_trade(product_id=product_id, strategy=strategy)
-            if not open_trade:
-                open_trade = trade_tracker.get_open_trade(product_id=product_id, strategy=None)
-            if open_trade:
-                trade_tracker.record_trade_exit(
-                    trade_id=open_trade["trade_id"],
-                    exit_price=float(price),
-                    exit_order_id=f"paper_reverse_exit_{uuid.uuid4().hex[:8]}",
-                    fees_paid=0.0,
-                )
-            # Enter new side
-            entry_order_id = f"paper_entry_{uuid.uuid4().hex[:12]}"
-            if act == "reverse_to_long":
-                trade_tracker.record_trade_entry(
-                    strategy=strategy,
-                    product_id=product_id,
-                    side="buy",
-                    entry_price=float(price),
-                    quantity=trade_size,
-                    order_id=entry_order_id,
-                    strategy_context={"atr": atr, "sl": sl, "tp": tp, "side": "LONG"},
-                    notes=notes or ""
-                )
-                return f"Reversed to LONG size={trade_size:.8f} @ {float(price):.2f}"
-            else:
-                trade_tracker.record_trade_entry(
+            # Exit existing position if any and enter the new side in one transaction
+            open_trade = trade_tracker.get_open_trade_minimal(product_id=product_id, preferred_strategy=strategy)
+            to_long = act == "reverse_to_long"
+            trade_tracker.record_reverse(
+                old_trade_id=open_trade[0] if open_trade else None,
+                exit_price=float(price),
+                exit_order_id=_oid("reverse_exit"),
+                new_entry_kwargs=dict(
                     strategy=strategy,
                     product_id=product_id,
-                    side="sell",
+                    side="buy" if to_long else "sell",
                     entry_price=float(price),
                     quantity=trade_size,
-                    order_id=entry_order_id,
-                    strategy_context={"atr": atr, "sl": sl, "tp": tp, "side": "SHORT"},
+                    order_id=_oid("entry"),
+                    strategy_context={"atr": atr, "sl": sl, "tp": tp, "side": "LONG" if to_long else "SHORT"},
                     notes=notes or ""
-                )
-                return f"Reversed to SHORT size={trade_size:.8f} @ {float(price):.2f}"
+                ),
+            )
+            _invalidate_open_trades(product_id)
+            return f"Reversed to {'LONG' if to_long else 'SHORT'} size={trade_size:.8f} @ {float(price):.2f}"
 
         if act == "on_price":
             if price is None:
                 return "Error: price is required for on_price"
             if trade_tracker is None:
                 return "Error: DB tracker unavailable"
-            open_trade = trade_tracker.get_open_trade(product_id=product_id, strategy=strategy)
-            if not open_trade:
-                open_trade = trade_tracker.get_open_trade(product_id=product_id, strategy=None)
+            open_trade = _get_open_trade_cached(product_id, strategy)
             if not open_trade:
                 return "No open position to manage"
-            broker = _reconstruct_broker_from_open_trade(open_trade, starting_balance=starting_balance)
             ctx = open_trade.get("strategy_context") or {}
             # ATR-based trailing & break-even logic before evaluating exit
             try:
@@ -306,50 +352,26 @@ def unified_trade_tool(
 
             side = ctx.get("side") or ("LONG" if open_trade.get("side") == "buy" else "SHORT")
             entry = float(open_trade.get("entry_price") or 0.0)
-            cur_sl = broker.position.stop_loss if broker.position.stop_loss is not None else ctx.get("sl")
-            new_sl = None
+            cur_sl = ctx.get("sl")
             p = float(price)
-            if atr_val and entry:
-                if side == "LONG":
-                    # Move to BE
-                    be_px = entry + mbe * atr_val
-                    if p >= be_px:
-                        be_sl = entry
-                        if cur_sl is None or be_sl > (cur_sl or -float("inf")):
-                            new_sl = be_sl
-                    # Trailing after start
-                    start_px = entry + tstart * atr_val
-                    if p >= start_px:
-                        t_sl = p - tdist * atr_val
-                        candidate = max(cur_sl or -float("inf"), t_sl)
-                        if cur_sl is None or candidate > cur_sl:
-                            new_sl = candidate
-                else:
-                    # SHORT
-                    be_px = entry - mbe * atr_val
-                    if p <= be_px:
-                        be_sl = entry
-                        if cur_sl is None or be_sl < (cur_sl or float("inf")):
-                            new_sl = be_sl
-                    start_px = entry - tstart * atr_val
-                    if p <= start_px:
-                        t_sl = p + tdist * atr_val
-                        candidate = min(cur_sl or float("inf"), t_sl)
-                        if cur_sl is None or candidate < cur_sl:
-                            new_sl = candidate
+            new_sl = _trailed_stop(side, entry, cur_sl, p, atr_val, mbe, tstart, tdist) if atr_val and entry else None
 
             if new_sl is not None:
-                broker.position.stop_loss = float(new_sl)
-                trade_tracker.update_strategy_context(open_trade["trade_id"], {"sl": float(new_sl)})
+                cur_sl = float(new_sl)
+                if trade_tracker.update_strategy_context(open_trade["trade_id"], {"sl": cur_sl}):
+                    _update_cached_context(open_trade["trade_id"], {"sl": cur_sl})
+                else:
+                    _invalidate_open_trades(product_id)
 
-            event = broker.on_price(float(p))
+            event = _evaluate_exit(open_trade, cur_sl, p)
             if event:
                 trade_tracker.record_trade_exit(
                     trade_id=open_trade["trade_id"],
                     exit_price=float(event["price"]),
-                    exit_order_id=f"paper_auto_exit_{uuid.uuid4().hex[:8]}",
+                    exit_order_id=_oid("auto_exit"),
                     fees_paid=0.0,
                 )
+                _invalidate_open_trades(product_id)
                 return f"Exit event at {float(event['price']):.2f}. Realized PnL={float(event['pnl']):.2f}"
             return "No exit. Position managed."
 
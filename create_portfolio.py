@@ -1,20 +1,9 @@
 import json
 import logging
-from coinbase.rest import RESTClient
+from helpers.coinbase_client import get_rest_client
 from typing import Dict, Any, Optional, List
 
-CONFIG = {}
-try:
-    with open("config.json", "r") as f:
-        CONFIG = json.load(f)
-except Exception:
-    CONFIG = {}
-_cb = CONFIG.get("coinbase", {}) if isinstance(CONFIG.get("coinbase", {}), dict) else {}
-api_key = str(_cb.get("coinbase_api_key", CONFIG.get("coinbase_api_key", "")))
-api_secret = str(_cb.get("coinbase_api_secret", CONFIG.get("coinbase_api_secret", "")))
-if not api_key or not api_secret:
-    logging.getLogger(__name__).warning("Coinbase API credentials are not set in config.json (coinbase.coinbase_api_key/coinbase.coinbase_api_secret)")
-client = RESTClient(api_key=api_key, api_secret=api_secret)
+client = get_rest_client()
 
 logger = logging.getLogger(__name__)
 
@@ -0,0 +1,29 @@
+# ===============================
+# _njit.py
+# Optional Numba: `njit` degrades to a no-op decorator (and `prange` to range) when numba is missing
+# ===============================
+import os
+
+# Compiled kernels (cache=True) go to one project-level directory unless the
+# environment says otherwise; must be set before numba is first imported
+os.environ.setdefault(
+    "NUMBA_CACHE_DIR",
+    os.path.join(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)), ".numba_cache"),
+)
+
+try:
+    from numba import njit, prange  # type: ignore
+    HAVE_NUMBA = True
+except ImportError:  # pragma: no cover - depends on environment
+    HAVE_NUMBA = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        """Stand-in for numba.njit; supports both @njit and @njit(...)."""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+
+        def decorator(fn):
+            return fn
+
+        return decorator
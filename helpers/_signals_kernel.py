@@ -0,0 +1,89 @@
+# ===============================
+# _signals_kernel.py
+# Fused single-pass kernel for the last values of the signal hub indicators
+# ===============================
+import numpy as np
+
+try:
+    from helpers._njit import njit
+except ImportError:
+    from _njit import njit  # type: ignore
+
+
+# NOTE: finite inputs only (callers check); that is what makes fastmath safe here.
+@njit(cache=True, fastmath=True)
+def signals_last(close, high, low, vol, rsi_p, ema_f, ema_s, obv_ma_p, atr_p):
+    """Last RSI, EMA fast, EMA slow, OBV, OBV SMA and ATR in one forward pass.
+
+    Same definitions as helpers.indicators (Wilder RSI/ATR seeded with the mean
+    of the first `period` values, EMA with adjust=False, OBV SMA over the last
+    `obv_ma_p` values); NaN where the window is too short.
+    """
+    n = close.shape[0]
+    nan = np.nan
+    if n == 0:
+        return nan, nan, nan, nan, nan, nan
+
+    a_f = 2.0 / (ema_f + 1.0)
+    a_s = 2.0 / (ema_s + 1.0)
+    e_f = close[0]
+    e_s = close[0]
+
+    obv = 0.0
+    ring = np.zeros(max(obv_ma_p, 1))
+    ring_sum = 0.0
+
+    gain_sum = 0.0
+    loss_sum = 0.0
+    avg_gain = nan
+    avg_loss = nan
+    rsi = nan
+
+    tr_sum = 0.0
+    atr = nan
+
+    for i in range(n):
+        c = close[i]
+        if i > 0:
+            cp = close[i - 1]
+            d = c - cp
+            e_f = e_f + a_f * (c - e_f)
+            e_s = e_s + a_s * (c - e_s)
+
+            # OBV
+            if d > 0:
+                obv += vol[i]
+            elif d < 0:
+                obv -= vol[i]
+
+            # RSI (Wilder)
+            g = d if d > 0 else 0.0
+            l = -d if d < 0 else 0.0
+            if i <= rsi_p:
+                gain_sum += g
+                loss_sum += l
+                if i == rsi_p:
+                    avg_gain = gain_sum / rsi_p
+                    avg_loss = loss_sum / rsi_p
+            else:
+                avg_gain = (avg_gain * (rsi_p - 1) + g) / rsi_p
+                avg_loss = (avg_loss * (rsi_p - 1) + l) / rsi_p
+                rs = avg_gain / avg_loss if avg_loss != 0 else 0.0
+                rsi = 100.0 - 100.0 / (1.0 + rs)
+
+            # ATR (Wilder)
+            tr = max(abs(high[i] - low[i]), abs(high[i] - cp), abs(low[i] - cp))
+            if i <= atr_p:
+                tr_sum += tr
+                if i == atr_p:
+                    atr = tr_sum / atr_p
+            else:
+                atr = (atr * (atr_p - 1) + tr) / atr_p
+
+        # OBV SMA via a ring buffer of the last obv_ma_p values
+        k = i % obv_ma_p
+        ring_sum += obv - ring[k]
+        ring[k] = obv
+
+    obv_ma = ring_sum / obv_ma_p if n >= obv_ma_p else nan
+    return rsi, e_f, e_s, obv, obv_ma, atr
@@ -2,13 +2,24 @@
 # base_candles.py
 # Robust Coinbase candle fetch with retries + UTC handling
 # ===============================
-import http.client
-import json
 import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from typing import Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
+try:
+    from helpers import candles_cache, coinbase_http
+    from helpers.cache import ttl_cache
+    from helpers.fast_json import loads as _json_loads
+except ImportError:
+    import candles_cache  # type: ignore
+    import coinbase_http  # type: ignore
+    from cache import ttl_cache  # type: ignore
+    from fast_json import loads as _json_loads  # type: ignore
+
 _GRAN_MAP = {
     "1M": 60,
     "5M": 300,
@@ -19,23 +30,14 @@ _GRAN_MAP = {
 }
 
 
-def _request_with_retries(path: str, retries: int = 5, backoff: float = 0.5) -> Tuple[int, str]:
+def _request_with_retries(path: str, retries: int = 5, backoff: float = 0.5) -> Tuple[int, bytes]:
     last_status = 0
     last_reason = ""
     for i in range(retries):
         try:
-            conn = http.client.HTTPSConnection("api.exchange.coinbase.com", timeout=20)
-            headers = {
-                "Content-Type": "application/json",
-                "User-Agent": "SB-OneShotTrader/1.0",
-            }
-            conn.request("GET", path, body=None, headers=headers)
-            resp = conn.getresponse()
-            data = resp.read().decode("utf-8")
-            status, reason = resp.status, resp.reason
-            conn.close()
+            status, reason, body = coinbase_http.get(path, timeout=20)
             if status == 200:
-                return status, data
+                return status, body
             last_status, last_reason = status, reason
         except Exception as e:
             last_status, last_reason = 0, str(e)
@@ -44,6 +46,87 @@ def _request_with_retries(path: str, retries: int = 5, backoff: float = 0.5) ->
     raise RuntimeError(f"HTTP failed after {retries} retries: status={last_status}, reason={last_reason}")
 
 
+_TTL_SKEW = 2.0  # seconds shaved off a full bucket
+_RANGE_WORKERS = 4  # concurrent chunk requests; well under the public API's rate limit
+# Long-lived so its threads' keep-alive connections (coinbase_http) carry over
+# between range fetches; threads start on first use
+_range_pool = ThreadPoolExecutor(max_workers=_RANGE_WORKERS, thread_name_prefix="candles-range")
+
+
+def _candles_ttl(product_id: str, granularity: str, limit: int) -> float:
+    # Up to one bucket, but never past the next bucket boundary: every tool call
+    # within a candle shares one fetch, and a newly opened candle is always seen
+    period = _GRAN_MAP.get(granularity, 60)
+    to_boundary = period - (time.time() % period)
+    return max(1.0, min(period - _TTL_SKEW, to_boundary))
+
+
+def _fetch_rows(path: str) -> list:
+    status, raw = _request_with_retries(path)
+    arr = _json_loads(raw)  # orjson parses the raw bytes directly
+    if isinstance(arr, dict) and arr.get("message"):
+        raise RuntimeError(arr["message"])
+    return [r for r in arr if isinstance(r, list) and len(r) >= 6]
+
+
+_COLUMNS = ("timestamp", "low", "high", "open", "close", "volume")
+
+
+def _rows_to_df(rows: list) -> pd.DataFrame:
+    # One float64 matrix (ts, low, high, open, close, volume), then typed columns
+    # straight from it: no object/astype round trip
+    try:
+        arr = np.array(rows, dtype=np.float64)
+    except ValueError:  # ragged rows: keep the first six fields
+        arr = np.array([r[:6] for r in rows], dtype=np.float64)
+    arr = arr.reshape(len(rows), -1)[:, :6] if len(rows) else arr.reshape(0, 6)
+    # Sorting through the transpose yields one C-contiguous (6, n) buffer whose
+    # rows are the time-ordered columns, so no per-column copies are needed
+    cols = arr.T[:, np.argsort(arr[:, 0], kind="stable")]
+    ts = cols[0].astype(np.int64)
+    data = {"timestamp": ts}
+    for j, name in enumerate(_COLUMNS[1:], start=1):
+        data[name] = cols[j]
+    df = pd.DataFrame(data, copy=False)
+    df["datetime"] = pd.to_datetime(ts, unit="s", utc=True)
+    return df
+
+
+def _iso(ts: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(ts))
+
+
+def _refresh_ring(product_id: str, granularity: str, want: int) -> Optional[pd.DataFrame]:
+    """Top up the cached ring with only the bars since its last timestamp.
+
+    Returns None when there is no usable ring (cold, too short, or too stale to
+    bridge with one request) or the incremental request fails.
+    """
+    ring = candles_cache.get(product_id, granularity)
+    if ring is None or len(ring) < want:
+        return None
+    gran = _GRAN_MAP[granularity]
+    last = int(ring["timestamp"].iloc[-1])
+    now = time.time()
+    missing = int((now - last) // gran) + 1
+    if missing >= len(ring):
+        return None
+    # start at the last (possibly still forming) bar so its final values replace it
+    path = f"/products/{product_id}/candles?granularity={gran}&start={_iso(last)}&end={_iso(now)}"
+    try:
+        rows = _fetch_rows(path)
+    except Exception:
+        return None
+    if not rows:
+        return ring
+    return candles_cache.append(product_id, granularity, _rows_to_df(rows))
+
+
+@ttl_cache(
+    ttl=_candles_ttl,
+    key=lambda product_id, granularity, limit: (product_id, granularity, limit),
+    on_hit=lambda df: df.copy(deep=False),
+)
 def get_coinbase_candles_df(
     product_id: str = "BTC-USD",
     granularity: str = "1H",
@@ -51,27 +134,45 @@ def get_coinbase_candles_df(
 ) -> pd.DataFrame:
     if granularity not in _GRAN_MAP:
         raise ValueError(f"Invalid granularity. Use: {list(_GRAN_MAP.keys())}")
-    gran = _GRAN_MAP[granularity]
-    path = f"/products/{product_id}/candles?granularity={gran}"
-    status, raw = _request_with_retries(path)
-    arr = json.loads(raw)
-    if isinstance(arr, dict) and arr.get("message"):
-        raise RuntimeError(arr["message"])
-    rows = [r for r in arr[:limit] if isinstance(r, list) and len(r) >= 6]
-    if not rows:
-        raise RuntimeError("No candle data returned")
-    df = pd.DataFrame(rows, columns=["timestamp", "low", "high", "open", "close", "volume"]).astype(
-        {
-            "timestamp": "int64",
-            "low": "float64",
-            "high": "float64",
-            "open": "float64",
-            "close": "float64",
-            "volume": "float64",
-        }
-    )
-    df["datetime"] = pd.to_datetime(df["timestamp"], unit="s", utc=True)
-    return df.sort_values("timestamp").reset_index(drop=True)
+    limit = int(limit)
+    ring = _refresh_ring(product_id, granularity, min(limit, candles_cache.MAX_BARS))
+    if ring is None:
+        gran = _GRAN_MAP[granularity]
+        rows = _fetch_rows(f"/products/{product_id}/candles?granularity={gran}")
+        if not rows:
+            raise RuntimeError("No candle data returned")
+        ring = candles_cache.store(product_id, granularity, _rows_to_df(rows))
+    return ring.iloc[-limit:].reset_index(drop=True)
+
+
+def _to_utc(x) -> Optional[datetime]:
+    if x is None:
+        return None
+    if isinstance(x, datetime):
+        return x.astimezone(timezone.utc) if x.tzinfo else x.replace(tzinfo=timezone.utc)
+    s = str(x).strip()
+    if s.endswith("Z"):
+        s = s[:-1] + "+00:00"
+    try:
+        dt = datetime.fromisoformat(s)
+    except Exception:
+        dt = pd.to_datetime(s, utc=True).to_pydatetime()
+    return dt.astimezone(timezone.utc) if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _chunk_bounds(start_dt: datetime, end_dt: datetime, chunk: int) -> list:
+    """(start, end) ISO-8601 'Z' strings of consecutive `chunk`-second windows
+    covering [start_dt, end_dt), formatted in one vectorized call."""
+    s64 = np.datetime64(start_dt.replace(tzinfo=None), "us")
+    e64 = np.datetime64(end_dt.replace(tzinfo=None), "us")
+    starts = np.arange(s64, e64, np.timedelta64(chunk, "s"))
+    ends = np.minimum(starts + np.timedelta64(chunk, "s"), e64)
+    # Whole seconds (the usual case) format exactly as datetime.isoformat() would
+    whole = not (starts.astype(np.int64) % 1_000_000).any() and not e64.astype(np.int64) % 1_000_000
+    unit = "s" if whole else "us"
+    s_iso = np.char.add(np.datetime_as_string(starts, unit=unit), "Z").tolist()
+    e_iso = np.char.add(np.datetime_as_string(ends, unit=unit), "Z").tolist()
+    return list(zip(s_iso, e_iso))
 
 
 def get_coinbase_candles_df_range(
@@ -80,58 +181,30 @@ def get_coinbase_candles_df_range(
     start: Optional[str] = None,
     end: Optional[str] = None,
 ) -> pd.DataFrame:
-    from datetime import datetime, timedelta, timezone
-
     if granularity not in _GRAN_MAP:
         raise ValueError(f"Invalid granularity. Use: {list(_GRAN_MAP.keys())}")
 
-    def _to_utc(x) -> datetime:
-        if x is None:
-            return None
-        if isinstance(x, datetime):
-            return x.astimezone(timezone.utc) if x.tzinfo else x.replace(tzinfo=timezone.utc)
-        s = str(x).strip()
-        if s.endswith("Z"):
-            s = s[:-1] + "+00:00"
-        try:
-            dt = datetime.fromisoformat(s)
-        except Exception:
-            dt = pd.to_datetime(s, utc=True).to_pydatetime()
-        return dt.astimezone(timezone.utc) if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
-
     end_dt = _to_utc(end) or datetime.now(timezone.utc)
     start_dt = _to_utc(start) or (end_dt - timedelta(days=365))  # 1 year default
 
     gran = _GRAN_MAP[granularity]
     chunk = gran * 300  # max per CB request
 
-    all_rows = []
-    cur = start_dt
-    while cur < end_dt:
-        chunk_end = min(cur + timedelta(seconds=chunk), end_dt)
-        s = cur.isoformat().replace("+00:00", "Z")
-        e = chunk_end.isoformat().replace("+00:00", "Z")
-        path = f"/products/{product_id}/candles?granularity={gran}&start={s}&end={e}"
-        status, raw = _request_with_retries(path)
-        arr = json.loads(raw)
-        if isinstance(arr, dict) and arr.get("message"):
-            raise RuntimeError(arr["message"])
-        rows = [r for r in arr if isinstance(r, list) and len(r) >= 6]
-        all_rows.extend(rows)
-        cur = chunk_end
-
-    if not all_rows:
+    prefix = f"/products/{product_id}/candles?granularity={gran}"
+    paths = [f"{prefix}&start={s}&end={e}" for s, e in _chunk_bounds(start_dt, end_dt, chunk)]
+
+    # Chunks are independent requests; map() re-raises the first failure in chunk order
+    if len(paths) > 1:
+        chunks = list(_range_pool.map(_fetch_rows, paths))
+    else:
+        chunks = [_fetch_rows(p) for p in paths]
+
+    # Adjacent chunks share their boundary bar; keep one row per timestamp
+    by_ts = {}
+    for rows in chunks:
+        for r in rows:
+            by_ts[r[0]] = r
+    if not by_ts:
         raise RuntimeError("No candle data returned for range")
 
-    df = pd.DataFrame(all_rows, columns=["timestamp", "low", "high", "open", "close", "volume"]).astype(
-        {
-            "timestamp": "int64",
-            "low": "float64",
-            "high": "float64",
-            "open": "float64",
-            "close": "float64",
-            "volume": "float64",
-        }
-    )
-    df["datetime"] = pd.to_datetime(df["timestamp"], unit="s", utc=True)
-    return df.sort_values("timestamp").reset_index(drop=True)
+    return _rows_to_df(list(by_ts.values()))
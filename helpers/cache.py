@@ -0,0 +1,98 @@
+# ===============================
+# cache.py
+# Small in-process TTL cache for Coinbase REST results
+# ===============================
+import functools
+import inspect
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, Union
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Dict of key -> (expiry_ts, value). Entries expire lazily on lookup."""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = int(maxsize)
+        self._data: Dict[Hashable, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expiry, value = item
+            if time.monotonic() >= expiry:
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        with self._lock:
+            if len(self._data) >= self.maxsize and key not in self._data:
+                self._evict_locked()
+            self._data[key] = (time.monotonic() + float(ttl), value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _evict_locked(self) -> None:
+        now = time.monotonic()
+        expired = [k for k, (exp, _) in self._data.items() if now >= exp]
+        for k in expired:
+            del self._data[k]
+        if len(self._data) >= self.maxsize:
+            # Drop the entry closest to expiry
+            oldest = min(self._data, key=lambda k: self._data[k][0])
+            del self._data[oldest]
+
+
+def ttl_cache(
+    ttl: Union[float, Callable[..., float]],
+    key: Optional[Callable[..., Hashable]] = None,
+    on_hit: Optional[Callable[[Any], Any]] = None,
+    should_cache: Optional[Callable[[Any], bool]] = None,
+    maxsize: int = 256,
+):
+    """Memoize a function for `ttl` seconds.
+
+    - ttl: seconds, or a callable receiving the bound call arguments (as kwargs)
+    - key: callable receiving the bound call arguments; defaults to all of them
+    - on_hit: transform applied to cached values before returning (e.g. a copy)
+    - should_cache: predicate on the result; falsy results are not stored
+    The wrapped function exposes `.cache` and `.cache_clear()`.
+    """
+
+    def decorator(fn):
+        sig = inspect.signature(fn)
+        cache = TTLCache(maxsize=maxsize)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            bound = sig.bind(*args, **kwargs)
+            bound.apply_defaults()
+            params = bound.arguments
+            k = key(**params) if key is not None else tuple(params.items())
+            hit = cache.get(k, _MISSING)
+            if hit is not _MISSING:
+                return on_hit(hit) if on_hit is not None else hit
+            value = fn(*args, **kwargs)
+            if should_cache is None or should_cache(value):
+                seconds = ttl(**params) if callable(ttl) else ttl
+                cache.set(k, value, seconds)
+            return value
+
+        wrapper.cache = cache
+        wrapper.cache_clear = cache.clear
+        return wrapper
+
+    return decorator
@@ -0,0 +1,49 @@
+# ===============================
+# candles_cache.py
+# Per-(product, granularity) ring of recent candles so refreshes only pull new bars
+# ===============================
+import threading
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+MAX_BARS = 300  # Coinbase returns at most 300 candles per request
+
+_RINGS: Dict[Tuple[str, str], pd.DataFrame] = {}
+_lock = threading.Lock()
+
+
+def get(product_id: str, granularity: str) -> Optional[pd.DataFrame]:
+    return _RINGS.get((product_id, granularity))
+
+
+def store(product_id: str, granularity: str, df: pd.DataFrame) -> pd.DataFrame:
+    """Replace the ring with `df` (sorted oldest first), keeping the newest MAX_BARS rows."""
+    ring = df.iloc[-MAX_BARS:].reset_index(drop=True)
+    with _lock:
+        _RINGS[(product_id, granularity)] = ring
+    return ring
+
+
+def append(product_id: str, granularity: str, new: pd.DataFrame) -> pd.DataFrame:
+    """Merge freshly fetched bars into the ring.
+
+    Bars at or after the first new timestamp are replaced, so a candle that was
+    still forming at the previous fetch is overwritten by its updated values.
+    """
+    key = (product_id, granularity)
+    with _lock:
+        ring = _RINGS.get(key)
+        if ring is None or new.empty:
+            merged = new if ring is None else ring
+        else:
+            first = int(new["timestamp"].iloc[0])
+            merged = pd.concat([ring[ring["timestamp"] < first], new], ignore_index=True)
+        merged = merged.iloc[-MAX_BARS:].reset_index(drop=True)
+        _RINGS[key] = merged
+    return merged
+
+
+def clear() -> None:
+    with _lock:
+        _RINGS.clear()
@@ -0,0 +1,31 @@
+# ===============================
+# coinbase_client.py
+# One shared Coinbase Advanced Trade RESTClient per process
+# ===============================
+import functools
+import logging
+
+from coinbase.rest import RESTClient
+
+try:
+    from helpers.config import get_config
+except ImportError:
+    from config import get_config  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=1)
+def get_rest_client() -> RESTClient:
+    """Process-wide RESTClient built from config.json.
+
+    Sharing one client shares its HTTP session, so tools reuse the same
+    keep-alive connection instead of each opening (and TLS-handshaking) its own.
+    """
+    config = get_config()
+    cb = config.get("coinbase", {}) if isinstance(config.get("coinbase", {}), dict) else {}
+    api_key = str(cb.get("coinbase_api_key", config.get("coinbase_api_key", "")))
+    api_secret = str(cb.get("coinbase_api_secret", config.get("coinbase_api_secret", "")))
+    if not api_key or not api_secret:
+        logger.warning("Coinbase API credentials are not set in config.json (coinbase.coinbase_api_key/coinbase.coinbase_api_secret)")
+    return RESTClient(api_key=api_key, api_secret=api_secret)
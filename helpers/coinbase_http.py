@@ -0,0 +1,72 @@
+# ===============================
+# coinbase_http.py
+# Keep-alive HTTPS connection to the public Coinbase Exchange API
+# ===============================
+import gzip
+import http.client
+import threading
+from typing import Tuple
+
+HOST = "api.exchange.coinbase.com"
+HEADERS = {
+    "Content-Type": "application/json",
+    "User-Agent": "SB-OneShotTrader/1.0",
+    "Connection": "keep-alive",
+    "Accept-Encoding": "gzip",  # candle JSON compresses several-fold
+}
+
+# One connection per thread: http.client connections are not thread-safe, and
+# candles are fetched from worker threads (asyncio.to_thread, tool prefetch).
+_local = threading.local()
+
+
+def _connection(timeout: float) -> http.client.HTTPSConnection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = http.client.HTTPSConnection(HOST, timeout=timeout)
+        _local.conn = conn
+    return conn
+
+
+def close() -> None:
+    """Drop this thread's connection (the next request reconnects)."""
+    conn = getattr(_local, "conn", None)
+    _local.conn = None
+    if conn is not None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def _send(path: str, timeout: float) -> Tuple[int, str, bytes]:
+    conn = _connection(timeout)
+    conn.request("GET", path, body=None, headers=HEADERS)
+    resp = conn.getresponse()
+    data = resp.read()
+    if resp.will_close:
+        close()
+    if data and (resp.getheader("Content-Encoding") or "").lower() == "gzip":
+        data = gzip.decompress(data)
+    return resp.status, resp.reason, data
+
+
+def get(path: str, timeout: float = 20) -> Tuple[int, str, bytes]:
+    """GET `path` over the thread's persistent connection; returns (status, reason, body).
+
+    A keep-alive socket the server has closed while idle is reopened once
+    transparently; any other failure propagates to the caller's retry logic.
+    A gzip-encoded body is returned decompressed.
+    """
+    try:
+        return _send(path, timeout)
+    except (http.client.HTTPException, ConnectionError):
+        close()
+        try:
+            return _send(path, timeout)
+        except Exception:
+            close()
+            raise
+    except Exception:
+        close()
+        raise
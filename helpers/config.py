@@ -0,0 +1,23 @@
+# ===============================
+# config.py
+# config.json parsed once per process and shared read-only by every module
+# ===============================
+import functools
+import json
+import os
+from types import MappingProxyType
+from typing import Any, Mapping
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+CONFIG_PATH = os.path.join(ROOT_DIR, "config.json")
+
+
+@functools.lru_cache(maxsize=1)
+def get_config() -> Mapping[str, Any]:
+    """Top-level config.json mapping (read-only); empty when missing or invalid."""
+    try:
+        with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        data = {}
+    return MappingProxyType(data if isinstance(data, dict) else {})
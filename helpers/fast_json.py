@@ -0,0 +1,33 @@
+# ===============================
+# fast_json.py
+# JSON encode/decode through orjson when installed, stdlib json otherwise
+# ===============================
+import json
+from typing import Any
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover - depends on environment
+    orjson = None
+
+
+def dumps(obj: Any, indent: bool = False) -> str:
+    """Compact JSON text (2-space indented when `indent`).
+
+    Numpy scalars/arrays encode as numbers/lists; other non-JSON values
+    (datetimes, Decimals, ...) are stringified. NaN/inf encode as null with
+    orjson and as NaN/Infinity with the stdlib fallback.
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, default=str, option=option).decode()
+    if indent:
+        return json.dumps(obj, indent=2, default=str)
+    return json.dumps(obj, separators=(",", ":"), default=str)
+
+
+def loads(data: Any) -> Any:
+    """Parse JSON from str or bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -0,0 +1,99 @@
+# ===============================
+# indicator_state.py
+# Rolling indicator state so live calls can update in O(1) per new bar
+# ===============================
+from typing import Dict, Optional, Tuple
+
+import math
+
+# (product_id, granularity, period) -> {"ts", "atr", "close", "bars"}
+# State always describes the last *closed* bar (the penultimate candle returned
+# by Coinbase); the forming candle is applied on top without being stored.
+ATR_STATE: Dict[Tuple[str, str, int], Dict[str, float]] = {}
+
+
+def true_range(high: float, low: float, prev_close: float) -> float:
+    return max(high - low, abs(high - prev_close), abs(low - prev_close))
+
+
+def wilder_step(prev: float, value: float, period: int) -> float:
+    return (prev * (period - 1) + value) / period
+
+
+def seed_atr_state(key: Tuple[str, str, int], ts: int, atr: float, close: float, bars: int) -> None:
+    ATR_STATE[key] = {"ts": int(ts), "atr": float(atr), "close": float(close), "bars": int(bars)}
+
+
+def advance_atr_state(key: Tuple[str, str, int], ts, high, low, close) -> Optional[Tuple[float, int]]:
+    """Apply the latest candles (oldest first, at least 2) to the stored ATR state.
+
+    Returns (atr_for_latest_bar, bars) or None when the state is cold or the
+    candles do not line up with it (gap, restart, etc.) and a full recompute is needed.
+    """
+    state = ATR_STATE.get(key)
+    n = len(ts)
+    if state is None or n < 2:
+        return None
+    period = key[2]
+    if int(ts[-2]) != state["ts"]:
+        if n >= 3 and int(ts[-3]) == state["ts"]:
+            # Exactly one bar closed since the last call: roll the state forward
+            state["atr"] = wilder_step(state["atr"], true_range(high[-2], low[-2], state["close"]), period)
+            state["close"] = float(close[-2])
+            state["ts"] = int(ts[-2])
+            state["bars"] += 1
+        else:
+            return None
+    atr_now = wilder_step(state["atr"], true_range(high[-1], low[-1], state["close"]), period)
+    return atr_now, state["bars"] + 1
+
+
+# (product_id, granularity, period) -> {"ts", "avg_gain", "avg_loss", "close", "rsi"}
+# Same convention as ATR_STATE: the last closed bar, forming bar applied on top.
+RSI_STATE: Dict[Tuple[str, str, int], Dict[str, float]] = {}
+
+
+def rsi_from_averages(avg_gain: float, avg_loss: float) -> float:
+    # Matches rsi_wilder: RS is taken as 0 when there were no losses
+    rs = avg_gain / avg_loss if avg_loss != 0 else 0.0
+    return 100.0 - 100.0 / (1.0 + rs)
+
+
+def seed_rsi_state(key: Tuple[str, str, int], ts: int, avg_gain: float, avg_loss: float, close: float) -> None:
+    RSI_STATE[key] = {
+        "ts": int(ts),
+        "avg_gain": float(avg_gain),
+        "avg_loss": float(avg_loss),
+        "close": float(close),
+        "rsi": rsi_from_averages(avg_gain, avg_loss),
+    }
+
+
+def _rsi_step(state: Dict[str, float], close: float, period: int) -> Tuple[float, float]:
+    delta = close - state["close"]
+    ag = wilder_step(state["avg_gain"], max(delta, 0.0), period)
+    al = wilder_step(state["avg_loss"], max(-delta, 0.0), period)
+    return ag, al
+
+
+def advance_rsi_state(key: Tuple[str, str, int], ts, close) -> Optional[Tuple[float, float]]:
+    """Apply the latest candles (oldest first, at least 2) to the stored RSI state.
+
+    Returns (rsi_for_latest_bar, rsi_for_previous_bar), or None when the state is
+    cold, the candles do not line up with it, or a close is not finite.
+    """
+    state = RSI_STATE.get(key)
+    n = len(ts)
+    if state is None or n < 2 or not all(math.isfinite(float(c)) for c in close[-3:]):
+        return None
+    period = key[2]
+    if int(ts[-2]) != state["ts"]:
+        if n >= 3 and int(ts[-3]) == state["ts"]:
+            # Exactly one bar closed since the last call: roll the state forward
+            ag, al = _rsi_step(state, float(close[-2]), period)
+            seed_rsi_state(key, ts[-2], ag, al, close[-2])
+            state = RSI_STATE[key]
+        else:
+            return None
+    ag, al = _rsi_step(state, float(close[-1]), period)
+    return rsi_from_averages(ag, al), state["rsi"]
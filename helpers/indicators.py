@@ -1,33 +1,362 @@
 # indicators.py
 # Shared, vectorized indicators + helpers used by backtest & live
 
-from typing import Iterable
+import hashlib
+from typing import Iterable, Optional, Sequence, Union
 import numpy as np
 import pandas as pd
 
+try:
+    from helpers._njit import njit, prange, HAVE_NUMBA
+    from helpers.cache import ttl_cache
+except ImportError:
+    from _njit import njit, prange, HAVE_NUMBA  # type: ignore
+    from cache import ttl_cache  # type: ignore
+
+
+# -----------------------------
+# Compiled kernels (plain Python loops when numba is unavailable)
+# NOTE: kernels that test for NaN (x == x) must not use fastmath, which
+# lets LLVM assume NaN never occurs.
+# -----------------------------
+
+@njit(cache=True)
+def _ema_nb(x, span):
+    # pandas ewm(span, adjust=False).mean() for finite input, bit for bit (same
+    # weighted update). Gaps go to pandas instead (see ema): how it weights the
+    # value after a NaN is not a fixed per-step rule across spans/versions.
+    n = x.shape[0]
+    out = np.empty(n)
+    if n == 0:
+        return out
+    alpha = 2.0 / (span + 1.0)
+    old_wt = 1.0 - alpha
+    weighted = x[0]
+    out[0] = weighted
+    for i in range(1, n):
+        cur = x[i]
+        if weighted != cur:
+            weighted = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+        out[i] = weighted
+    return out
+
+
+@njit(cache=True)
+def _sma_nb(x, period):
+    # Mirrors pandas rolling(period, min_periods=period).mean()
+    n = x.shape[0]
+    out = np.full(n, np.nan)
+    total = 0.0
+    nans = 0
+    for i in range(n):
+        v = x[i]
+        if v == v:
+            total += v
+        else:
+            nans += 1
+        if i >= period:
+            old = x[i - period]
+            if old == old:
+                total -= old
+            else:
+                nans -= 1
+        if i >= period - 1 and nans == 0:
+            out[i] = total / period
+    return out
+
+
+@njit(cache=True)
+def _obv_nb(c, v):
+    n = c.shape[0]
+    out = np.empty(n)
+    acc = 0.0
+    for i in range(n):
+        d = c[i] - c[i - 1] if i > 0 else 0.0
+        if d > 0:
+            step = v[i]
+        elif d < 0:
+            step = -v[i]
+        else:
+            step = 0.0 * v[i]  # NaN volume stays a gap, as in pandas
+        if step == step:
+            acc += step
+            out[i] = acc
+        else:
+            out[i] = np.nan
+    return out
+
+
+@njit(cache=True)
+def _rsi_scan_nb(close, period):
+    # Same recurrence as rsi_wilder, keeping only the last two finite values
+    # and the final average gain/loss
+    n = close.shape[0]
+    last = np.nan
+    prev = np.nan
+    if n <= period:
+        return last, prev, np.nan, np.nan
+    sg = 0.0
+    sl = 0.0
+    cnt = 0
+    for i in range(1, period + 1):
+        d = close[i] - close[i - 1]
+        if d == d:
+            if d > 0:
+                sg += d
+            else:
+                sl -= d
+            cnt += 1
+    ag = sg / cnt if cnt > 0 else np.nan
+    al = sl / cnt if cnt > 0 else np.nan
+    for i in range(period + 1, n):
+        d = close[i] - close[i - 1]
+        if d == d:
+            g = d if d > 0 else 0.0
+            l = -d if d < 0 else 0.0
+        else:
+            g = np.nan
+            l = np.nan
+        ag = (ag * (period - 1) + g) / period
+        al = (al * (period - 1) + l) / period
+        rs = ag / al if al != 0 else 0.0
+        r = 100.0 - 100.0 / (1.0 + rs)
+        if r == r:
+            prev = last
+            last = r
+    return last, prev, ag, al
+
+
+@njit(cache=True)
+def _rsi_wilder_nb(gain, loss, period):
+    # Wilder average gain/loss seeded with the NaN-skipping mean of [1:period+1]
+    # (as pandas .mean()); a NaN input propagates through the recurrence
+    n = gain.shape[0]
+    ag = np.full(n, np.nan)
+    al = np.full(n, np.nan)
+    if n > period:
+        sg = 0.0
+        sl = 0.0
+        cg = 0
+        cl = 0
+        for i in range(1, period + 1):
+            if gain[i] == gain[i]:
+                sg += gain[i]
+                cg += 1
+            if loss[i] == loss[i]:
+                sl += loss[i]
+                cl += 1
+        ag[period] = sg / cg if cg > 0 else np.nan
+        al[period] = sl / cl if cl > 0 else np.nan
+        for i in range(period + 1, n):
+            ag[i] = (ag[i - 1] * (period - 1) + gain[i]) / period
+            al[i] = (al[i - 1] * (period - 1) + loss[i]) / period
+    return ag, al
+
+
+@njit(cache=True)
+def _rolling_percentile_nb(x, window):
+    # Percent rank of each value within its trailing window, as pandas
+    # rank(pct=True) (average ties, NaN ignored) * 100; O(n * window)
+    n = x.shape[0]
+    out = np.full(n, np.nan)
+    for i in range(window - 1, n):
+        v = x[i]
+        if v != v:
+            continue
+        less = 0
+        equal = 0
+        valid = 0
+        for j in range(i - window + 1, i + 1):
+            w = x[j]
+            if w == w:
+                valid += 1
+                if w < v:
+                    less += 1
+                elif w == v:
+                    equal += 1
+        out[i] = 100.0 * (less + (equal + 1) * 0.5) / valid
+    return out
+
+
+@njit(cache=True)
+def _fmax_nb(a, b):
+    # np.fmax: a NaN operand yields the other one
+    if a != a:
+        return b
+    if b != b:
+        return a
+    return a if a > b else b
+
+
+@njit(cache=True)
+def _atr_nb(high, low, close, period):
+    # true_range fused into the Wilder recurrence of _wilder_nb: one pass, no TR array
+    n = close.shape[0]
+    out = np.full(n, np.nan)
+    if n <= period:
+        return out
+    seed = 0.0
+    count = 0
+    prev = np.nan
+    for i in range(1, n):
+        h = high[i]
+        l = low[i]
+        cp = close[i - 1]
+        tr = _fmax_nb(abs(h - l), _fmax_nb(abs(h - cp), abs(l - cp)))
+        if i <= period:
+            # Seed: NaN-skipping mean of TR[1:period+1] (as pandas .mean())
+            if tr == tr:
+                seed += tr
+                count += 1
+            if i == period:
+                prev = seed / count if count > 0 else np.nan
+                out[i] = prev
+        else:
+            prev = (prev * (period - 1) + tr) / period
+            out[i] = prev
+    return out
+
+
+@njit(cache=True)
+def _wilder_nb(x, period):
+    # Wilder smoothing seeded with the NaN-skipping mean of x[1:period+1] (as
+    # pandas .mean()); a later NaN propagates. Inherently sequential
+    n = x.shape[0]
+    out = np.full(n, np.nan)
+    if n > period:
+        seed = 0.0
+        count = 0
+        for i in range(1, period + 1):
+            if x[i] == x[i]:
+                seed += x[i]
+                count += 1
+        out[period] = seed / count if count > 0 else np.nan
+        for i in range(period + 1, n):
+            out[i] = (out[i - 1] * (period - 1) + x[i]) / period
+    return out
+
+
+# Multi-symbol batches: one row per symbol, rows computed in parallel threads
+# with the single-series kernels above (each recurrence stays serial)
+@njit(cache=True, parallel=True)
+def _batch_rsi_nb(c2, period):
+    m, n = c2.shape
+    out = np.full((m, n), np.nan)
+    for k in prange(m):
+        c = c2[k]
+        gain = np.full(n, np.nan)
+        loss = np.full(n, np.nan)
+        for i in range(1, n):
+            d = c[i] - c[i - 1]
+            # np.clip semantics: NaN stays NaN
+            gain[i] = 0.0 if d <= 0 else d
+            loss[i] = 0.0 if d >= 0 else -d
+        ag, al = _rsi_wilder_nb(gain, loss, period)
+        for i in range(period + 1, n):
+            rs = ag[i] / al[i] if al[i] != 0 else 0.0
+            out[k, i] = 100.0 - 100.0 / (1.0 + rs)
+    return out
+
+
+@njit(cache=True, parallel=True)
+def _batch_atr_nb(h2, l2, c2, period):
+    m, n = c2.shape
+    out = np.empty((m, n))
+    for k in prange(m):
+        out[k] = _atr_nb(h2[k], l2[k], c2[k], period)
+    return out
+
+
+@njit(cache=True, parallel=True)
+def _batch_obv_nb(c2, v2):
+    m, n = c2.shape
+    out = np.empty((m, n))
+    for k in prange(m):
+        out[k] = _obv_nb(c2[k], v2[k])
+    return out
+
+
+def warm_up() -> None:
+    """Compile (or load from the on-disk cache) every kernel for the argument
+    types the indicators pass, so the first live call doesn't pay for the JIT."""
+    if not HAVE_NUMBA:
+        return
+    try:
+        from helpers._signals_kernel import signals_last
+    except ImportError:
+        from _signals_kernel import signals_last  # type: ignore
+    x = np.linspace(1.0, 2.0, 32)
+    _ema_nb(x, 3)
+    _sma_nb(x, 3)
+    _obv_nb(x, x)
+    _rsi_scan_nb(x, 3)
+    _rsi_wilder_nb(x, x, 3)
+    _rolling_percentile_nb(x, 3)
+    _wilder_nb(x, 3)
+    _atr_nb(x, x, x, 3)
+    signals_last(x, x, x, x, 3, 3, 5, 3, 3)
+
+
+def _f64(x) -> np.ndarray:
+    return np.ascontiguousarray(np.asarray(x, dtype=np.float64))
+
+
+def _f64_2d(x) -> np.ndarray:
+    x = _f64(x)
+    if x.ndim != 2:
+        raise ValueError(f"expected a (n_symbols, n_bars) array, got shape {x.shape}")
+    return x
+
+
+def _series(x) -> pd.Series:
+    return x if isinstance(x, pd.Series) else pd.Series(np.asarray(x, dtype=np.float64))
+
+
+def _wilder_ewm(x: np.ndarray, period: int) -> np.ndarray:
+    """_wilder_nb via pandas' C ewm: Wilder smoothing is ewm(alpha=1/period,
+    adjust=False) started from the seed. x[1:] must be finite (ewm skips NaN
+    where the recurrence propagates it)."""
+    out = np.full(x.shape[0], np.nan)
+    if x.shape[0] > period:
+        seq = x[period:].copy()
+        seq[0] = x[1:period + 1].mean()
+        out[period:] = pd.Series(seq).ewm(alpha=1.0 / period, adjust=False).mean().to_numpy()
+    return out
+
 
 def ema(series: pd.Series, span: int) -> np.ndarray:
-    return series.ewm(span=span, adjust=False).mean().to_numpy()
+    x = _f64(series)
+    if HAVE_NUMBA and not np.isnan(x).any():
+        return _ema_nb(x, span)
+    # Gaps keep pandas' own NaN weighting
+    return _series(series).ewm(span=span, adjust=False).mean().to_numpy()
 
 
 def sma(series: pd.Series, period: int) -> np.ndarray:
-    return series.rolling(period, min_periods=period).mean().to_numpy()
+    x = _f64(series)
+    n = x.shape[0]
+    if np.isfinite(x).all():
+        # Prefix sums: O(n) regardless of the window length
+        out = np.full(n, np.nan)
+        if n >= period > 0:
+            cs = np.concatenate(([0.0], np.cumsum(x)))
+            out[period - 1:] = (cs[period:] - cs[:-period]) / period
+        return out
+    # Gaps need the NaN-aware rolling semantics
+    if HAVE_NUMBA:
+        return _sma_nb(x, period)
+    return _series(x).rolling(period, min_periods=period).mean().to_numpy()
 
 
 def rsi_wilder(close: pd.Series, period: int = 14) -> np.ndarray:
-    delta = close.diff()
-    gain = delta.clip(lower=0)
-    loss = -delta.clip(upper=0)
-
-    ag = np.empty(len(close)); ag[:] = np.nan
-    al = np.empty(len(close)); al[:] = np.nan
-
-    if len(close) > period:
-        ag[period] = gain.iloc[1:period + 1].mean()
-        al[period] = loss.iloc[1:period + 1].mean()
-        for i in range(period + 1, len(close)):
-            ag[i] = (ag[i - 1] * (period - 1) + gain.iloc[i]) / period
-            al[i] = (al[i - 1] * (period - 1) + loss.iloc[i]) / period
+    c = _f64(close)
+    delta = np.diff(c, prepend=np.nan)
+    gain = np.clip(delta, 0.0, None)  # np.clip keeps NaN, like Series.clip
+    loss = -np.clip(delta, None, 0.0)
+    if not HAVE_NUMBA and np.isfinite(delta[1:]).all():
+        ag, al = _wilder_ewm(gain, period), _wilder_ewm(loss, period)
+    else:
+        ag, al = _rsi_wilder_nb(gain, loss, period)
 
     rs = np.divide(ag, al, out=np.zeros_like(ag), where=al != 0)
     out = 100 - 100 / (1 + rs)
@@ -35,49 +364,168 @@ def rsi_wilder(close: pd.Series, period: int = 14) -> np.ndarray:
     return out
 
 
-def atr_wilder(high: pd.Series, low: pd.Series, close: pd.Series, period: int = 14) -> np.ndarray:
-    prev = close.shift(1)
-    tr = pd.concat([(high - low).abs(),
-                    (high - prev).abs(),
-                    (low - prev).abs()], axis=1).max(axis=1)
+def true_range(high, low, close) -> np.ndarray:
+    """Branchless, array-wide True Range: max(|h-l|, |h-c_prev|, |l-c_prev|)."""
+    h, l, c = _f64(high), _f64(low), _f64(close)
+    c_prev = np.empty_like(c)
+    if c.size:
+        c_prev[0] = c[0]
+        c_prev[1:] = c[:-1]
+    # fmax ignores a NaN operand, like the pandas max(axis=1) this replaced
+    return np.fmax(np.abs(h - l), np.fmax(np.abs(h - c_prev), np.abs(l - c_prev)))
+
+
+def rsi_last_two(close, period: int = 14):
+    """(last, previous) finite Wilder RSI without materializing the full series.
+
+    Matches the last two finite values of `rsi_wilder`; previous equals last when
+    only one is available, and both are NaN when there are none.
+    """
+    last, prev, _, _ = _rsi_scan_nb(_f64(close), period)
+    if prev != prev:
+        prev = last
+    return float(last), float(prev)
 
-    atr = np.empty(len(tr)); atr[:] = np.nan
-    if len(tr) > period:
-        atr[period] = tr.iloc[1:period + 1].mean()
-        for i in range(period + 1, len(tr)):
-            atr[i] = (atr[i - 1] * (period - 1) + tr.iloc[i]) / period
-    return atr
+
+def rsi_averages(close, period: int = 14):
+    """Wilder (avg_gain, avg_loss) after the last bar of `close`; NaN when too short."""
+    _, _, ag, al = _rsi_scan_nb(_f64(close), period)
+    return float(ag), float(al)
+
+
+def atr_wilder(high: pd.Series, low: pd.Series, close: pd.Series, period: int = 14) -> np.ndarray:
+    if HAVE_NUMBA:
+        return _atr_nb(_f64(high), _f64(low), _f64(close), period)
+    tr = true_range(high, low, close)
+    if np.isfinite(tr[1:]).all():
+        return _wilder_ewm(tr, period)
+    return _wilder_nb(tr, period)
 
 
 def obv(close: pd.Series, volume: pd.Series) -> np.ndarray:
-    direction = np.sign(close.diff()).fillna(0)
-    return (direction * volume).cumsum().to_numpy()
+    c, v = _f64(close), _f64(volume)
+    if c.size and np.isfinite(c).all() and np.isfinite(v).all():
+        return np.cumsum(np.sign(np.diff(c, prepend=c[0])) * v)
+    if HAVE_NUMBA:
+        return _obv_nb(c, v)
+    if not c.size:
+        return np.empty(0)
+    # _obv_nb in numpy: a NaN step is NaN in the output and skipped by the running sum
+    step = np.sign(np.diff(c, prepend=c[0]))
+    step[np.isnan(step)] = 0.0
+    step *= v
+    gaps = np.isnan(step)
+    step[gaps] = 0.0
+    out = np.cumsum(step)
+    out[gaps] = np.nan
+    return out
 
 
-def rolling_percentile(x: pd.Series, window: int = 200) -> np.ndarray:
-    out = np.full(len(x), np.nan)
-    for i in range(window - 1, len(x)):
-        w = x.iloc[i - window + 1:i + 1]
-        out[i] = (w.rank(pct=True).iloc[-1] * 100.0)
+def pad_rows(rows: Sequence[Iterable[float]]) -> np.ndarray:
+    """Stack per-symbol series into a (n_symbols, longest) float array, NaN-padded on the right.
+
+    The batch indicators are causal, so padding never changes a row's values
+    within its own length; slice each output row back to that length.
+    """
+    arrs = [_f64(r).ravel() for r in rows]
+    out = np.full((len(arrs), max((a.shape[0] for a in arrs), default=0)), np.nan)
+    for k, a in enumerate(arrs):
+        out[k, :a.shape[0]] = a
     return out
 
 
+def batch_rsi(closes, period: int = 14) -> np.ndarray:
+    """`rsi_wilder` of each row of a (n_symbols, n_bars) array, rows in parallel."""
+    c2 = _f64_2d(closes)
+    if HAVE_NUMBA:
+        return _batch_rsi_nb(c2, period)
+    return np.array([rsi_wilder(c, period) for c in c2]).reshape(c2.shape)
+
+
+def batch_atr(highs, lows, closes, period: int = 14) -> np.ndarray:
+    """`atr_wilder` of each row of (n_symbols, n_bars) arrays, rows in parallel."""
+    h2, l2, c2 = _f64_2d(highs), _f64_2d(lows), _f64_2d(closes)
+    if HAVE_NUMBA:
+        return _batch_atr_nb(h2, l2, c2, period)
+    return np.array([atr_wilder(h, l, c, period) for h, l, c in zip(h2, l2, c2)]).reshape(c2.shape)
+
+
+def batch_obv(closes, volumes) -> np.ndarray:
+    """`obv` of each row of (n_symbols, n_bars) arrays, rows in parallel."""
+    c2, v2 = _f64_2d(closes), _f64_2d(volumes)
+    if HAVE_NUMBA:
+        return _batch_obv_nb(c2, v2)
+    return np.array([obv(c, v) for c, v in zip(c2, v2)]).reshape(c2.shape)
+
+
+def rolling_percentile(x: pd.Series, window: int = 200) -> np.ndarray:
+    return _rolling_percentile_nb(_f64(x), window)
+
+
+# Memo for the resample-based regimes, keyed by a digest of the inputs: a live
+# loop re-asks for the same window until a new bar arrives, and any change
+# to the data is a different key, so entries never go stale (the TTL only bounds memory)
+_REGIME_MEMO_TTL = 3600.0
+_REGIME_MEMO_SIZE = 32
+
+
+def _fingerprint(close, index: pd.DatetimeIndex) -> bytes:
+    h = hashlib.blake2b(_f64(close).tobytes(), digest_size=16)
+    h.update(np.ascontiguousarray(index.asi8).tobytes())
+    return h.digest()
+
+
+def _regime_key(close, index, **params):
+    return (_fingerprint(close, close.index if index is None else index), tuple(params.items()))
+
+
+def _on_index(close, index: Optional[pd.DatetimeIndex]) -> pd.Series:
+    """`close` as a Series on `index`, reusing it as-is when it already carries that index."""
+    if isinstance(close, pd.Series) and (index is None or close.index is index):
+        return close
+    return pd.Series(np.asarray(close), index=index)
+
+
+def _copy_array(v):
+    return v.copy() if isinstance(v, np.ndarray) else v
+
+
+@ttl_cache(ttl=_REGIME_MEMO_TTL, key=_regime_key, on_hit=_copy_array, maxsize=_REGIME_MEMO_SIZE)
 def resampled_ema_trend(
     close: pd.Series,
-    index: pd.DatetimeIndex,
+    index: Optional[pd.DatetimeIndex] = None,
     rule: str = "6h",   # NOTE: lowercase to avoid pandas FutureWarning
     fast: int = 20,
     slow: int = 50,
-    buffer: float = 0.0
-) -> np.ndarray:
+    buffer: float = 0.0,
+    tail_bars: Optional[int] = None,
+    just_last: bool = False,
+) -> Union[np.ndarray, int]:
     """
     Returns -1/0/1 using EMA(fast) vs EMA(slow) on a resampled series with optional buffer.
+
+    index: timestamps of `close`; defaults to close.index (pass a DatetimeIndexed Series).
+
+    tail_bars: only resample the trailing `tail_bars` HTF buckets (e.g. 3*max(fast, slow));
+               the EMAs then start from that window instead of the full history.
+    just_last: return only the state at index[-1] as an int instead of the full array.
     """
-    s = pd.Series(close.values, index=index)
+    s = _on_index(close, index)
+    index = s.index
+    if tail_bars is not None and len(s):
+        s = s[s.index > s.index[-1] - tail_bars * pd.Timedelta(rule)]
     r = s.resample(rule, label="right", closed="right").last().dropna()
     efast = r.ewm(span=fast, adjust=False).mean()
     eslow = r.ewm(span=slow, adjust=False).mean()
 
+    if just_last:
+        # State of the last bucket labelled at or before index[-1] (what ffill picks)
+        k = int(r.index.searchsorted(index[-1], side="right")) - 1 if len(index) else -1
+        if k < 0:
+            return 0
+        ef, es = efast.iloc[k], eslow.iloc[k]
+        return 1 if ef > es * (1 + buffer) else (-1 if ef < es * (1 - buffer) else 0)
+
     bull = efast > eslow * (1 + buffer)
     bear = efast < eslow * (1 - buffer)
 
@@ -88,13 +536,16 @@ def resampled_ema_trend(
     return state.reindex(index, method="ffill").fillna(0).to_numpy()
 
 
-def daily_ema200_regime(close: pd.Series, index: pd.DatetimeIndex) -> np.ndarray:
+@ttl_cache(ttl=_REGIME_MEMO_TTL, key=_regime_key, on_hit=_copy_array, maxsize=_REGIME_MEMO_SIZE)
+def daily_ema200_regime(close: pd.Series, index: Optional[pd.DatetimeIndex] = None) -> np.ndarray:
     """
     - Output: 1 (bull, long-only), -1 (bear, short-only), 0 (neutral)
     - Logic: price above daily EMA200 AND EMA200 rising -> bull
              price below daily EMA200 AND EMA200 falling -> bear
+    - index defaults to close.index
     """
-    s = pd.Series(close.values, index=index)
+    s = _on_index(close, index)
+    index = s.index
     r = s.resample("1d", label="right", closed="right").last().dropna()
 
     ema200 = r.ewm(span=200, adjust=False).mean()
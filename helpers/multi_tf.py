@@ -0,0 +1,105 @@
+# ===============================
+# multi_tf.py
+# One candle fetch at the finest granularity, coarser frames resampled locally
+# ===============================
+from typing import Dict, Iterable, Optional
+
+import pandas as pd
+
+try:
+    from helpers.base_candles import get_coinbase_candles_df, _GRAN_MAP
+    from helpers.indicators import ema
+except ImportError:
+    from base_candles import get_coinbase_candles_df, _GRAN_MAP  # type: ignore
+    from indicators import ema  # type: ignore
+
+_OHLCV_AGG = {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"}
+
+
+def _rule(gran: str) -> str:
+    # '1M' means one minute here but one month to pandas: go through seconds
+    if gran in _GRAN_MAP:
+        return f"{_GRAN_MAP[gran]}s"
+    return gran.strip().lower()
+
+
+def _rule_seconds(gran: str) -> Optional[int]:
+    if gran in _GRAN_MAP:
+        return _GRAN_MAP[gran]
+    try:
+        return int(pd.Timedelta(_rule(gran)).total_seconds())
+    except (ValueError, TypeError):
+        return None
+
+
+def resample_ohlcv(df: pd.DataFrame, gran: str) -> pd.DataFrame:
+    """Resample a base candle frame to a coarser granularity.
+
+    Buckets are labelled/closed on the right, matching `resampled_ema_trend`.
+    Empty buckets (exchange gaps) are dropped.
+    """
+    r = (
+        df.set_index("datetime")[list(_OHLCV_AGG)]
+        .resample(_rule(gran), label="right", closed="right")
+        .agg(_OHLCV_AGG)
+        .dropna(subset=["close"])
+    )
+    out = r.reset_index()
+    out["timestamp"] = (out["datetime"] - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1)
+    return out[["timestamp", "low", "high", "open", "close", "volume", "datetime"]]
+
+
+def fetch_multi_tf(
+    product_id: str,
+    base_gran: str,
+    needs: Iterable[str] = (),
+    limits: Optional[Dict[str, int]] = None,
+) -> Dict[str, pd.DataFrame]:
+    """Return {granularity: candles} for `base_gran` plus each coarser `needs` entry.
+
+    limits: optional bars wanted per granularity. The base fetch is sized so every
+    derived frame gets its bars (Coinbase still caps a single request at 300).
+    """
+    limits = dict(limits or {})
+    base_s = _GRAN_MAP[base_gran] if base_gran in _GRAN_MAP else None
+    base_limit = int(limits.get(base_gran, 300))
+    for g in needs:
+        g_s = _rule_seconds(g)
+        if g in limits and base_s and g_s:
+            base_limit = max(base_limit, int(limits[g]) * max(1, g_s // base_s))
+
+    base = get_coinbase_candles_df(product_id, base_gran, base_limit)
+    frames = {base_gran: base}
+    for g in needs:
+        if g != base_gran and g not in frames:
+            frames[g] = resample_ohlcv(base, g)
+    return frames
+
+
+def last_closed_trend(
+    htf: pd.DataFrame,
+    asof,
+    fast: int = 20,
+    slow: int = 50,
+    buffer: float = 0.0,
+    tail_bars: Optional[int] = None,
+) -> int:
+    """-1/0/1 EMA(fast) vs EMA(slow) state of the last HTF bucket labelled at or before `asof`.
+
+    Same value as `resampled_ema_trend(..., just_last=True)` on the base series.
+    Only the trailing `tail_bars` buckets (default 3*max(fast, slow)) up to that
+    bucket feed the EMAs.
+    """
+    k = int(htf["datetime"].searchsorted(pd.Timestamp(asof), side="right")) - 1
+    if k < 0:
+        return 0
+    if tail_bars is None:
+        tail_bars = 3 * max(fast, slow)
+    close = htf["close"].to_numpy(dtype=float)[max(0, k + 1 - tail_bars):k + 1]
+    ef = ema(close, fast)[-1]
+    es = ema(close, slow)[-1]
+    if ef > es * (1 + buffer):
+        return 1
+    if ef < es * (1 - buffer):
+        return -1
+    return 0
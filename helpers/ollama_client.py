@@ -0,0 +1,47 @@
+# ===============================
+# ollama_client.py
+# Ollama client that encodes request bodies with orjson when available
+# ===============================
+import inspect
+
+from ollama import Client
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover - depends on environment
+    orjson = None
+
+
+class OrjsonClient(Client):
+    """ollama.Client whose JSON request bodies are serialized by orjson.
+
+    httpx encodes `json=` payloads with the stdlib encoder; handing it ready
+    bytes via `content=` skips that for the (often large) chat message list.
+    """
+
+    def _request(self, cls, *args, stream: bool = False, **kwargs):
+        if "json" in kwargs:
+            kwargs["content"] = orjson.dumps(kwargs.pop("json"), option=orjson.OPT_NON_STR_KEYS)
+        return super()._request(cls, *args, stream=stream, **kwargs)
+
+
+def _can_override_request() -> bool:
+    """Whether Client._request still has the private (cls, *args, stream=, **kwargs)
+    shape the override relies on (ollama is pinned in requirements.txt, but check)."""
+    try:
+        params = list(inspect.signature(Client._request).parameters.values())
+    except (AttributeError, TypeError, ValueError):
+        return False
+    return (
+        len(params) >= 3 and params[1].name == "cls"
+        and any(p.kind is p.VAR_POSITIONAL for p in params)
+        and any(p.name == "stream" and p.kind is p.KEYWORD_ONLY for p in params)
+        and any(p.kind is p.VAR_KEYWORD for p in params)
+    )
+
+
+if orjson is not None and _can_override_request():
+    _client = OrjsonClient()
+    chat = _client.chat
+else:
+    from ollama import chat  # noqa: F401
@@ -1,9 +1,25 @@
 from __future__ import annotations
-from dataclasses import dataclass, asdict
-from datetime import datetime, timezone
-from typing import Optional, Dict, List
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Deque, Optional, Dict, List, Tuple
+import atexit
 import json
 import logging
+import math
+import os
+import struct
+import time
+
+import numpy as np
+
+try:
+    from helpers._njit import njit, HAVE_NUMBA
+    from helpers.fast_json import dumps as json_dumps, loads as json_loads
+except ImportError:
+    from _njit import njit, HAVE_NUMBA  # type: ignore
+    from fast_json import dumps as json_dumps, loads as json_loads  # type: ignore
 
 logger = logging.getLogger(__name__)
 
@@ -12,7 +28,7 @@ logger = logging.getLogger(__name__)
 # Minimal paper trading engine
 # -----------------------------
 
-@dataclass
+@dataclass(slots=True)
 class Position:
     side: str = "FLAT"            # FLAT | LONG | SHORT
     size: float = 0.0             # asset units (e.g., BTC)
@@ -21,6 +37,204 @@ class Position:
     take_profit: Optional[float] = None
     atr_at_entry: Optional[float] = None
 
+    def as_dict(self) -> Dict:
+        """Field dict (same as dataclasses.asdict, without its per-call field introspection)."""
+        return {
+            "side": self.side,
+            "size": self.size,
+            "entry_price": self.entry_price,
+            "stop_loss": self.stop_loss,
+            "take_profit": self.take_profit,
+            "atr_at_entry": self.atr_at_entry,
+        }
+
+
+# -----------------------------
+# Append-only binary trade log
+# -----------------------------
+# One record per trade_history event: event, side, timestamp_ns (epoch ns), size,
+# price, sl, tp, pnl (NaN = None), then a length-prefixed UTF-8 close reason.
+_LOG_RECORD = struct.Struct("<BBqdddddB")
+_EVENTS = ("OPEN", "CLOSE")
+_SIDES = ("LONG", "SHORT")
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_NAN = float("nan")
+
+
+def _opt(x: Optional[float]) -> float:
+    return _NAN if x is None else float(x)
+
+
+def _norm_atr(atr: Optional[float]) -> float:
+    """ATR as a finite positive float, or 0.0 ("no trailing") when missing/NaN/non-positive."""
+    return 0.0 if atr is None or not math.isfinite(atr) or atr <= 0 else float(atr)
+
+
+def _iso_ns(ns: int) -> str:
+    """ISO-8601 UTC text of an epoch-nanosecond timestamp (µs precision, like datetime.isoformat)."""
+    return (_EPOCH + timedelta(microseconds=ns // 1000)).isoformat()
+
+
+def _event_ns(ev: Dict) -> int:
+    if "timestamp_ns" in ev:
+        return int(ev["timestamp_ns"])
+    # Legacy events carry an ISO "timestamp" instead
+    ts = datetime.fromisoformat(ev["timestamp"])
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return (ts - _EPOCH) // timedelta(microseconds=1) * 1000
+
+
+def _encode_event(ev: Dict) -> bytes:
+    reason = str(ev.get("reason") or "").encode()[:255]
+    return _LOG_RECORD.pack(
+        _EVENTS.index(ev["event"]), _SIDES.index(ev["side"]), _event_ns(ev),
+        float(ev["size"]), float(ev["price"]), _opt(ev.get("sl")), _opt(ev.get("tp")), _opt(ev.get("pnl")), len(reason),
+    ) + reason
+
+
+def _decode_events(data: bytes) -> Tuple[List[Dict], int]:
+    """Events in `data` and the byte length of the complete records."""
+    events: List[Dict] = []
+    off, n = 0, len(data)
+    while off + _LOG_RECORD.size <= n:
+        event, side, ts_ns, size, price, sl, tp, pnl, rlen = _LOG_RECORD.unpack_from(data, off)
+        end = off + _LOG_RECORD.size + rlen
+        if end > n:
+            break  # torn final record
+        reason = data[end - rlen:end].decode()
+        off = end
+        ev: Dict = {"event": _EVENTS[event], "side": _SIDES[side], "size": size, "price": price}
+        if ev["event"] == "OPEN":
+            ev["sl"] = None if math.isnan(sl) else sl
+            ev["tp"] = None if math.isnan(tp) else tp
+        else:
+            ev["pnl"] = pnl
+            ev["reason"] = reason
+        ev["timestamp_ns"] = ts_ns
+        events.append(ev)
+    return events, off
+
+
+def protective_exit(side: str, entry_price: float, stop_loss: Optional[float], take_profit: Optional[float],
+                    atr: Optional[float], price: float) -> Tuple[Optional[float], Optional[Tuple[float, str]]]:
+    """Breakeven/trailing update and SL/TP check for one price, without broker state.
+
+    Returns (stop_loss after the update, (exit_price, "SL" | "TP") if hit else None).
+    Same rules as PaperBroker.on_price, which uses it.
+    """
+    if side == "LONG":
+        return _protect_long(entry_price, stop_loss, take_profit, atr or 0.0, price)
+    if side == "SHORT":
+        return _protect_short(entry_price, stop_loss, take_profit, atr or 0.0, price)
+    return stop_loss, None
+
+
+# Per-side bodies of protective_exit: signs and compare directions are fixed, so
+# a tick runs no side test. BE at +1×ATR; trail by 1×ATR after +1.5×ATR (only
+# reachable once BE's threshold is). `atr` is a float (0.0 = no trailing).
+def _protect_long(entry_price: float, stop_loss: Optional[float], take_profit: Optional[float],
+                  atr: float, price: float) -> Tuple[Optional[float], Optional[Tuple[float, str]]]:
+    if atr > 0:
+        profit = price - entry_price
+        if profit >= atr:
+            stop_loss = max(stop_loss or -1e18, entry_price)
+            if profit >= 1.5 * atr:
+                stop_loss = max(stop_loss or -1e18, price - atr)
+    if stop_loss is not None and price <= stop_loss:
+        return stop_loss, (stop_loss, "SL")
+    if take_profit is not None and price >= take_profit:
+        return stop_loss, (take_profit, "TP")
+    return stop_loss, None
+
+
+def _protect_short(entry_price: float, stop_loss: Optional[float], take_profit: Optional[float],
+                   atr: float, price: float) -> Tuple[Optional[float], Optional[Tuple[float, str]]]:
+    if atr > 0:
+        profit = entry_price - price
+        if profit >= atr:
+            stop_loss = min(stop_loss or 1e18, entry_price)
+            if profit >= 1.5 * atr:
+                stop_loss = min(stop_loss or 1e18, price + atr)
+    if stop_loss is not None and price >= stop_loss:
+        return stop_loss, (stop_loss, "SL")
+    if take_profit is not None and price <= take_profit:
+        return stop_loss, (take_profit, "TP")
+    return stop_loss, None
+
+
+_PROTECT = {"LONG": _protect_long, "SHORT": _protect_short}
+
+
+_REASONS = ("", "SL", "TP")
+
+
+# NaN tests below (None levels are NaN): no fastmath
+@njit(cache=True)
+def _replay_nb(prices, is_long, entry_price, stop_loss, take_profit, atr):
+    """protective_exit over a price path until the first hit.
+
+    Returns (index or -1, exit price, reason code into _REASONS, stop_loss after
+    the last processed price); stop_loss/take_profit NaN mean None.
+    """
+    # Levels are kept sign-folded (negated for shorts) for the whole loop, so
+    # the body has no side branches; unfolded once on return
+    s = 1.0 if is_long else -1.0
+    se = s * entry_price
+    sl = s * stop_loss    # NaN (no SL) stays NaN: the SL test below is false
+    tp = s * take_profit  # likewise for TP
+    be_at = atr
+    trail_at = 1.5 * atr
+    # Loop-invariant: LLVM unswitches it, so the no-ATR loop carries no trailing work
+    trailing = atr > 0
+    for i in range(prices.shape[0]):
+        sp = s * prices[i]
+        if trailing:
+            profit = sp - se
+            # Ratchet to a level unless the stop is already at/beyond it; a missing
+            # (NaN) or zero stop counts as unset, as `stop_loss or ±1e18` does
+            if profit >= be_at and (not sl >= se or sl == 0):
+                sl = se
+            if profit >= trail_at and (not sl >= sp - atr or sl == 0):
+                sl = sp - atr
+        if sp <= sl:
+            return i, s * sl, 1, s * sl
+        if sp >= tp:
+            return i, take_profit, 2, s * sl
+    return -1, np.nan, 0, s * sl
+
+
+def _replay_np(prices, is_long, entry_price, stop_loss, take_profit, atr):
+    """_replay_nb with whole-array NumPy ops (used when numba is missing).
+
+    With levels sign-folded, the ratcheted stop is a running maximum: the entry
+    once BE has armed, and max(price - ATR) over the prices past the trail
+    threshold. Exact for positive prices (where an armed stop is never 0).
+    """
+    s = 1.0 if is_long else -1.0
+    se = s * entry_price
+    sp = s * prices
+    sl = np.full(sp.shape, s * stop_loss)
+    if atr > 0 and sp.size:
+        profit = sp - se
+        trail = profit >= 1.5 * atr
+        armed = np.logical_or.accumulate(profit >= atr)  # trail's threshold implies BE's
+        if armed.any():
+            # A missing (NaN) or zero initial stop counts as unset, as in the kernel
+            base = s * stop_loss if stop_loss == stop_loss and stop_loss != 0 else -np.inf
+            level = np.maximum.accumulate(np.where(trail, sp - atr, -np.inf))
+            level = np.maximum(level, np.where(armed, se, -np.inf))
+            np.maximum(level, base, out=level)
+            sl = np.where(armed, level, sl)
+    hit_sl = sp <= sl
+    hit = hit_sl | (sp >= s * take_profit)
+    i = int(np.argmax(hit)) if hit.size else 0
+    if not hit.size or not hit[i]:
+        return -1, np.nan, 0, s * sl[-1] if sl.size else stop_loss
+    if hit_sl[i]:
+        return i, s * sl[i], 1, s * sl[i]
+    return i, take_profit, 2, s * sl[i]
+
 
 class PaperBroker:
     """
@@ -30,43 +244,106 @@ class PaperBroker:
     Trailing logic (same as source):
       • Arm breakeven after +1×ATR in favor
       • After +1.5×ATR, trail by 1×ATR
+
+    Persistence: `state_path` holds a small JSON header (cash, position) and
+    `state_path + ".log"` the trade history as append-only binary records.
+    Opens/closes are written immediately; stop moves from on_price are batched
+    and written at most every `flush_interval` seconds (and by flush(), which
+    also runs at interpreter exit).
+
+    `trade_history` keeps only the newest `history_cap` events in memory (None =
+    unbounded); with a state_path, history() reads older ones back from the log.
     """
 
-    def __init__(self, starting_balance: float = 10_000.0, state_path: Optional[str] = None):
+    def __init__(self, starting_balance: float = 10_000.0, state_path: Optional[str] = None,
+                 flush_interval: float = 5.0, history_cap: Optional[int] = 10_000):
         self.starting_balance = float(starting_balance)
         self.cash = float(starting_balance)
         self.position: Position = Position()
-        self.trade_history: List[Dict] = []
+        self.trade_history: Deque[Dict] = deque(maxlen=history_cap)
         self.state_path = state_path
+        self.flush_interval = float(flush_interval)
+        self._dirty = False
+        self._last_flush_ts = time.monotonic()
+        self._log = None
         if self.state_path:
-            self._load()
+            legacy = self._load()
+            self._log = open(self.state_path + ".log", "ab", buffering=0)
+            if legacy:
+                # One-time migration of a full-snapshot state file
+                blob = b"".join(_encode_event(ev) for ev in legacy)
+                self._log.write(blob)
+                self.trade_history.clear()
+                self.trade_history.extend(_decode_events(blob)[0])
+                self._save()
+            atexit.register(self.flush)
 
     # -----------------------------
     # Persistence (optional)
     # -----------------------------
     def _save(self) -> None:
+        """Atomically replace the state file (temp file, fsync, os.replace).
+
+        Only runs on trade events and flush-interval boundaries (see on_price),
+        so this is the one sync point per batch.
+        """
         if not self.state_path:
             return
         state = {
             "starting_balance": self.starting_balance,
             "cash": self.cash,
-            "position": asdict(self.position),
-            "trade_history": self.trade_history,
+            "position": self.position.as_dict(),
             "updated": datetime.now(timezone.utc).isoformat(),
         }
-        with open(self.state_path, "w") as f:
-            json.dump(state, f, indent=2)
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(json_dumps(state, indent=True))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.state_path)
+        self._dirty = False
+        self._last_flush_ts = time.monotonic()
 
-    def _load(self) -> None:
+    def flush(self) -> None:
+        """Write state changes still pending from on_price."""
+        if self._dirty:
+            self._save()
+
+    def _record(self, event: Dict) -> None:
+        self.trade_history.append(event)
+        if self._log is not None:
+            self._log.write(_encode_event(event))
+
+    def _load(self) -> List[Dict]:
+        """Restore header and trade log; returns history still to migrate from
+        a legacy state file (one that embeds trade_history), else []."""
         try:
-            with open(self.state_path, "r") as f:
-                s = json.load(f)
+            with open(self.state_path, "rb") as f:
+                raw = f.read()
+            try:
+                s = json_loads(raw)
+            except ValueError:
+                s = json.loads(raw)  # older files written by the stdlib may hold NaN/Infinity
             self.starting_balance = float(s.get("starting_balance", self.starting_balance))
             self.cash = float(s.get("cash", self.cash))
             self.position = Position(**s.get("position", {}))
-            self.trade_history = list(s.get("trade_history", []))
+            if self.position.side != "FLAT":
+                self.position.atr_at_entry = _norm_atr(self.position.atr_at_entry)
+            legacy = list(s.get("trade_history", []))
         except Exception:
-            pass
+            legacy = []
+        try:
+            with open(self.state_path + ".log", "r+b") as f:
+                data = f.read()
+                logged, end = _decode_events(data)
+                if end < len(data):
+                    f.truncate(end)  # drop a torn final record so appends stay aligned
+        except OSError:
+            logged = []
+        if logged:
+            legacy = []  # already migrated
+        self.trade_history.extend(logged + legacy)
+        return legacy
 
     # -----------------------------
     # Sizing helper
@@ -76,7 +353,8 @@ class PaperBroker:
         """ATR‑aware unit sizing with a floor (matches source approach).
         Ensures you don't oversize in low‑vol regimes.
         """
-        if atr is None or not (atr == atr) or atr <= 0:
+        atr = _norm_atr(atr)
+        if not atr:
             # If ATR unavailable, fallback to price * min_vol_frac as a proxy
             atr_for_size = max(price * min_vol_frac, 1e-12)
         else:
@@ -87,18 +365,18 @@ class PaperBroker:
     # Core order methods
     # -----------------------------
     def open_long(self, price: float, size: float, sl: Optional[float] = None, tp: Optional[float] = None, atr: Optional[float] = None) -> None:
-        self.position = Position(side="LONG", size=float(size), entry_price=float(price), stop_loss=sl, take_profit=tp, atr_at_entry=atr)
-        self.trade_history.append({
+        self.position = Position(side="LONG", size=float(size), entry_price=float(price), stop_loss=sl, take_profit=tp, atr_at_entry=_norm_atr(atr))
+        self._record({
             "event": "OPEN", "side": "LONG", "size": float(size), "price": float(price),
-            "sl": sl, "tp": tp, "timestamp": datetime.now(timezone.utc).isoformat()
+            "sl": sl, "tp": tp, "timestamp_ns": time.time_ns()
         })
         self._save()
 
     def open_short(self, price: float, size: float, sl: Optional[float] = None, tp: Optional[float] = None, atr: Optional[float] = None) -> None:
-        self.position = Position(side="SHORT", size=float(size), entry_price=float(price), stop_loss=sl, take_profit=tp, atr_at_entry=atr)
-        self.trade_history.append({
+        self.position = Position(side="SHORT", size=float(size), entry_price=float(price), stop_loss=sl, take_profit=tp, atr_at_entry=_norm_atr(atr))
+        self._record({
             "event": "OPEN", "side": "SHORT", "size": float(size), "price": float(price),
-            "sl": sl, "tp": tp, "timestamp": datetime.now(timezone.utc).isoformat()
+            "sl": sl, "tp": tp, "timestamp_ns": time.time_ns()
         })
         self._save()
 
@@ -111,9 +389,9 @@ class PaperBroker:
         else:  # SHORT
             pnl = (pos.entry_price - float(price)) * pos.size
         self.cash += pnl
-        self.trade_history.append({
+        self._record({
             "event": "CLOSE", "side": pos.side, "size": pos.size, "price": float(price),
-            "pnl": pnl, "reason": reason, "timestamp": datetime.now(timezone.utc).isoformat()
+            "pnl": pnl, "reason": reason, "timestamp_ns": time.time_ns()
         })
         self.position = Position()
         self._save()
@@ -142,52 +420,90 @@ class PaperBroker:
         Returns an exit event dict if a position was closed by SL/TP, else None.
         """
         pos = self.position
-        if pos.side == "FLAT" or pos.size <= 0:
+        if pos.size <= 0.0:  # FLAT positions have size 0
+            return None
+        protect = _PROTECT.get(pos.side)
+        if protect is None:
             return None
 
-        last_price = float(price)
-        atr = pos.atr_at_entry or 0.0
-
-        # Arm BE at +1×ATR; trail by 1×ATR after +1.5×ATR
-        if pos.side == "LONG" and atr > 0:
-            profit = last_price - pos.entry_price
-            if profit >= atr:
-                pos.stop_loss = max(pos.stop_loss or -1e18, pos.entry_price)
-            if profit >= 1.5 * atr:
-                pos.stop_loss = max(pos.stop_loss or -1e18, last_price - atr)
-        elif pos.side == "SHORT" and atr > 0:
-            profit = pos.entry_price - last_price
-            if profit >= atr:
-                pos.stop_loss = min(pos.stop_loss or 1e18, pos.entry_price)
-            if profit >= 1.5 * atr:
-                pos.stop_loss = min(pos.stop_loss or 1e18, last_price + atr)
-
-        # Check protective levels
-        hit_sl = pos.stop_loss is not None and (
-            (last_price <= pos.stop_loss and pos.side == "LONG") or
-            (last_price >= pos.stop_loss and pos.side == "SHORT")
-        )
-        hit_tp = pos.take_profit is not None and (
-            (last_price >= pos.take_profit and pos.side == "LONG") or
-            (last_price <= pos.take_profit and pos.side == "SHORT")
+        prev_sl = pos.stop_loss
+        pos.stop_loss, hit = protect(
+            pos.entry_price, prev_sl, pos.take_profit, pos.atr_at_entry or 0.0, float(price)
         )
 
-        if hit_sl or hit_tp:
-            exit_price = pos.stop_loss if hit_sl else pos.take_profit
-            pnl = self.close(exit_price, reason="SL" if hit_sl else "TP")
+        if hit:
+            exit_price, reason = hit
+            pnl = self.close(exit_price, reason=reason)  # persists immediately
             event = {
                 "event": "EXIT", "side": "LONG" if pnl >= 0 else "SHORT",  # side here is not critical
-                "price": float(exit_price), "pnl": pnl, "timestamp": datetime.now(timezone.utc).isoformat()
+                "price": float(exit_price), "pnl": pnl, "timestamp_ns": time.time_ns()
             }
-            self._save()
             return event
 
-        self._save()
+        # Only a stop move changes state; batch those writes
+        if pos.stop_loss != prev_sl:
+            self._dirty = True
+            if time.monotonic() - self._last_flush_ts >= self.flush_interval:
+                self._save()
+        return None
+
+    def replay(self, prices) -> Optional[Dict]:
+        """on_price over a whole price array in one compiled loop (backtests;
+        whole-array NumPy when numba is missing).
+
+        Stops at the first SL/TP hit, which is closed and returned like on_price's
+        exit event plus its "index" in `prices`; None if the position survives
+        (its trailed stop is kept) or there is no position.
+        """
+        pos = self.position
+        if pos.side == "FLAT" or pos.size <= 0:
+            return None
+        p = np.ascontiguousarray(prices, dtype=np.float64).ravel()
+        prev_sl = pos.stop_loss
+        idx, exit_price, reason, sl = (_replay_nb if HAVE_NUMBA else _replay_np)(
+            p, pos.side == "LONG", float(pos.entry_price),
+            np.nan if prev_sl is None else float(prev_sl),
+            np.nan if pos.take_profit is None else float(pos.take_profit),
+            _norm_atr(pos.atr_at_entry),
+        )
+        pos.stop_loss = None if sl != sl else float(sl)
+
+        if idx >= 0:
+            pnl = self.close(float(exit_price), reason=_REASONS[reason])  # persists immediately
+            return {
+                "event": "EXIT", "side": "LONG" if pnl >= 0 else "SHORT",  # side here is not critical
+                "price": float(exit_price), "pnl": pnl, "index": int(idx), "timestamp_ns": time.time_ns()
+            }
+
+        if pos.stop_loss != prev_sl:
+            self._dirty = True
+            if time.monotonic() - self._last_flush_ts >= self.flush_interval:
+                self._save()
         return None
 
     # -----------------------------
     # Reporting
     # -----------------------------
+    def history(self, limit: Optional[int] = None) -> List[Dict]:
+        """The last `limit` trade_history events (all when None), each with an ISO
+        "timestamp" formatted from its timestamp_ns; only these rows are formatted.
+
+        Events already rotated out of the in-memory cap are read back from the log.
+        """
+        if limit is not None and limit <= 0:
+            return []
+        mem = self.trade_history
+        if limit is not None and limit <= len(mem):
+            rows = islice(mem, len(mem) - limit, None)
+        elif len(mem) == mem.maxlen and self._log is not None:
+            with open(self.state_path + ".log", "rb") as f:
+                rows = _decode_events(f.read())[0]
+            if limit is not None:
+                rows = rows[-limit:]
+        else:
+            rows = mem
+        return [{**ev, "timestamp": _iso_ns(_event_ns(ev))} for ev in rows]
+
     def summary(self, mark_price: Optional[float] = None) -> Dict:
         pos = self.position
         last_price = float(mark_price) if mark_price is not None else pos.entry_price
@@ -199,7 +515,7 @@ class PaperBroker:
         total = self.cash + (pos.size * last_price if pos.side == "LONG" else 0.0)
         return {
             "cash": self.cash,
-            "position": asdict(pos),
+            "position": pos.as_dict(),
             "last_price": last_price,
             "equity": total,
             "pnl": total - self.starting_balance,
@@ -2,16 +2,111 @@
 """
 Trade History tool, extracted from portfolio_performance.py
 Provides:
+- iter_trade_history(limit, strategy_filter) -> Iterator[Dict] (streamed from the cursor)
 - get_trade_history(limit, strategy_filter) -> Dict
 - get_trade_history_tool(limit, strategy_filter) -> str (agent-friendly)
 """
 
 import logging
-from typing import Dict, Any
-from agent_tools.trade_tracker import trade_tracker
+import sqlite3
+import threading
+from typing import Dict, Any, Iterator, Optional
+from urllib.request import pathname2url
+from agent_tools.trade_tracker import get_trade_tracker
 
 logger = logging.getLogger(__name__)
 
+_FETCH_ROWS = 64  # rows pulled per locked fetch while streaming
+
+# One read-only connection shared by every call (opened on first use); the lock
+# serializes execute/fetch across threads
+_reader_lock = threading.Lock()
+_reader_conn: Optional[sqlite3.Connection] = None
+
+
+def _reader() -> sqlite3.Connection:
+    """The shared read-only connection; call with _reader_lock held.
+
+    The tracker's DB is already in WAL mode (persistent in the file), so this
+    reader never blocks its writes; reads go through a 256 MB mmap window.
+    """
+    global _reader_conn
+    if _reader_conn is None:
+        db_path = get_trade_tracker().db_path  # creates the DB on first use
+        conn = sqlite3.connect(f"file:{pathname2url(db_path)}?mode=ro", uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-64000")  # ~64 MB page cache
+        conn.execute("PRAGMA mmap_size=268435456")  # 256 MB
+        conn.execute("PRAGMA busy_timeout=5000")
+        _reader_conn = conn
+    return _reader_conn
+
+
+# P&L percentage and holding period (from the epoch-microsecond columns) are
+# computed by SQLite; both are NULL until the trade has an exit.
+_HISTORY_SQL = (
+    "SELECT trade_id, strategy, product_id, side, entry_price, exit_price, quantity, realized_pnl, status, "
+    "entry_time, exit_time, fees_paid, notes, "
+    "CASE WHEN entry_price IS NOT NULL AND exit_price IS NOT NULL "
+    "THEN ((exit_price - entry_price) / entry_price) * 100.0 END AS pnl_pct, "
+    "CASE WHEN entry_time_us IS NOT NULL AND exit_time_us IS NOT NULL "
+    "THEN (exit_time_us - entry_time_us) / 3600000000.0 END AS holding_hours "
+    "FROM trades"
+)
+_HISTORY_ALL_SQL = _HISTORY_SQL + " ORDER BY entry_time_us DESC LIMIT ?"
+_HISTORY_BY_STRATEGY_SQL = _HISTORY_SQL + " WHERE strategy = ? ORDER BY entry_time_us DESC LIMIT ?"
+
+
+def _format_trade(row: sqlite3.Row) -> Dict[str, Any]:
+    pnl_percentage = row["pnl_pct"]
+    holding_period_hours = row["holding_hours"]
+    return {
+        "trade_id": row["trade_id"],
+        "strategy": row["strategy"],
+        "product_id": row["product_id"],
+        "side": row["side"],
+        "status": row["status"],
+        "entry_price": row["entry_price"],
+        "exit_price": row["exit_price"],
+        "quantity": row["quantity"],
+        "realized_pnl": row["realized_pnl"],
+        "pnl_percentage": round(pnl_percentage, 2) if pnl_percentage is not None else None,
+        "entry_time": row["entry_time"],
+        "exit_time": row["exit_time"],
+        "holding_period_hours": round(holding_period_hours, 1) if holding_period_hours is not None else None,
+        "fees_paid": row["fees_paid"],
+        "notes": row["notes"]
+    }
+
+
+def iter_trade_history(limit: int = 20, strategy_filter: str = None) -> Iterator[Dict[str, Any]]:
+    """
+    Formatted trades, newest first, yielded as the cursor reads them.
+    
+    Rows come from the shared read-only connection in batches of _FETCH_ROWS;
+    the cursor is closed once the generator is exhausted or closed.
+    """
+    # Pick the statement for the optional strategy filter
+    if strategy_filter:
+        query, params = _HISTORY_BY_STRATEGY_SQL, (strategy_filter, limit)
+    else:
+        query, params = _HISTORY_ALL_SQL, (limit,)
+    
+    with _reader_lock:
+        cursor = _reader().execute(query, params)
+    try:
+        while True:
+            with _reader_lock:
+                rows = cursor.fetchmany(_FETCH_ROWS)
+            if not rows:
+                return
+            for row in rows:
+                yield _format_trade(row)
+    finally:
+        with _reader_lock:
+            cursor.close()
+
 
 def get_trade_history(limit: int = 20, strategy_filter: str = None) -> Dict[str, Any]:
     """
@@ -27,28 +122,10 @@ def get_trade_history(limit: int = 20, strategy_filter: str = None) -> Dict[str,
     try:
         logger.info(f"📋 Retrieving trade history (limit: {limit})")
         
-        # Get trades from database directly
-        import sqlite3
-        
-        conn = sqlite3.connect(trade_tracker.db_path)
-        cursor = conn.cursor()
-        
-        # Build query with optional strategy filter
-        query = "SELECT trade_id, strategy, product_id, side, entry_price, exit_price, quantity, realized_pnl, status, entry_time, exit_time, fees_paid, notes FROM trades"
-        params = []
-        
-        if strategy_filter:
-            query += " WHERE strategy = ?"
-            params.append(strategy_filter)
-            
-        query += " ORDER BY entry_time DESC LIMIT ?"
-        params.append(limit)
-        
-        cursor.execute(query, params)
-        raw_trades = cursor.fetchall()
-        conn.close()
+        # Stream and format trades straight from the cursor
+        formatted_trades = list(iter_trade_history(limit=limit, strategy_filter=strategy_filter))
         
-        if not raw_trades:
+        if not formatted_trades:
             logger.warning("⚠️ No trades found in database")
             return {
                 "success": True,
@@ -57,45 +134,6 @@ def get_trade_history(limit: int = 20, strategy_filter: str = None) -> Dict[str,
                 "summary": "No trading history available"
             }
         
-        # Process and format trades
-        formatted_trades = []
-        for row in raw_trades:
-            # Calculate P&L percentage if we have both entry and exit prices
-            pnl_percentage = None
-            holding_period_hours = None
-            
-            if row[4] is not None and row[5] is not None:  # entry_price and exit_price
-                pnl_percentage = ((row[5] - row[4]) / row[4]) * 100
-                
-            # Calculate holding period if we have both times
-            if row[9] is not None and row[10] is not None:  # entry_time and exit_time
-                from datetime import datetime
-                try:
-                    entry_dt = datetime.fromisoformat(row[9].replace('Z', '+00:00'))
-                    exit_dt = datetime.fromisoformat(row[10].replace('Z', '+00:00'))
-                    holding_period_hours = (exit_dt - entry_dt).total_seconds() / 3600
-                except:
-                    holding_period_hours = None
-            
-            formatted_trade = {
-                "trade_id": row[0],
-                "strategy": row[1],
-                "product_id": row[2],
-                "side": row[3],
-                "status": row[8],
-                "entry_price": row[4],
-                "exit_price": row[5],
-                "quantity": row[6],
-                "realized_pnl": row[7],
-                "pnl_percentage": round(pnl_percentage, 2) if pnl_percentage is not None else None,
-                "entry_time": row[9],
-                "exit_time": row[10],
-                "holding_period_hours": round(holding_period_hours, 1) if holding_period_hours is not None else None,
-                "fees_paid": row[11],
-                "notes": row[12]
-            }
-            formatted_trades.append(formatted_trade)
-        
         result = {
             "success": True,
             "trade_count": len(formatted_trades),
@@ -117,6 +155,10 @@ def get_trade_history(limit: int = 20, strategy_filter: str = None) -> Dict[str,
         }
 
 
+_STATUS_EMOJI = {"closed": "✅"}
+_PNL_EMOJI = {1: "💚", -1: "❌", 0: "➖"}  # keyed by the sign of realized P&L
+
+
 def get_trade_history_tool(limit: int = 10, strategy_filter: str = None) -> str:
     """
     Agent tool wrapper for trade history retrieval.
@@ -138,34 +180,26 @@ def get_trade_history_tool(limit: int = 10, strategy_filter: str = None) -> str:
             ""
         ]
         
+        # Prices and P&L come straight from REAL columns, so they are formatted as-is
+        add = response_lines.append
         for i, trade in enumerate(result["trades"][:limit], 1):
-            status_val = (trade.get("status") or "").lower()
-            status_emoji = "✅" if status_val == "closed" else "🔄"
-            # Safely interpret realized_pnl for emoji selection
-            _rp = trade.get("realized_pnl")
-            try:
-                rpnl = float(_rp) if _rp is not None else 0.0
-            except Exception:
-                rpnl = 0.0
-            pnl_emoji = "💚" if rpnl > 0 else "❌" if rpnl < 0 else "➖"
-            
-            trade_lines = [
-                f"{status_emoji} Trade #{i} ({trade['trade_id']})",
-                f"   Strategy: {trade['strategy']} | {trade['product_id']} | {trade['side'].upper()}",
-                f"   Entry: ${trade['entry_price']:.2f} | Exit: ${trade.get('exit_price', 'PENDING'):.2f}" if trade.get('exit_price') else f"   Entry: ${trade['entry_price']:.2f} | Exit: PENDING",
-                f"   Quantity: {trade['quantity']} | Status: {trade['status']}"
-            ]
+            entry_price, exit_price = trade["entry_price"], trade["exit_price"]
+            add(f"{_STATUS_EMOJI.get((trade['status'] or '').lower(), '🔄')} Trade #{i} ({trade['trade_id']})")
+            add(f"   Strategy: {trade['strategy']} | {trade['product_id']} | {trade['side'].upper()}")
+            add(f"   Entry: ${entry_price:.2f} | Exit: ${exit_price:.2f}" if exit_price
+                else f"   Entry: ${entry_price:.2f} | Exit: PENDING")
+            add(f"   Quantity: {trade['quantity']} | Status: {trade['status']}")
             
-            if trade.get("realized_pnl") is not None:
-                pnl_pct = trade.get("pnl_percentage")
-                pct_str = f"{float(pnl_pct):.2f}%" if isinstance(pnl_pct, (int, float)) else "N/A"
-                trade_lines.append(f"   {pnl_emoji} P&L: ${float(trade['realized_pnl']):.2f} ({pct_str})")
+            realized_pnl = trade["realized_pnl"]
+            if realized_pnl is not None:
+                pnl_pct = trade["pnl_percentage"]
+                pct_str = f"{pnl_pct:.2f}%" if pnl_pct is not None else "N/A"
+                add(f"   {_PNL_EMOJI[(realized_pnl > 0) - (realized_pnl < 0)]} P&L: ${realized_pnl:.2f} ({pct_str})")
             
-            if trade.get("holding_period_hours"):
-                trade_lines.append(f"   ⏱️ Held: {trade['holding_period_hours']:.1f} hours")
+            if trade["holding_period_hours"]:
+                add(f"   ⏱️ Held: {trade['holding_period_hours']:.1f} hours")
             
-            response_lines.extend(trade_lines)
-            response_lines.append("")
+            add("")
         
         return "\n".join(response_lines)
         